@@ -0,0 +1,396 @@
+"""Offline benchmark of the Orchestrator agent loop.
+
+Drives Orchestrator.execute with a scripted LLM client against synthetic
+workspaces, with no network access, and reports what the agent loop itself
+costs: per-iteration overhead, tool latencies, peak RSS and how fast the
+request payload grows.
+
+    cd backend
+    python -m benchmarks.orchestrator_bench --files 1000 10000 100000
+    python -m benchmarks.orchestrator_bench --json baseline.json
+    python -m benchmarks.orchestrator_bench --baseline baseline.json
+
+With --baseline the run exits non-zero when a metric regressed by more than
+--tolerance against the saved run.
+
+Each size starts from an empty cache directory, so on-disk caches such as the
+trigram index are built from scratch on every run. --warm-cache instead keeps
+them under --workspace-root between runs, to measure the warm path.
+"""
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.agent.orchestrator import Orchestrator, OrchestratorConfig
+from src.llm.base import BaseLLMClient, LLMResponse
+
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_ROUNDS = 3
+DEFAULT_TOLERANCE = 0.25
+FILES_PER_DIR = 50
+DIRS_PER_PACKAGE = 50
+
+# Metrics compared against a baseline, all lower is better
+COMPARED_METRICS = [
+    "overhead_p50_ms",
+    "overhead_p95_ms",
+    "tool_p95_ms",
+    "peak_rss_mb",
+    "final_payload_bytes",
+]
+
+FILE_TEMPLATE = '''"""Synthetic module {index}."""
+
+
+class Handler{index}:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+
+    def handle(self, request):
+        self.calls += 1
+        return {{"handler": {index}, "name": self.name, "request": request}}
+
+
+def handler_{index}(request):
+    return Handler{index}("handler_{index}").handle(request)
+
+
+def helper_{index}(values):
+    total = 0
+    for value in values:
+        total += value * {index}
+    return total
+'''
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def file_path(index: int) -> str:
+    package = index // (FILES_PER_DIR * DIRS_PER_PACKAGE)
+    module = (index // FILES_PER_DIR) % DIRS_PER_PACKAGE
+    return f"pkg_{package}/mod_{module}/file_{index}.py"
+
+
+def build_workspace(root: Path, files: int) -> Path:
+    """Synthetic Python project with this many files, generated once and reused."""
+    workspace = root / f"workspace_{files}"
+    marker = root / f"workspace_{files}.complete"
+    if marker.exists():
+        return workspace
+
+    if workspace.exists():
+        shutil.rmtree(workspace)
+    workspace.mkdir(parents=True)
+    for index in range(files):
+        path = workspace / file_path(index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(FILE_TEMPLATE.format(index=index), encoding="utf-8")
+    (workspace / "README.md").write_text(f"# Synthetic workspace, {files} files\n", encoding="utf-8")
+
+    if shutil.which("git"):
+        git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost"]
+        subprocess.run(git + ["init", "-q"], cwd=workspace, check=True)
+        subprocess.run(git + ["add", "-A"], cwd=workspace, check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "Synthetic workspace"], cwd=workspace, check=True)
+
+    marker.write_text("", encoding="utf-8")
+    return workspace
+
+
+def _tool_use(call_id: str, name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "tool_use", "id": call_id, "name": name, "input": tool_input}
+
+
+def build_script(files: int, rounds: int) -> List[List[Dict[str, Any]]]:
+    """Tool calls for each model turn: explore, read, edit, check, in rounds."""
+    turns: List[List[Dict[str, Any]]] = [
+        [("list_directory", {"path": "."})],
+    ]
+
+    for round_index in range(rounds):
+        # Spread over the workspace so every round touches cold files
+        picks = [(round_index * 7919 + step * 104729) % files for step in range(4)]
+        target = picks[0]
+        turns += [
+            [("search_code", {"query": f"def handler_{target}(", "file_pattern": "*.py"})],
+            [("read_file", {"path": file_path(index)}) for index in picks],
+            [
+                ("read_file", {"path": file_path(target)}),
+                ("list_directory", {"path": str(Path(file_path(target)).parent)}),
+            ],
+            [("edit_file", {
+                "path": file_path(target),
+                "search": f"total += value * {target}",
+                "replace": f"total += value * {target} + {round_index}",
+            })],
+            [("read_file", {"path": file_path(target), "offset": 18, "limit": 5})],
+            [
+                ("git_operation", {"operation": "status"}),
+                ("git_operation", {"operation": "diff"}),
+            ],
+            [("execute_command", {"command": "echo benchmark", "timeout": 10})],
+            [("search_code", {"query": r"helper_\d+7\(", "regex": True, "file_pattern": "*.py"})],
+        ]
+
+    return [
+        [_tool_use(f"toolu_{turn}_{call}", name, tool_input) for call, (name, tool_input) in enumerate(calls)]
+        for turn, calls in enumerate(turns)
+    ]
+
+
+class ScriptedLLMClient(BaseLLMClient):
+    """Plays back a fixed list of tool-use turns, then ends the run.
+
+    Records the time and request size of every call, which is all the
+    benchmark needs to split a run into model, tool and orchestrator time.
+    """
+
+    def __init__(self, script: List[List[Dict[str, Any]]]):
+        super().__init__("offline", "scripted")
+        self.script = script
+        self.calls: List[Dict[str, Any]] = []
+
+    def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        started = time.perf_counter()
+        payload = len(json.dumps({"system": system, "tools": tools, "messages": messages}, default=str))
+
+        turn = len(self.calls)
+        if turn < len(self.script):
+            content = [{"type": "text", "text": f"Step {turn}"}] + self.script[turn]
+            stop_reason = "tool_use"
+        else:
+            content = [{"type": "text", "text": "Done."}]
+            stop_reason = "end_turn"
+
+        self.calls.append({"started": started, "finished": time.perf_counter(), "payload_bytes": payload})
+        return LLMResponse(
+            content=content,
+            stop_reason=stop_reason,
+            usage={"input_tokens": payload // 4, "output_tokens": 50},
+            model=self.model
+        )
+
+    def convert_tools_to_provider_format(self, tools: List[Dict[str, Any]]) -> Any:
+        return tools
+
+
+def run_benchmark(workspace: Path, files: int, rounds: int, stream: bool) -> Dict[str, Any]:
+    """One Orchestrator.execute over the workspace; restores any files it edits."""
+    script = build_script(files, rounds)
+    edited = {
+        call["input"]["path"]
+        for turn in script for call in turn if call["name"] == "edit_file"
+    }
+    originals = {path: (workspace / path).read_bytes() for path in edited}
+
+    client = ScriptedLLMClient(script)
+    config = OrchestratorConfig(
+        api_key="offline",
+        workspace_path=str(workspace),
+        max_iterations=len(script) + 1,
+        stream=stream,
+        rate_limit=False,
+    )
+    orchestrator = Orchestrator(config, client)
+
+    tool_samples: List[Dict[str, Any]] = []
+    execute_tool = orchestrator.tool_executor.aexecute
+
+    async def timed_execute(tool_name, parameters):
+        started = time.perf_counter()
+        try:
+            return await execute_tool(tool_name, parameters)
+        finally:
+            tool_samples.append({"name": tool_name, "started": started, "finished": time.perf_counter()})
+
+    orchestrator.tool_executor.aexecute = timed_execute
+
+    try:
+        started = time.perf_counter()
+        result = orchestrator.execute("Benchmark task")
+        wall_time = time.perf_counter() - started
+    finally:
+        orchestrator.close()
+        for path, content in originals.items():
+            (workspace / path).write_bytes(content)
+
+    # Between two model calls the loop runs the tools and does its own work;
+    # whatever is not covered by a tool is orchestrator overhead
+    overheads = []
+    for previous, current in zip(client.calls, client.calls[1:]):
+        gap = current["started"] - previous["finished"]
+        tools = [s for s in tool_samples if previous["finished"] <= s["started"] < current["started"]]
+        tool_wall = max(s["finished"] for s in tools) - min(s["started"] for s in tools) if tools else 0.0
+        overheads.append(max(gap - tool_wall, 0.0) * 1000)
+
+    tool_latencies: Dict[str, List[float]] = {}
+    for sample in tool_samples:
+        tool_latencies.setdefault(sample["name"], []).append((sample["finished"] - sample["started"]) * 1000)
+    all_latencies = [latency for latencies in tool_latencies.values() for latency in latencies]
+
+    payloads = [call["payload_bytes"] for call in client.calls]
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+    return {
+        "files": files,
+        "success": result.success,
+        "iterations": result.iterations_used,
+        "wall_time_s": round(wall_time, 3),
+        "overhead_p50_ms": round(_percentile(overheads, 0.5), 3),
+        "overhead_p95_ms": round(_percentile(overheads, 0.95), 3),
+        "overhead_max_ms": round(max(overheads, default=0.0), 3),
+        "tool_p50_ms": round(_percentile(all_latencies, 0.5), 3),
+        "tool_p95_ms": round(_percentile(all_latencies, 0.95), 3),
+        "tools": {
+            name: {
+                "count": len(latencies),
+                "p50_ms": round(_percentile(latencies, 0.5), 3),
+                "p95_ms": round(_percentile(latencies, 0.95), 3),
+                "max_ms": round(max(latencies), 3),
+            }
+            for name, latencies in sorted(tool_latencies.items())
+        },
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "first_payload_bytes": payloads[0] if payloads else 0,
+        "final_payload_bytes": payloads[-1] if payloads else 0,
+        "payload_growth_bytes_per_iteration": (
+            round((payloads[-1] - payloads[0]) / (len(payloads) - 1)) if len(payloads) > 1 else 0
+        ),
+        "errors": result.errors,
+    }
+
+
+def _run_child(files: int, args) -> Dict[str, Any]:
+    # A fresh process per size, so peak RSS belongs to that size alone
+    command = [
+        sys.executable, "-m", "benchmarks.orchestrator_bench",
+        "--child", str(files),
+        "--rounds", str(args.rounds),
+        "--workspace-root", str(args.workspace_root),
+    ]
+    if args.stream:
+        command.append("--stream")
+
+    with tempfile.TemporaryDirectory(prefix="klix_bench_cache") as cold_cache:
+        cache_dir = args.workspace_root / "cache" if args.warm_cache else cold_cache
+        completed = subprocess.run(
+            command, cwd=Path(__file__).resolve().parent.parent,
+            env={**os.environ, "KLIX_CACHE_DIR": str(cache_dir)},
+            stdout=subprocess.PIPE, check=True, text=True
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _print_report(results: List[Dict[str, Any]]):
+    header = f"{'files':>8} {'iters':>6} {'wall s':>8} {'ovh p50':>8} {'ovh p95':>8} {'tool p95':>9} {'rss MB':>8} {'payload':>9} {'growth':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['files']:>8} {r['iterations']:>6} {r['wall_time_s']:>8.2f} {r['overhead_p50_ms']:>8.2f} "
+            f"{r['overhead_p95_ms']:>8.2f} {r['tool_p95_ms']:>9.2f} {r['peak_rss_mb']:>8.1f} "
+            f"{r['final_payload_bytes']:>9} {r['payload_growth_bytes_per_iteration']:>7}"
+        )
+
+    for r in results:
+        print(f"\nTool latency (ms), {r['files']} files")
+        for name, stats in r["tools"].items():
+            print(f"  {name:<16} n={stats['count']:<4} p50={stats['p50_ms']:<9} p95={stats['p95_ms']:<9} max={stats['max_ms']}")
+        if not r["success"]:
+            print(f"  run failed: {r['errors']}")
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than tolerance."""
+    previous = {r["files"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get(r["files"])
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if base.get(metric) and r[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{r['files']} files: {metric} {base[metric]} -> {r[metric]}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the orchestrator loop")
+    parser.add_argument("--files", type=int, nargs="+", default=DEFAULT_SIZES, help="Workspace sizes to run")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Explore/read/edit rounds per run")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming model path")
+    parser.add_argument(
+        "--workspace-root", type=Path,
+        default=Path(tempfile.gettempdir()) / "klix_bench",
+        help="Where synthetic workspaces are generated and kept between runs"
+    )
+    parser.add_argument(
+        "--warm-cache", action="store_true",
+        help="Keep on-disk caches under --workspace-root between runs instead of starting cold"
+    )
+    parser.add_argument("--json", type=Path, help="Write the results here, for use as a baseline")
+    parser.add_argument("--baseline", type=Path, help="Fail on regressions against these results")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.child is not None:
+        workspace = build_workspace(args.workspace_root, args.child)
+        print(json.dumps(run_benchmark(workspace, args.child, args.rounds, args.stream)))
+        return 0
+
+    results = []
+    for files in args.files:
+        started = time.perf_counter()
+        build_workspace(args.workspace_root, files)
+        print(f"Workspace of {files} files ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        results.append(_run_child(files, args))
+
+    _print_report(results)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+    return 0 if all(r["success"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
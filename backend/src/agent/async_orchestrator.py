@@ -0,0 +1,210 @@
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import asyncio
+import logging
+
+from ..llm.base import AsyncBaseLLMClient, LLMResponse, StreamEvent
+from ..llm.factory import create_llm_client
+from ..llm.response_cache import AsyncCachingLLMClient
+from ..llm.rate_limiter import AsyncRateLimitedLLMClient
+from .orchestrator import BaseOrchestrator, OrchestratorConfig, ExecutionResult
+from .concurrent_executor import AsyncConcurrentToolExecutor
+from .exceptions import MaxIterationsError, APICallError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOrchestrator(BaseOrchestrator):
+    """Agent loop on asyncio.
+
+    LLM calls go through an AsyncBaseLLMClient, backoff uses asyncio.sleep and
+    tools run through ToolExecutor.aexecute, so one event loop can drive many
+    sessions at once. Each session still needs its own AsyncOrchestrator.
+    """
+
+    def __init__(
+        self,
+        config:OrchestratorConfig,
+        llm_client: Optional[AsyncBaseLLMClient] = None,
+        on_stream_event: Optional[Callable[[StreamEvent],None]] = None
+    ):
+        super().__init__(config, on_stream_event)
+
+        self.llm_client = llm_client or create_llm_client(
+            config.provider, config.api_key, config.model, asynchronous = True
+        )
+        if config.rate_limit:
+            self.llm_client = AsyncRateLimitedLLMClient(self.llm_client)
+        if config.response_cache:
+            self.llm_client = AsyncCachingLLMClient(self.llm_client, mode = config.response_cache)
+
+        self.concurrent_executor = AsyncConcurrentToolExecutor(
+            self._run_tool,
+            max_workers = config.max_parallel_tools
+        )
+
+    async def execute(self, task:str) -> ExecutionResult:
+        try:
+            self._start_run(task)
+
+            while self.iteration_count < self.config.max_iterations:
+                self._begin_iteration()
+
+                tool_results = None
+                if self.config.stream:
+                    response, tool_results = await self._stream_llm()
+                else:
+                    response = await self._call_llm()
+
+                self._add_assistant_message(response)
+
+                stop_reason = response.stop_reason
+                logger.info(f"Stop reason: {stop_reason}")
+
+                if stop_reason == "end_turn":
+                    logger.info("Task completed - Claude signaled end_turn")
+                    return self._create_success_result(response)
+
+                elif stop_reason == "tool_use":
+                    if tool_results is None:
+                        tool_calls = self._extract_tool_calls(response)
+
+                        logger.info(f"Executing {len(tool_calls)} tool calls")
+
+                        tool_results = await self._execute_tools(tool_calls)
+
+                    self._add_tool_results(tool_results)
+
+                elif stop_reason == "max_token":
+                    logger.warning("Response hit max_token, continuing....")
+                    continue
+
+                else:
+                    logger.error(f"Unexpected stop reason: {stop_reason}")
+                    self.errors.append(f"Unexpected stop reason: {stop_reason}")
+                    continue
+
+            logger.warning(f"Max iterations ({self.config.max_iterations})reached")
+            raise MaxIterationsError(
+                f"Reached maximum iterations ({self.config.max_iterations}) without completion"
+            )
+
+        except MaxIterationsError as e:
+            return self._create_timeout_result(str(e))
+
+        except Exception as e:
+            logger.error(f"Error during execution: {e}", exc_info = True)
+            return self._create_error_result(e)
+
+        finally:
+            self._finish_run()
+
+    async def _call_llm(self) -> LLMResponse:
+        tools = self.tool_executor.get_tool_schema()
+
+        messages = self._build_api_message()
+
+        for attempt in range(self.config.max_retries):
+            try:
+                logger.debug(f"API call attempt {attempt + 1}/{self.config.max_retries}")
+
+                span = self._start_llm_span(attempt, stream = False)
+                response = await self.llm_client.create_message(
+                    messages = messages,
+                    system = self.system_prompt,
+                    tools = tools,
+                    max_token = self.config.max_token,
+                    temperature = self.config.temperature
+                )
+                self._end_llm_span(span, response)
+
+                logger.debug(f"API call successful Usage: {response.usage}")
+                return response
+
+            except Exception as e:
+                self._end_llm_span(span, error = e)
+                await asyncio.sleep(self._retry_delay(e, attempt))
+
+        raise APICallError(f"API call failed after {self.config.max_retries} retries")
+
+    async def _stream_llm(self) -> Tuple[LLMResponse,List[Dict[str,Any]]]:
+        """Stream one model turn, starting each tool as soon as its input is complete."""
+        tools = self.tool_executor.get_tool_schema()
+
+        messages = self._build_api_message()
+
+        for attempt in range(self.config.max_retries):
+            batch = self.concurrent_executor.begin_batch()
+            tools_started = False
+            response = None
+
+            span = self._start_llm_span(attempt, stream = True)
+
+            try:
+                logger.debug(f"Streaming API call attempt {attempt + 1}/{self.config.max_retries}")
+
+                async for event in self.llm_client.stream_message(
+                    messages = messages,
+                    system = self.system_prompt,
+                    tools = tools,
+                    max_token = self.config.max_token,
+                    temperature = self.config.temperature
+                ):
+                    if "llm.time_to_first_event" not in span.attributes:
+                        span.set({"llm.time_to_first_event": span.duration})
+
+                    if self.on_stream_event:
+                        self.on_stream_event(event)
+
+                    if event.type == "tool_use":
+                        logger.info(f"Tool call ready mid-stream: {event.block['name']}")
+                        tools_started = True
+                        batch.submit(event.block)
+
+                    elif event.type == "message_stop":
+                        response = event.response
+
+            except Exception as e:
+                self._end_llm_span(span, error = e)
+                await batch.results()
+                if tools_started:
+                    # Tools have already run against the workspace, so replaying the turn is unsafe
+                    logger.error(f"Stream failed after tools started: {e}")
+                    raise APICallError(f"API stream failed mid-turn: {e}") from e
+
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                continue
+
+            if response is None:
+                error = APICallError("API stream ended without a complete message")
+                self._end_llm_span(span, error = error)
+                await batch.results()
+                raise error
+
+            self._end_llm_span(span, response)
+
+            logger.debug(f"Streaming API call successful Usage: {response.usage}")
+
+            tool_results = [self._record_tool_outcome(outcome) for outcome in await batch.results()]
+            return response, tool_results
+
+        raise APICallError(f"API call failed after {self.config.max_retries} retries")
+
+    async def _execute_tools(self,tool_calls:List[Dict[str,Any]]) ->List[Dict[str,Any]]:
+        outcomes = await self.concurrent_executor.execute_all(tool_calls)
+        return [self._record_tool_outcome(outcome) for outcome in outcomes]
+
+    async def _run_tool(self,tool_call:Dict[str,Any]) -> Dict[str,Any]:
+        tool_name = tool_call["name"]
+
+        logger.info(f"Executing tool: {tool_name}")
+        logger.debug(f"Tool input: {tool_call['input']}")
+
+        span = self._start_tool_span(tool_call)
+        try:
+            result = await self.tool_executor.aexecute(tool_name,tool_call["input"])
+            self._end_tool_span(span, result)
+            return self._tool_success_outcome(tool_call, result)
+
+        except Exception as e:
+            self._end_tool_span(span, error = e)
+            return self._tool_error_outcome(tool_call, e)
@@ -0,0 +1,319 @@
+from dataclasses import dataclass, field, asdict, fields, replace
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+
+from ..llm.base import AsyncBaseLLMClient
+from ..llm.factory import create_llm_client
+from .orchestrator import OrchestratorConfig, ExecutionResult
+from .async_orchestrator import AsyncOrchestrator
+from .planner import Planner
+from .exceptions import BatchError
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CONCURRENCY = 8
+PROGRESS_EVERY = 25
+
+# Per-task config overrides; credentials and provider come from the batch, the
+# workspace from the task's own "workspace"
+TASK_CONFIG_FIELDS = {f.name for f in fields(OrchestratorConfig)} - {"api_key", "provider", "workspace_path"}
+
+API_KEY_ENV = {
+    "anthropic": "ANTHROPIC_API_KEY",
+    "openai": "OPENAI_API_KEY",
+}
+
+
+@dataclass
+class BatchTask:
+    """One line of a batch task file."""
+    id: str
+    task: str
+    workspace: str
+    config: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BatchSummary:
+    total: int
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    execution_time: float = 0.0
+
+
+def _task_id(task: str, workspace: str) -> str:
+    return hashlib.sha256(f"{workspace}\0{task}".encode("utf-8")).hexdigest()[:16]
+
+
+def load_tasks(path: Path, default_workspace: str = ".") -> List[BatchTask]:
+    """Read a JSONL task file.
+
+    Each line is an object with a "task" and optionally an "id", a
+    "workspace" and a "config" of OrchestratorConfig overrides. Without an
+    id the task is identified by a hash of its text and workspace, which is
+    what resuming matches on, so ids stay stable when lines are reordered.
+    """
+    tasks: List[BatchTask] = []
+    seen: Set[str] = set()
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise BatchError(f"{path}:{line_number}: invalid JSON: {e}")
+            if not isinstance(row, dict) or not isinstance(row.get("task"), str) or not row["task"].strip():
+                raise BatchError(f"{path}:{line_number}: expected an object with a non-empty \"task\"")
+
+            workspace = str(Path(row.get("workspace") or default_workspace).resolve())
+            config = row.get("config") or {}
+            unknown = set(config) - TASK_CONFIG_FIELDS
+            if unknown:
+                raise BatchError(f"{path}:{line_number}: unknown config fields: {', '.join(sorted(unknown))}")
+
+            task_id = str(row.get("id") or _task_id(row["task"], workspace))
+            if task_id in seen:
+                raise BatchError(f"{path}:{line_number}: duplicate task id {task_id}")
+            seen.add(task_id)
+
+            tasks.append(BatchTask(id=task_id, task=row["task"], workspace=workspace, config=config))
+
+    return tasks
+
+
+def load_finished(path: Path, include_failed: bool = True) -> Set[str]:
+    """Ids of tasks already recorded in a results file.
+
+    A run that died mid-write leaves a partial last line; it is cut off so
+    that appending starts on a clean line, and its task runs again.
+    """
+    if not path.exists():
+        return set()
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning(f"Dropping a partial result line at the end of {path}")
+            f.truncate(end)
+
+    # The latest row for a task wins, so a retried failure that succeeded counts as done
+    latest: Dict[str, bool] = {}
+    for line in data[:end].decode("utf-8").splitlines():
+        try:
+            row = json.loads(line)
+            latest[row["id"]] = bool(row["result"]["success"])
+        except (ValueError, KeyError, TypeError):
+            continue
+
+    return {task_id for task_id, success in latest.items() if success or include_failed}
+
+
+class BatchRunner:
+    """Pushes a file of agent tasks through a bounded pool of AsyncOrchestrators.
+
+    Every task gets its own orchestrator, so conversations never mix, but
+    they all run on one event loop and share one LLM client: one connection
+    pool, one rate limiter per provider account in which every task is its
+    own fairly scheduled session, and the per-workspace file index, watcher
+    and git caches of tasks pointing at the same workspace. A task's shells
+    are stopped when it ends, and a workspace's watcher, git process and
+    background jobs once the last task using it has ended, so a long batch
+    over many workspaces does not pile them up.
+
+    Each result is appended to the results file and flushed to disk as soon
+    as its task finishes. Running the same command again after a crash or an
+    interrupt skips every task already recorded there.
+    """
+
+    def __init__(
+        self,
+        config: OrchestratorConfig,
+        llm_client: Optional[AsyncBaseLLMClient] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        use_planner: bool = False,
+        task_timeout: Optional[float] = None
+    ):
+        self.config = config
+        # One client per model; orchestrators wrap it with their own rate-limited session and cache
+        self._llm_clients: Dict[str, AsyncBaseLLMClient] = {}
+        if llm_client is not None:
+            self._llm_clients[config.model] = llm_client
+        self.concurrency = concurrency
+        self.use_planner = use_planner
+        self.task_timeout = task_timeout
+
+    async def run(self, tasks_path: Path, results_path: Path, retry_failed: bool = False) -> BatchSummary:
+        start_time = datetime.now()
+        tasks = load_tasks(Path(tasks_path), self.config.workspace_path)
+        results_path = Path(results_path)
+        finished = load_finished(results_path, include_failed=not retry_failed)
+
+        pending = [task for task in tasks if task.id not in finished]
+        summary = BatchSummary(total=len(tasks), skipped=len(tasks) - len(pending))
+        logger.info(f"Batch of {len(tasks)} tasks, {summary.skipped} already done, {len(pending)} to run")
+
+        queue: "asyncio.Queue[BatchTask]" = asyncio.Queue()
+        for task in pending:
+            queue.put_nowait(task)
+
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(results_path, "a", encoding="utf-8") as results_file:
+
+            async def worker():
+                while True:
+                    try:
+                        task = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+
+                    result = await self._run_task(task)
+                    self._write_result(results_file, task, result)
+
+                    if result.success:
+                        summary.succeeded += 1
+                    else:
+                        summary.failed += 1
+                    done = summary.succeeded + summary.failed
+                    if done % PROGRESS_EVERY == 0 or done == len(pending):
+                        elapsed = (datetime.now() - start_time).total_seconds()
+                        logger.info(
+                            f"{done}/{len(pending)} tasks finished, {summary.failed} failed, "
+                            f"{done / elapsed * 60:.1f} tasks/min"
+                        )
+
+            workers = max(1, min(self.concurrency, len(pending)))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+        summary.execution_time = (datetime.now() - start_time).total_seconds()
+        return summary
+
+    def run_sync(self, tasks_path: Path, results_path: Path, retry_failed: bool = False) -> BatchSummary:
+        return asyncio.run(self.run(tasks_path, results_path, retry_failed))
+
+    async def _run_task(self, task: BatchTask) -> ExecutionResult:
+        start_time = datetime.now()
+        config = self.config
+
+        try:
+            # Inside the try, so a bad override fails this task rather than the batch
+            config = replace(self.config, workspace_path=task.workspace, **task.config)
+            llm_client = self._llm_client(config)
+            if self.use_planner:
+                # Every step closes its own orchestrator
+                return await asyncio.wait_for(Planner(config, llm_client).execute(task.task), self.task_timeout)
+
+            # Setting up a workspace walks it and watches every directory, off the loop
+            # so the other tasks keep running meanwhile
+            orchestrator = await asyncio.to_thread(AsyncOrchestrator, config, llm_client)
+            try:
+                return await asyncio.wait_for(orchestrator.execute(task.task), self.task_timeout)
+            finally:
+                # Stops the task's shells and, once no other task uses the workspace, its
+                # watcher, git process and jobs; killing jobs can take a grace period
+                await asyncio.to_thread(orchestrator.close)
+
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = BatchError(f"Task timed out after {self.task_timeout}s")
+            logger.error(f"Task {task.id} failed: {e}")
+            return ExecutionResult(
+                success=False,
+                final_message=f"Execution failed with error: {str(e)}",
+                iterations_used=0,
+                tools_called=[],
+                files_modified=[],
+                errors=[str(e)],
+                execution_time=(datetime.now() - start_time).total_seconds(),
+                metadata={"error_type": type(e).__name__, "model": config.model}
+            )
+
+    def _llm_client(self, config: OrchestratorConfig) -> AsyncBaseLLMClient:
+        client = self._llm_clients.get(config.model)
+        if client is None:
+            client = create_llm_client(config.provider, config.api_key, config.model, asynchronous=True)
+            self._llm_clients[config.model] = client
+        return client
+
+    def _write_result(self, results_file, task: BatchTask, result: ExecutionResult):
+        row = {
+            "id": task.id,
+            "workspace": task.workspace,
+            "finished_at": datetime.now().isoformat(),
+            "result": asdict(result),
+        }
+        results_file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        results_file.flush()
+        os.fsync(results_file.fileno())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of agent tasks")
+    parser.add_argument("tasks", type=Path, help="JSONL file with one task per line")
+    parser.add_argument("results", type=Path, help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--provider", default="anthropic", choices=sorted(API_KEY_ENV))
+    parser.add_argument("--model")
+    parser.add_argument("--workspace", default=".", help="Workspace for tasks that do not name one")
+    parser.add_argument("--max-iterations", type=int)
+    parser.add_argument("--task-timeout", type=float, help="Seconds before a task is given up on")
+    parser.add_argument("--planner", action="store_true", help="Run every task through the DAG planner")
+    parser.add_argument("--retry-failed", action="store_true", help="Run recorded failures again")
+    parser.add_argument("--response-cache", choices=["read_write", "record", "replay"])
+    parser.add_argument("--trace-file", help="Append the spans of every run here as OTLP/JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    api_key = os.environ.get(API_KEY_ENV[args.provider])
+    if not api_key and args.response_cache != "replay":
+        parser.error(f"{API_KEY_ENV[args.provider]} is not set")
+
+    options: Dict[str, Any] = {
+        "api_key": api_key or "",
+        "provider": args.provider,
+        "workspace_path": args.workspace,
+        # Nobody is watching the tokens of a batch run go by
+        "stream": False,
+        "response_cache": args.response_cache,
+        "trace_file": args.trace_file,
+    }
+    if args.model:
+        options["model"] = args.model
+    elif args.provider != "anthropic":
+        parser.error(f"--model is required with --provider {args.provider}")
+    if args.max_iterations:
+        options["max_iterations"] = args.max_iterations
+
+    runner = BatchRunner(
+        OrchestratorConfig(**options),
+        concurrency=args.concurrency,
+        use_planner=args.planner,
+        task_timeout=args.task_timeout
+    )
+    try:
+        summary = runner.run_sync(args.tasks, args.results, retry_failed=args.retry_failed)
+    except BatchError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    print(json.dumps(asdict(summary)))
+    return 0 if summary.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
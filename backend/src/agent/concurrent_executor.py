@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+READ_ONLY_TOOLS = {"read_file", "list_directory", "search_code"}
+READ_ONLY_GIT_OPERATIONS = {"status", "diff", "log", "show"}
+READ_ONLY_JOB_OPERATIONS = {"list", "status", "tail"}
+PATH_SCOPED_TOOLS = {"read_file", "write_file", "edit_file"}
+
+WORKSPACE = None
+
+
+@dataclass
+class ToolAccess:
+    """Which part of the workspace a tool call touches and whether it mutates it.
+
+    A scope of WORKSPACE (None) means the call may touch anything in the workspace.
+    """
+    write: bool
+    scope: Optional[str] = WORKSPACE
+
+    def conflicts_with(self, other: "ToolAccess") -> bool:
+        if not (self.write or other.write):
+            return False
+        if self.scope is WORKSPACE or other.scope is WORKSPACE:
+            return True
+        return self.scope == other.scope
+
+
+def classify_tool_call(tool_name: str, tool_input: Dict[str, Any]) -> ToolAccess:
+    if tool_name == "git_operation":
+        return ToolAccess(write=tool_input.get("operation") not in READ_ONLY_GIT_OPERATIONS)
+    if tool_name == "manage_job":
+        return ToolAccess(write=tool_input.get("operation") not in READ_ONLY_JOB_OPERATIONS)
+
+    write = tool_name not in READ_ONLY_TOOLS
+
+    if tool_name in PATH_SCOPED_TOOLS and isinstance(tool_input.get("path"), str):
+        return ToolAccess(write=write, scope=_normalize_path(tool_input["path"]))
+
+    return ToolAccess(write=write)
+
+
+def _normalize_path(path: str) -> str:
+    parts = []
+    for part in path.replace("\\", "/").split("/"):
+        if part in ("", "."):
+            continue
+        if part == ".." and parts and parts[-1] != "..":
+            parts.pop()
+        else:
+            parts.append(part)
+    return "/".join(parts)
+
+
+class AsyncToolBatch:
+    """Tool calls from a single model turn.
+
+    Calls are started as soon as they are submitted. A call waits only for
+    earlier calls in the batch it conflicts with, so reads run in parallel while
+    writes to the same path (and anything workspace-wide, like execute_command)
+    keep the order the model asked for. A semaphore bounds how many run at once.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore, run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        self._semaphore = semaphore
+        self._run = run
+        self._entries: List[tuple] = []
+
+    def submit(self, tool_call: Dict[str, Any]) -> asyncio.Task:
+        access = classify_tool_call(tool_call["name"], tool_call.get("input") or {})
+
+        dependencies = [
+            task for earlier, task in self._entries
+            if access.conflicts_with(earlier)
+        ]
+        task = asyncio.ensure_future(self._run_after(dependencies, tool_call))
+        self._entries.append((access, task))
+
+        return task
+
+    async def _run_after(self, dependencies: List[asyncio.Task], tool_call: Dict[str, Any]) -> Dict[str, Any]:
+        if dependencies:
+            await asyncio.gather(*dependencies, return_exceptions=True)
+
+        async with self._semaphore:
+            return await self._run(tool_call)
+
+    async def results(self) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*(task for _, task in self._entries)))
+
+
+class AsyncConcurrentToolExecutor:
+    def __init__(self, run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]], max_workers: int = 8):
+        self._run = run
+        self.max_workers = max_workers
+        self._semaphore = asyncio.Semaphore(max_workers)
+
+    def begin_batch(self) -> AsyncToolBatch:
+        return AsyncToolBatch(self._semaphore, self._run)
+
+    async def execute_all(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        batch = self.begin_batch()
+        for tool_call in tool_calls:
+            batch.submit(tool_call)
+        return await batch.results()
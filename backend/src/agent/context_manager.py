@@ -0,0 +1,235 @@
+from typing import List, Dict, Any, Optional, Callable
+import logging
+import json
+
+from ..tools.read_cache import DELTA_PREFIXES
+
+logger = logging.getLogger(__name__)
+
+
+CHARS_PER_TOKEN = 4
+
+FILE_READ_TOOLS = {"read_file"}
+FILE_WRITE_TOOLS = {"write_file", "edit_file"}
+
+PLACEHOLDER_PREFIXES = ("[Elided ", "[Stale read ")
+COMPACT_TARGET = 0.75
+DROPPED_NOTE = "\n\n[Earlier turns of this conversation were removed to save context]"
+
+
+def estimate_tokens(content: Any) -> int:
+    """Cheap token estimate for message content, without a tokenizer round trip."""
+    if isinstance(content, str):
+        return len(content) // CHARS_PER_TOKEN + 1
+
+    if isinstance(content, list):
+        total = 0
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "text":
+                total += estimate_tokens(block.get("text", ""))
+            elif block_type == "tool_use":
+                total += estimate_tokens(block.get("name", "")) + estimate_tokens(json.dumps(block.get("input", {})))
+            elif block_type == "tool_result":
+                total += estimate_tokens(block.get("content", ""))
+            else:
+                total += estimate_tokens(json.dumps(block))
+        return total
+
+    return estimate_tokens(json.dumps(content))
+
+
+class ContextManager:
+    """Conversation history with a running token count and budget-driven compaction.
+
+    Each message's token estimate is computed once, when it is added, so the
+    total is kept up to date without recounting the history every turn. When
+    the total crosses compact_threshold of the budget, build_messages() shrinks
+    the history in increasingly aggressive passes, stopping once it is back
+    under COMPACT_TARGET of the threshold so compaction does not re-run every turn:
+
+    1. Collapse file reads that a later full read of the same range, or a write
+       of the same path, made stale. Reads answered with an unchanged marker or
+       a diff keep the read they refer to alive.
+    2. Elide the output of tool results older than the last keep_recent_turns turns.
+    3. Drop the oldest assistant/tool_result exchanges, keeping the original task.
+
+    tool_use/tool_result pairs are always kept or dropped together, so the
+    compacted history is still a valid conversation for the API.
+    on_result_removed is called with the tool_use block of every result that
+    is collapsed, elided or dropped, once per result.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        reserved_tokens: int = 0,
+        compact_threshold: float = 0.8,
+        keep_recent_turns: int = 4,
+        on_result_removed: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.max_tokens = max_tokens
+        self.reserved_tokens = reserved_tokens
+        self.compact_threshold = compact_threshold
+        self.keep_recent_turns = keep_recent_turns
+        self.on_result_removed = on_result_removed
+
+        self.messages: List[Dict[str, Any]] = []
+        self._token_counts: List[int] = []
+        self._tool_calls: Dict[str, Dict[str, Any]] = {}
+        self.total_tokens = 0
+        self.compactions = 0
+
+        # Ratio of provider-reported to estimated prompt tokens, learned from usage
+        self._scale = 1.0
+
+    def estimated_prompt_tokens(self) -> int:
+        return int((self.total_tokens + self.reserved_tokens) * self._scale)
+
+    def reset(self):
+        self.messages = []
+        self._token_counts = []
+        self._tool_calls = {}
+        self.total_tokens = 0
+        self.compactions = 0
+
+    def add_message(self, message: Dict[str, Any]):
+        tokens = estimate_tokens(message["content"])
+
+        self.messages.append(message)
+        self._token_counts.append(tokens)
+        self.total_tokens += tokens
+
+        if message["role"] == "assistant" and isinstance(message["content"], list):
+            for block in message["content"]:
+                if block.get("type") == "tool_use":
+                    self._tool_calls[block["id"]] = block
+
+    def calibrate(self, actual_prompt_tokens: int):
+        """Correct the estimate using the prompt size the provider actually billed."""
+        estimated = self.total_tokens + self.reserved_tokens
+        if actual_prompt_tokens > 0 and estimated > 0:
+            self._scale = actual_prompt_tokens / estimated
+
+    def build_messages(self) -> List[Dict[str, Any]]:
+        if self._over_threshold():
+            self.compact()
+        return self.messages
+
+    def compact(self):
+        before = self.total_tokens
+
+        for compaction_pass in (self._collapse_stale_reads, self._elide_old_tool_results, self._drop_old_exchanges):
+            compaction_pass()
+            if not self._over_threshold(COMPACT_TARGET):
+                break
+
+        self.compactions += 1
+        logger.info(f"Compacted context from ~{before} to ~{self.total_tokens} tokens")
+
+    def _over_threshold(self, fraction: float = 1.0) -> bool:
+        return self.estimated_prompt_tokens() > self.max_tokens * self.compact_threshold * fraction
+
+    def _collapse_stale_reads(self):
+        # Walk newest to oldest so we know, for every read, whether the file is touched again later
+        read_later = set()
+        written_later = set()
+        needs_base = set()
+
+        for index in range(len(self.messages) - 1, -1, -1):
+            for block in self._tool_result_blocks(index):
+                tool_call = self._tool_calls.get(block["tool_use_id"])
+                if tool_call is None or block.get("is_error"):
+                    continue
+
+                tool_input = tool_call["input"]
+                path = tool_input.get("path")
+
+                if tool_call["name"] in FILE_WRITE_TOOLS:
+                    written_later.add(path)
+                    continue
+                if tool_call["name"] not in FILE_READ_TOOLS:
+                    continue
+
+                read_range = (path, tool_input.get("offset") or 1, tool_input.get("limit"))
+                content = block.get("content", "")
+                if isinstance(content, str) and content.startswith(DELTA_PREFIXES):
+                    # Only meaningful next to the earlier read of the same range
+                    needs_base.add(read_range)
+                    continue
+
+                if read_range in needs_base:
+                    needs_base.discard(read_range)
+                elif read_range in read_later or path in written_later:
+                    self._replace_tool_result(index, block, f"[Stale read of {path} removed; a later call read or modified this file]")
+                read_later.add(read_range)
+
+    def _elide_old_tool_results(self):
+        for index in range(self._recent_start()):
+            for block in self._tool_result_blocks(index):
+                content = block.get("content", "")
+                if isinstance(content, str) and content.startswith(PLACEHOLDER_PREFIXES):
+                    continue
+
+                tool_call = self._tool_calls.get(block["tool_use_id"])
+                tool_name = tool_call["name"] if tool_call else "tool"
+                self._replace_tool_result(index, block, f"[Elided {tool_name} output ({len(str(content))} chars) to save context]")
+
+    def _drop_old_exchanges(self):
+        # Message 0 is the task. After it, history alternates assistant turn /
+        # tool_result turn, and each such pair is dropped as a unit.
+        dropped = False
+
+        while self._over_threshold(COMPACT_TARGET) and 1 < self._recent_start():
+            drop = 2 if len(self.messages) > 2 and self.messages[2]["role"] == "user" else 1
+            for _ in range(drop):
+                for block in self._tool_result_blocks(1):
+                    # Collapsed and elided results were already reported when they were replaced
+                    content = block.get("content", "")
+                    if not (isinstance(content, str) and content.startswith(PLACEHOLDER_PREFIXES)):
+                        self._notify_removed(block)
+                self.total_tokens -= self._token_counts.pop(1)
+                self.messages.pop(1)
+            dropped = True
+
+        task = self._as_text(self.messages[0]["content"])
+        if dropped and not task.endswith(DROPPED_NOTE):
+            self.messages[0] = {"role": "user", "content": task + DROPPED_NOTE}
+            self.total_tokens -= self._token_counts[0]
+            self._token_counts[0] = estimate_tokens(self.messages[0]["content"])
+            self.total_tokens += self._token_counts[0]
+
+    def _recent_start(self) -> int:
+        """Index of the first message in the protected recent window."""
+        return max(1, len(self.messages) - 2 * self.keep_recent_turns)
+
+    def _tool_result_blocks(self, index: int) -> List[Dict[str, Any]]:
+        message = self.messages[index]
+        if message["role"] != "user" or not isinstance(message["content"], list):
+            return []
+        return [block for block in message["content"] if block.get("type") == "tool_result"]
+
+    def _notify_removed(self, block: Dict[str, Any]):
+        tool_call = self._tool_calls.get(block["tool_use_id"])
+        if tool_call is not None and self.on_result_removed is not None:
+            self.on_result_removed(tool_call)
+
+    def _replace_tool_result(self, index: int, block: Dict[str, Any], content: str):
+        self._notify_removed(block)
+
+        # Copy rather than mutate, the original blocks may be shared with callers
+        message = self.messages[index]
+        new_content = [
+            {**item, "content": content} if item is block else item
+            for item in message["content"]
+        ]
+        self.messages[index] = {**message, "content": new_content}
+
+        self.total_tokens -= self._token_counts[index]
+        self._token_counts[index] = estimate_tokens(new_content)
+        self.total_tokens += self._token_counts[index]
+
+    def _as_text(self, content: Any) -> str:
+        if isinstance(content, str):
+            return content
+        return "\n".join(block.get("text", "") for block in content if block.get("type") == "text")
@@ -0,0 +1,22 @@
+class OrchestratorError(Exception):
+    """Base error for agent orchestration"""
+
+
+class MaxIterationsError(OrchestratorError):
+    """The task did not finish within the configured iterations"""
+
+
+class ToolExecutionError(OrchestratorError):
+    """A tool failed in a way the agent loop cannot recover from"""
+
+
+class APICallError(OrchestratorError):
+    """The LLM provider call failed after retries"""
+
+
+class PlanError(OrchestratorError):
+    """The planner produced a step graph that cannot be executed"""
+
+
+class BatchError(OrchestratorError):
+    """A batch task file cannot be run"""
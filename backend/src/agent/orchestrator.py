@@ -1,23 +1,35 @@
 
 from dataclasses import dataclass,field
-from typing import List, Dict, Any, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal, Callable
 from pathlib import Path
+import asyncio
 import logging
 from datetime import datetime
 
-from anthropic import Anthropic, APIError, APIStatusError
-from anthropic.types import Message, TextBlock, ToolUseBlock, ContentBlock
-
-from tool_executor import ToolExecutor
-from exceptions import (
+from ..llm.base import BaseLLMClient, ThreadedLLMClient, LLMResponse, StreamEvent
+from ..llm.factory import create_llm_client
+from .tool_executor import ToolExecutor
+from .context_manager import ContextManager, estimate_tokens, FILE_READ_TOOLS
+from .tracing import (
+    Tracer,
+    Span,
+    SpanExporter,
+    JSONFileExporter,
+    OpenTelemetryExporter,
+    LLM_SPAN,
+    TOOL_SPAN,
+    KIND_CLIENT,
+    STATUS_ERROR
+)
+from .exceptions import (
     OrchestratorError,
     MaxIterationsError,
     ToolExecutionError,
     APICallError
 )
 
-import time
 import json
+import random
 
 
 
@@ -47,17 +59,35 @@ class OrchestratorConfig:
     """Configuration for the orchestrator"""
     api_key:str
     model: str = "claude-sonnet-4-20250514"
+    provider: str = "anthropic"
     max_iterations: int = 25
     max_token:int = 4096
     temperature: float = 0.7
     workspace_path:str = "."
     max_context_token: int = 180000
+    context_compaction_threshold: float = 0.8
     
-    max_retires: int = 3
+    max_retries: int = 3
     retry_delay:float = 1.0
     
+    stream: bool = True
+    
     require_confirmation_for_destructive: bool = True
     
+    max_parallel_tools: int = 8
+    
+    # Queue LLM calls through the provider account's shared RateLimiter
+    rate_limit: bool = True
+    
+    # "read_write", "record" or "replay" to put a ResponseCache in front of the LLM client
+    response_cache: Optional[str] = None
+    
+    # Append every run's spans to this file as OTLP/JSON
+    trace_file: Optional[str] = None
+    
+    # Also hand spans to the OpenTelemetry SDK, needs opentelemetry-api
+    otel_export: bool = False
+    
 
 @dataclass
 class ExecutionResult:
@@ -71,24 +101,59 @@ class ExecutionResult:
     execution_time: float = 0.0
     metadata: Dict[str,Any] = field(default_factory=dict)
  
-class Orchestrator:
-    def __init__(self,config:OrchestratorConfig):
+RETRYABLE_STATUS_CODES = {429,500,502,503,504,529}
+
+TOOL_RESULT_CHAR_LIMIT = 10000
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+ 
+class BaseOrchestrator:
+    """State and message handling of the agent loop; AsyncOrchestrator runs it, Orchestrator wraps that for sync callers."""
+    
+    def __init__(
+        self,
+        config:OrchestratorConfig,
+        on_stream_event: Optional[Callable[[StreamEvent],None]] = None
+    ):
         self.config = config
         
-        self.client = Anthropic(api_key = config.api_key)
+        self.on_stream_event = on_stream_event
         
         self.tool_executor = ToolExecutor(
-            workspace_path = Path(config.workspace_path)
+            workspace_path = Path(config.workspace_path).resolve(),
+            on_tool_output = self._emit_tool_output
         )      
         
-        self.messages: List[Dict[str,Any]] = []
-        self.system_prompt:str = self.build_system_prompt()
+        self.system_prompt:str = self._build_system_prompts()
+        
+        # System prompt, tool schemas and the response all come out of the context window
+        self.context = ContextManager(
+            max_tokens = config.max_context_token,
+            reserved_tokens = (
+                estimate_tokens(self.system_prompt)
+                + estimate_tokens(json.dumps(self.tool_executor.get_tool_schema()))
+                + config.max_token
+            ),
+            compact_threshold = config.context_compaction_threshold,
+            on_result_removed = self._forget_read
+        )
+        
+        self.tracer = Tracer(
+            exporters = self._build_span_exporters(),
+            resource = {"service.name": "klix_code", "gen_ai.request.model": config.model}
+        )
         
         
         self.iteration_count: int = 0
         self.tools_called: List[str] = []
         self.files_modified: List[str] = []
         self.errors: List[str] = []
+        self.usage: Dict[str,int] = {}
         
         
         self.is_running: bool = False
@@ -96,230 +161,221 @@ class Orchestrator:
         
         logger.info(f"Orchestration initialized with model: {config.model}")
         
-        
-    def execute(self, task:str) -> ExecutionResult:
+    
+    def _start_run(self, task:str):
         logger.info(f"Starting task execution: {task[:100]}...")
         
         self.start_time = datetime.now()
         self.is_running = True
         self.iteration_count = 0
         
-        self.message = []
+        self.context.reset()
+        self.tool_executor.read_cache.reset()
         self.tools_called = []
         self.files_modified = []
         self.errors = []
+        self.usage = {}
         
+        self.tracer.start_run({
+            "agent.task": task[:200],
+            "agent.workspace": str(self.config.workspace_path),
+            "gen_ai.request.model": self.config.model
+        })
         
+        self._add_user_message(task)
+    
+    def _emit_tool_output(self, stream:str, text:str):
+        # Called from the thread running the command, as output is produced
+        if self.on_stream_event:
+            self.on_stream_event(StreamEvent(
+                type = "tool_output",
+                text = text,
+                block = {"name": "execute_command", "stream": stream}
+            ))
+    
+    def _begin_iteration(self):
+        self.iteration_count += 1
+        self.tool_executor.read_cache.turn = self.iteration_count
+        self.tracer.start_iteration(self.iteration_count)
+        logger.info(f"Iteration {self.iteration_count}/{self.config.max_iterations}")
+    
+    def _forget_read(self, tool_call:Dict[str,Any]):
+        # The model no longer has this read in context, so the next read must return the full text
+        if tool_call["name"] not in FILE_READ_TOOLS or "path" not in tool_call["input"]:
+            return
         try:
-            self.add_user_message(task)
-            
-            while self.iteration_count < self.config.max_iterations:
-                self.iteration_count += 1
-                logger.info(f"Iteration {self.iteration_count}/{self.config.max_iterations}")
-                
-                
-                response = self._call_llm()
-                
-                self._add_assistant_message(response)
-                
-                stop_reason = response.stop_reason
-                logger.info(f"Stop reason: {stop_reason}")
-                
-                if stop_reason == "end_turn":
-                    
-                    logger.info("Task completed - Claude signaled end_turn")
-                    return self._create_success_result(response)
-                
-                elif stop_reason == "tool_use":
-                    
-                    tool_calls = self.extract_tool_calls(response)
-                    
-                    logger.info(f"Executing {len(tool_calls)} tool calls")
-                    
-                    tool_results = self._execute_tools(tool_calls)
-                    
-                    self._add_tool_results(tool_results)
-                    
-                elif stop_reason == "max_token":
-                    logger.warning("Response hit max_token, continuing....")
-                    continue
-                
-                else:
-                    logger.error(f"Unexpected stop reason: {stop_reason}")
-                    self.errors.append(f"Uneexpected stop reason: {stop_reason}")
-                    continue
-                
-                
-            logger.warning(f"Max iterations ({self.config.max_iterations})reached")
-            raise MaxIterationsError(
-                f"REached maximum iterations ({self.config.max_iterations}) without completion"
-                
-            )
-            
-        except MaxIterationsError as e:
-            return self._create_timeout_result(str(e))
-        
-        except Exception as e:
-            logger.error(f"Error during execution: {e}", exc_info = True)
-            return self._create_error_result(e)
-        
-        finally:
-            self.is_running = False
-            execution_time = (datetime.now() - self.start_time).total_seconds()
-            logger.info(f"Execution completed in {execution_time:.2f}s")
+            # Keyed the way read_file keys its cache, so ./a.py and /abs/a.py are forgotten too
+            path = self.tool_executor.tools["read_file"].relative_path(tool_call["input"]["path"])
+        except ValueError:
+            return
+        self.tool_executor.read_cache.forget(path)
     
+    def _finish_run(self):
+        self.is_running = False
+        self.tracer.finish_run()
+        execution_time = (datetime.now() - self.start_time).total_seconds()
+        logger.info(f"Execution completed in {execution_time:.2f}s")
     
-    def _call_llm(self) -> Message:
-        
-        tools = self.tool_executor.get_tool_schema()
-        
-        messages = self._build_api_message()
-        
-        for attempt in range(self.config.max_retries):
-            try: 
-                logger.debug(f"API call attempt {attempt + 1}/{self.config.max_retried}")
-                
-                
-                response = self.client.message.create(
-                    model = self.config.model,
-                    max_token = self.config.max_token,
-                    temperature = self.config.temperature,
-                    system = self.system_prompt,
-                    messages = messages,
-                    tools = tools
-                )
-                
-                logger.debug(f"API call successful Usage: {response.usage}")
-                return response
-            
-            
-            except APIStatusError as e:
-                if e.status_code in [429,500,502,503,504]:
-                    if attempt < self.config.max_reties - 1:
-                        delay = self.config.retry_delay * (2 ** attempt)
-                        logger.warning(f"API error {e.status_code}, retrying in {delay}s ....")
-                        time.sleep(delay)
-                        continue
-                    
-                    
-                
-                logger.error(f"API status error: {e}")
-                raise APICallError(f"API call failed: {e}") from e
-            
-            except APIError as e:
-                logger.error(f"API error:{e}")
-                raise APICallError(f"API call failed: {e}") from e
-            
-            
-        raise APICallError(f"API call failed after {self.config.max_retires} retries")
+    def _build_span_exporters(self) -> List[SpanExporter]:
+        exporters: List[SpanExporter] = []
+        if self.config.trace_file:
+            exporters.append(JSONFileExporter(self.config.trace_file))
+        if self.config.otel_export:
+            try:
+                exporters.append(OpenTelemetryExporter())
+            except ImportError:
+                logger.warning("otel_export is set but opentelemetry-api is not installed")
+        return exporters
     
+    def _start_llm_span(self, attempt: int, stream: bool) -> Span:
+        return self.tracer.start_span(LLM_SPAN, kind = KIND_CLIENT, attributes = {
+            "gen_ai.system": self.config.provider,
+            "gen_ai.request.model": self.config.model,
+            "gen_ai.request.max_tokens": self.config.max_token,
+            "gen_ai.request.temperature": self.config.temperature,
+            "llm.attempt": attempt + 1,
+            "llm.stream": stream,
+            "llm.messages": len(self.messages)
+        })
     
-    def _execute_tools(self,tool_calls:List[Dict[str,Any]]) ->List[Dict[str,Any]]:
-        results = []
-        
-        for tool_call in tool_calls:
-            tool_name = tool_call["name"]
-            tool_input = tool_call["input"]
-            tool_id = tool_call["id"]
-            
-            logger.info(f"Executing tool: {tool_name}")
-            logger.debug(f"Tool input: {tool_input}")
-            
+    def _end_llm_span(self, span: Span, response: Optional[LLMResponse] = None, error: Optional[Exception] = None):
+        if response is not None:
+            usage = response.usage
+            span.set({
+                "gen_ai.response.finish_reasons": [response.stop_reason],
+                "gen_ai.usage.input_tokens": usage.get("input_tokens") or 0,
+                "gen_ai.usage.output_tokens": usage.get("output_tokens") or 0,
+                "gen_ai.usage.cache_read_input_tokens": usage.get("cache_read_input_tokens") or 0,
+                "gen_ai.usage.cache_creation_input_tokens": usage.get("cache_creation_input_tokens") or 0
+            })
+        if error is not None:
+            span.set({"http.response.status_code": getattr(error, "status_code", None)})
+        self.tracer.end_span(span, error)
+    
+    def _start_tool_span(self, tool_call: Dict[str,Any]) -> Span:
+        return self.tracer.start_span(TOOL_SPAN, attributes = {
+            "tool.name": tool_call["name"],
+            "tool.call_id": tool_call["id"],
+            "tool.bytes_in": len(json.dumps(tool_call["input"], default = str).encode("utf-8"))
+        })
+    
+    def _end_tool_span(self, span: Span, result: Optional[Dict[str,Any]] = None, error: Optional[Exception] = None):
+        if result is not None:
+            content = result["content"] if isinstance(result.get("content"), str) else json.dumps(result, default = str)
+            span.set({
+                "tool.bytes_out": len(content.encode("utf-8")),
+                "tool.truncated": bool(result.get("truncated")) or len(content) > TOOL_RESULT_CHAR_LIMIT,
+                "tool.success": result.get("success", True)
+            })
+            if result.get("success") is False:
+                span.status_code = STATUS_ERROR
+                span.status_message = content[:200]
+        self.tracer.end_span(span, error)
+    
+    def _trace_metadata(self) -> Dict[str,Any]:
+        return {"trace_id": self.tracer.trace_id, **self.tracer.summary()}
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Backoff before the next attempt if the error is retryable, otherwise raise."""
+        status_code = getattr(error, "status_code", None)
+        
+        if status_code in RETRYABLE_STATUS_CODES and attempt < self.config.max_retries - 1:
+            backoff = self.config.retry_delay * (2 ** attempt)
+            # Jitter keeps sessions that failed together from retrying together
+            retry_after = _retry_after(error)
+            if retry_after is not None:
+                delay = retry_after + random.uniform(0, backoff)
+            else:
+                delay = backoff / 2 + random.uniform(0, backoff / 2)
+            logger.warning(f"API error {status_code}, retrying in {delay:.2f}s ....")
+            return delay
+        
+        logger.error(f"API error: {error}")
+        raise APICallError(f"API call failed: {error}") from error
+    
+    def _tool_success_outcome(self, tool_call:Dict[str,Any], result:Dict[str,Any]) -> Dict[str,Any]:
+        logger.info(f"Tool {tool_call['name']} Executed successfully")
+        
+        return {
+            "name": tool_call["name"],
+            "result": result,
+            "tool_result": {
+                "type": "tool_result",
+                "tool_use_id": tool_call["id"],
+                "content": self._format_tool_result(result)
+            }
+        }
+    
+    def _tool_error_outcome(self, tool_call:Dict[str,Any], error:Exception) -> Dict[str,Any]:
+        logger.error(f"TOol {tool_call['name']} failed: {error}")
+        
+        return {
+            "name": tool_call["name"],
+            "error": str(error),
+            "tool_result": {
+                "type": "tool_result",
+                "tool_use_id": tool_call["id"],
+                "content": f"Error: {str(error)}",
+                "is_error":True
+            }
+        }
+    
+    def _record_tool_outcome(self,outcome:Dict[str,Any]) -> Dict[str,Any]:
+        """Fold a finished tool call into the run state, in the order the model issued the calls."""
+        tool_name = outcome["name"]
+        
+        if "error" in outcome:
+            self.errors.append(f"{tool_name}: {outcome['error']}")
+        else:
+            self.tools_called.append(tool_name)
             
-            try:
-                result = self.tool_executor.execute(tool_name,tool_input)
-                
-                
-                self.tools_called.append(tool_name)
+            if "files_modified" in outcome["result"]:
+                self.files_modified.extend(outcome["result"]["files_modified"])
                 
-                if "files_modified" in result:
-                    
-                    self.files_modified.extend(result["files_modified"])
-                    
-                tool_result = {
-                    "type": "tool_result",
-                    "tool_use_id": tool_id,
-                    "content": self._format_tool_result(result)
-                }
-                
-                logger.info(f"Tool {tool_name} Executed successfully")
-                
-            except Exception as e:
-                
-                logger.error(f"TOol {tool_name} failed: {e}")
-                self.errors.append(f"{tool_name}: {str(e)}")
-                
-                tool_result = {
-                    "type": "tool_result",
-                    "tool_use_id": tool_id,
-                    "content": f"Error: {str(e)}",
-                    "is_error":True
-                }
-                
-            results.append(tool_result)
-            
-        return results
+        return outcome["tool_result"]
     
     
-    def _extract_tool_calls(self,response: Message) -> List[Dict[str,Any]]:
-        tool_calls = []
-        
-        for block in response.content:
-            if isinstance(block, ToolUseBlock):
-                tool_calls.append({
-                    "id": block.id,
-                    "name":block.name,
-                    "input":block.input
-                })
-                
-        return tool_calls
+    def _extract_tool_calls(self,response: LLMResponse) -> List[Dict[str,Any]]:
+        return response.get_tool_calls()
     
     def _format_tool_result(self, result: Dict[str,Any]) -> str:
         if "content" in result:
             content = result["content"]
             
-            max_length = 10000
-            if len(content) > max_length:
-                content = content[:max_length] + f"\n\n... (truncated, {len(content)} total chars)"
+            if len(content) > TOOL_RESULT_CHAR_LIMIT:
+                content = content[:TOOL_RESULT_CHAR_LIMIT] + f"\n\n... (truncated, {len(content)} total chars)"
                 
             return content
         
         return json.dumps(result,indent=2)
     
+    @property
+    def messages(self) -> List[Dict[str,Any]]:
+        return self.context.messages
+    
     def _build_api_message(self) -> List[Dict[str,Any]]:
-        return self.messages
+        return self.context.build_messages()
     
     def _add_user_message(self,content:str):
-        self.messages.append({
+        self.context.add_message({
             "role": "user",
             "content":content
         })
         
-    def _add_assistant_message(self,response:Message):
-        content_blocks = []
-        
-        for block in response.content:
-            if isinstance(block,TextBlock):
-                content_blocks.append({
-                    "type":"text",
-                    "text": block.text
-                })
-            elif isinstance(block,TextBlock):
-                content_blocks.append({
-                    "type":"tool_use",
-                    "id": block.id,
-                    "name": block.name,
-                    "input": block.input
-                })
-                
-        self.message.append({
+    def _add_assistant_message(self,response:LLMResponse):
+        self.context.calibrate(response.prompt_tokens())
+        
+        for key, value in response.usage.items():
+            self.usage[key] = self.usage.get(key, 0) + (value or 0)
+        
+        self.context.add_message({
             "role":"assistant",
-            "content":content_blocks
+            "content":response.content
         })
         
     
     def _add_tool_results(self,tool_results: List[Dict[str,Any]]):
-        self.messages.append({
+        self.context.add_message({
             "role":"user",
             "content":tool_results
         })
@@ -353,17 +409,10 @@ When you're done with the task, simply respond without calling any more tools.
 - Ask for clarification if the task is ambiguous
 - Prefer small, incremental changes over large rewrites
 """
-    def _extract_final_message(self,response:Message) ->str:
-        text_parts = []
-        
-        for block in response.content:
-            if isinstance(block,TextBlock):
-                text_parts.append(block.text)
-                
-        
-        return "\n\n".join(text_parts)
+    def _extract_final_message(self,response:LLMResponse) ->str:
+        return response.get_text()
     
-    def _create_success_result(self,response:Message) -> ExecutionResult:
+    def _create_success_result(self,response:LLMResponse) -> ExecutionResult:
         execution_time = (datetime.now() - self.start_time).total_seconds()
         
         return ExecutionResult(
@@ -376,8 +425,11 @@ When you're done with the task, simply respond without calling any more tools.
             execution_time=execution_time,
             metadata={
                 "model":self.config.model,
-                "workspace": str(self.config.workspace_path)
-                
+                "workspace": str(self.config.workspace_path),
+                "usage": dict(self.usage),
+                "context_tokens": self.context.estimated_prompt_tokens(),
+                "context_compactions": self.context.compactions,
+                "trace": self._trace_metadata()
             }
             
             
@@ -396,12 +448,15 @@ When you're done with the task, simply respond without calling any more tools.
             execution_time=execution_time,
             metadata={
                 "timeout": True,
-                "model": self.config.model
+                "model": self.config.model,
+                "trace": self._trace_metadata()
             }
         )
     
     def _create_error_result(self,error:Exception) -> ExecutionResult:
         execution_time = (datetime.now() - self.start_time).total_seconds()
+        if self.tracer.run_span is not None:
+            self.tracer.run_span.set_error(error)
         
         return ExecutionResult(
             success=False,
@@ -409,27 +464,61 @@ When you're done with the task, simply respond without calling any more tools.
             iterations_used=self.iteration_count,
             tools_called=self.tools_called,
             files_modified=list(set(self.files_modified)),
-            errors=self.errors + [str(errors)],
+            errors=self.errors + [str(error)],
             execution_time=execution_time,
             metadata={
                 "error_type":type(error).__name__,
-                "model":self.config.model
+                "model":self.config.model,
+                "trace": self._trace_metadata()
             }
         )
         
     def get_conversation_history(self) -> List[Dict[str,Any]]:
-        return self.message.copy()
+        return self.messages.copy()
     
     
     def cancel(self):
         logger.warning("Cancellation requested")
         self.is_running = False
-                    
-                    
-        
-                    
-                
-    
-        
     
+    def close(self):
+        """Stop the shells and anything else the tools keep running for this session."""
+        self.tool_executor.close()
+
+
+class Orchestrator:
+    """Synchronous front end to AsyncOrchestrator.
+
+    The agent loop only exists once, in AsyncOrchestrator; this runs it on an
+    event loop of its own, with the synchronous client's calls on worker
+    threads. Everything else (tool_executor, messages, tracer, usage, ...)
+    is the AsyncOrchestrator's. Call execute() from code that has no event
+    loop running in the same thread, and close() when done.
+    """
+
+    def __init__(
+        self,
+        config:OrchestratorConfig,
+        llm_client: Optional[BaseLLMClient] = None,
+        on_stream_event: Optional[Callable[[StreamEvent],None]] = None
+    ):
+        # async_orchestrator builds on BaseOrchestrator from this module
+        from .async_orchestrator import AsyncOrchestrator
+
+        llm_client = llm_client or create_llm_client(config.provider, config.api_key, config.model)
+        self.agent = AsyncOrchestrator(config, ThreadedLLMClient(llm_client), on_stream_event)
+        self._loop = asyncio.new_event_loop()
+
+    def execute(self, task:str) -> ExecutionResult:
+        return self._loop.run_until_complete(self.agent.execute(task))
+
+    def close(self):
+        self.agent.close()
+        if not self._loop.is_closed():
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
 
+    def __getattr__(self, name:str) -> Any:
+        if name == "agent":
+            raise AttributeError(name)
+        return getattr(self.agent, name)
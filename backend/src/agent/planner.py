@@ -0,0 +1,324 @@
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Callable
+from datetime import datetime
+import asyncio
+import json
+import logging
+import re
+
+from ..llm.base import AsyncBaseLLMClient, StreamEvent
+from ..llm.factory import create_llm_client
+from ..llm.response_cache import AsyncCachingLLMClient
+from ..llm.rate_limiter import AsyncRateLimitedLLMClient
+from .orchestrator import OrchestratorConfig, ExecutionResult
+from .async_orchestrator import AsyncOrchestrator
+from .exceptions import PlanError
+
+logger = logging.getLogger(__name__)
+
+
+MAX_PLAN_STEPS = 12
+MAX_PARALLEL_STEPS = 4
+
+STEP_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+
+PLANNER_PROMPT = f"""You plan coding tasks for a team of agents that work in the same workspace.
+
+Split the task into at most {MAX_PLAN_STEPS} steps and say which steps each one depends on. Steps without a dependency between them run at the same time, each agent with its own fresh context, so:
+- Make independent work independent, e.g. investigating two modules are two steps with no dependency between them
+- Steps that run at the same time must never edit the same files; when in doubt, make edits depend on each other
+- A step only sees the overall task, its own description and the final summaries of the steps it depends on, so describe each step completely
+- Simple tasks are a single step; do not split for the sake of it
+
+Answer with JSON only, in this shape:
+{{"steps": [{{"id": "inspect-auth", "description": "...", "depends_on": []}}, {{"id": "fix-login", "description": "...", "depends_on": ["inspect-auth"]}}]}}
+"""
+
+
+@dataclass
+class PlanStep:
+    id: str
+    description: str
+    depends_on: List[str] = field(default_factory=list)
+    status: str = "pending"
+    result: Optional[ExecutionResult] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+@dataclass
+class Plan:
+    task: str
+    steps: Dict[str, PlanStep]
+
+    def validate(self):
+        if not self.steps:
+            raise PlanError("Plan has no steps")
+        if len(self.steps) > MAX_PLAN_STEPS:
+            raise PlanError(f"Plan has {len(self.steps)} steps, the limit is {MAX_PLAN_STEPS}")
+
+        for step in self.steps.values():
+            unknown = [dep for dep in step.depends_on if dep not in self.steps]
+            if unknown:
+                raise PlanError(f"Step {step.id} depends on unknown steps: {', '.join(unknown)}")
+
+        # Kahn's algorithm; anything left over sits on a cycle
+        remaining = {step.id: set(step.depends_on) for step in self.steps.values()}
+        while remaining:
+            ready = [step_id for step_id, deps in remaining.items() if not deps]
+            if not ready:
+                raise PlanError(f"Plan has a dependency cycle between: {', '.join(sorted(remaining))}")
+            for step_id in ready:
+                del remaining[step_id]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def dependents(self, step_id: str) -> List[PlanStep]:
+        return [step for step in self.steps.values() if step_id in step.depends_on]
+
+    def sinks(self) -> List[PlanStep]:
+        """Steps nothing else depends on, whose results make up the final answer."""
+        return [step for step in self.steps.values() if not self.dependents(step.id)]
+
+    def critical_path(self) -> List[str]:
+        """The longest chain of dependent steps, which bounds how parallel the plan can run."""
+        longest: Dict[str, List[str]] = {}
+
+        def chain(step_id: str) -> List[str]:
+            if step_id not in longest:
+                deps = [chain(dep) for dep in self.steps[step_id].depends_on]
+                longest[step_id] = max(deps, key=len, default=[]) + [step_id]
+            return longest[step_id]
+
+        return max((chain(step_id) for step_id in self.steps), key=len, default=[])
+
+
+def parse_plan(task: str, text: str) -> Plan:
+    """Read the planner's JSON answer, tolerating prose or code fences around it."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise PlanError("Planner answer contains no JSON object")
+
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise PlanError(f"Planner answer is not valid JSON: {e}") from e
+
+    if not isinstance(data, dict) or not isinstance(data.get("steps", []), list):
+        raise PlanError("Planner answer must be an object with a list of steps")
+
+    steps: Dict[str, PlanStep] = {}
+    for raw in data.get("steps", []):
+        if not isinstance(raw, dict):
+            raise PlanError(f"Plan step is not an object: {raw!r}")
+        step_id = raw.get("id")
+        if not isinstance(step_id, str) or not STEP_ID_PATTERN.match(step_id):
+            raise PlanError(f"Invalid step id: {step_id!r}")
+        if step_id in steps:
+            raise PlanError(f"Duplicate step id: {step_id}")
+
+        description = raw.get("description", "")
+        depends_on = raw.get("depends_on", [])
+        if not isinstance(description, str):
+            raise PlanError(f"Step {step_id} has a description that is not a string")
+        if not isinstance(depends_on, list) or not all(isinstance(dep, str) for dep in depends_on):
+            raise PlanError(f"Step {step_id} must list its dependencies as step ids")
+
+        steps[step_id] = PlanStep(id=step_id, description=description.strip(), depends_on=depends_on)
+
+    plan = Plan(task=task, steps=steps)
+    plan.validate()
+    return plan
+
+
+class Planner:
+    """Runs a task as a graph of steps instead of one long agent loop.
+
+    One model call turns the task into steps with dependencies. Every step
+    then runs as its own AsyncOrchestrator with a fresh context, started as
+    soon as the steps it depends on have finished, so independent branches
+    run side by side and the wall-clock time follows the critical path
+    rather than the number of steps. A step sees the final summaries of its
+    dependencies; a failed step skips everything downstream of it while the
+    other branches carry on.
+
+    A planner answer that cannot be used falls back to running the whole
+    task as a single step.
+    """
+
+    def __init__(
+        self,
+        config: OrchestratorConfig,
+        llm_client: Optional[AsyncBaseLLMClient] = None,
+        on_stream_event: Optional[Callable[[StreamEvent], None]] = None,
+        max_parallel_steps: int = MAX_PARALLEL_STEPS
+    ):
+        # Step orchestrators wrap this client themselves, each as its own rate-limited session
+        self.step_llm_client = llm_client or create_llm_client(
+            config.provider, config.api_key, config.model, asynchronous=True
+        )
+        self.llm_client = self.step_llm_client
+        if config.rate_limit:
+            self.llm_client = AsyncRateLimitedLLMClient(self.llm_client)
+        if config.response_cache:
+            self.llm_client = AsyncCachingLLMClient(self.llm_client, mode=config.response_cache)
+        self.config = config
+        self.on_stream_event = on_stream_event
+        self.max_parallel_steps = max_parallel_steps
+
+    async def plan(self, task: str) -> Plan:
+        response = await self.llm_client.create_message(
+            messages=[{"role": "user", "content": task}],
+            system=PLANNER_PROMPT,
+            tools=[],
+            max_token=self.config.max_token,
+            temperature=0.0
+        )
+
+        try:
+            plan = parse_plan(task, response.get_text())
+        except PlanError as e:
+            logger.warning(f"Unusable plan, running the task as a single step: {e}")
+            plan = Plan(task=task, steps={"task": PlanStep(id="task", description=task)})
+
+        logger.info(
+            f"Planned {len(plan.steps)} steps, critical path {' -> '.join(plan.critical_path())}"
+        )
+        return plan
+
+    async def execute(self, task: str) -> ExecutionResult:
+        start_time = datetime.now()
+        loop = asyncio.get_running_loop()
+
+        try:
+            plan = await self.plan(task)
+        except Exception as e:
+            logger.error(f"Planning failed: {e}", exc_info=True)
+            return ExecutionResult(
+                success=False,
+                final_message=f"Planning failed with error: {str(e)}",
+                iterations_used=0,
+                tools_called=[],
+                files_modified=[],
+                errors=[str(e)],
+                execution_time=(datetime.now() - start_time).total_seconds(),
+                metadata={"error_type": type(e).__name__, "model": self.config.model}
+            )
+
+        slots = asyncio.Semaphore(self.max_parallel_steps)
+        running: Dict[asyncio.Task, PlanStep] = {}
+
+        def start_ready():
+            # A skip can make further steps skippable, so go round until nothing changes
+            changed = True
+            while changed:
+                changed = False
+                for step in plan.steps.values():
+                    if step.status != "pending":
+                        continue
+                    deps = [plan.steps[dep] for dep in step.depends_on]
+                    if any(dep.status in ("failed", "skipped") for dep in deps):
+                        step.status = "skipped"
+                        changed = True
+                    elif all(dep.status == "done" for dep in deps):
+                        step.status = "running"
+                        running[asyncio.create_task(self._run_step(plan, step, slots, loop))] = step
+
+        start_ready()
+        try:
+            while running:
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for finished_task in finished:
+                    del running[finished_task]
+                start_ready()
+        finally:
+            # Only left over when execute() itself is cancelled, e.g. by a batch task timeout
+            for step_task in running:
+                step_task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return self._merge_results(plan, start_time)
+
+    async def _run_step(self, plan: Plan, step: PlanStep, slots: asyncio.Semaphore, loop):
+        async with slots:
+            step.started_at = loop.time()
+            logger.info(f"Starting step {step.id}: {step.description[:100]}")
+
+            orchestrator = AsyncOrchestrator(self.config, self.step_llm_client, self.on_stream_event)
+            try:
+                step.result = await orchestrator.execute(self._step_prompt(plan, step))
+            except Exception as e:
+                logger.error(f"Step {step.id} crashed: {e}", exc_info=True)
+                step.result = None
+            finally:
+                await asyncio.to_thread(orchestrator.close)
+
+            step.finished_at = loop.time()
+            step.status = "done" if step.result is not None and step.result.success else "failed"
+            logger.info(f"Step {step.id} {step.status} after {step.finished_at - step.started_at:.1f}s")
+
+    def _step_prompt(self, plan: Plan, step: PlanStep) -> str:
+        if len(plan.steps) == 1:
+            return plan.task
+
+        parts = [
+            f"Overall task:\n{plan.task}",
+            f"Your step ({step.id}):\n{step.description}",
+        ]
+        for dep in step.depends_on:
+            parts.append(f"Result of step {dep}:\n{plan.steps[dep].result.final_message}")
+        parts.append(
+            "Do only your step; other agents handle the rest of the task, some of them at the same time. "
+            "Finish with a concise summary of what you found or changed, it is all later steps will see."
+        )
+        return "\n\n".join(parts)
+
+    def _merge_results(self, plan: Plan, start_time: datetime) -> ExecutionResult:
+        steps = list(plan.steps.values())
+        results = [step.result for step in steps if step.result is not None]
+
+        errors = []
+        for step in steps:
+            if step.status == "failed":
+                reason = step.result.final_message if step.result else "crashed"
+                errors.append(f"Step {step.id} failed: {reason}")
+            elif step.status == "skipped":
+                errors.append(f"Step {step.id} skipped after a dependency failed")
+
+        sinks = [step for step in plan.sinks() if step.result is not None]
+        if len(steps) == 1 and sinks:
+            final_message = sinks[0].result.final_message
+        else:
+            final_message = "\n\n".join(f"## {step.id}\n{step.result.final_message}" for step in sinks)
+
+        files_modified = []
+        for result in results:
+            files_modified.extend(result.files_modified)
+
+        return ExecutionResult(
+            success=all(step.status == "done" for step in steps),
+            final_message=final_message,
+            iterations_used=sum(result.iterations_used for result in results),
+            tools_called=[tool for result in results for tool in result.tools_called],
+            files_modified=list(set(files_modified)),
+            errors=errors + [error for result in results for error in result.errors],
+            execution_time=(datetime.now() - start_time).total_seconds(),
+            metadata={
+                "model": self.config.model,
+                "workspace": str(self.config.workspace_path),
+                "critical_path": plan.critical_path(),
+                "steps": [
+                    {
+                        "id": step.id,
+                        "description": step.description,
+                        "depends_on": step.depends_on,
+                        "status": step.status,
+                        "execution_time": (
+                            step.finished_at - step.started_at if step.finished_at is not None else 0.0
+                        ),
+                    }
+                    for step in steps
+                ]
+            }
+        )
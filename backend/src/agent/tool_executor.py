@@ -1,30 +1,73 @@
 from pathlib import Path
-from typing import Dict,Any,List
+from typing import Dict,Any,List,Optional
 import logging
 
 from ..tools.base import BaseTool
-from ..tools.code_editor import ReadFileTool, WriteFileTool, ListDirectoryTool
-from ..tools.shell_executor import ShellExecutorTool
+from ..tools.code_editor import ReadFileTool, WriteFileTool, ListDirectoryTool, EditFileTool
+from ..tools.shell_executor import ShellExecutorTool, ManageJobTool
+from ..tools.shell_session import OutputCallback
+from ..tools.code_analyser import CodeAnalyserTool
+from ..tools.git_operations import GitOperationsTool
+from ..tools.workspace_walker import get_workspace_walker
+from ..tools.fs_watcher import get_workspace_watcher, release_workspace_watcher
+from ..tools.git_backend import get_git_backend, release_git_backend
+from ..tools.job_manager import get_job_manager, release_job_manager
+from ..tools.read_cache import ReadCache
 
 
 logger = logging.getLogger(__name__)
 
+# Tools that can change arbitrary files without reporting which ones
+UNTRACKED_WRITE_TOOLS = {"execute_command", "manage_job"}
+
 class ToolExecutor:
-    def __init__(self,workspace_path: Path):
+    """The tools of one agent session.
+
+    The workspace's watcher, git backend and job manager are shared with
+    every other session on the same workspace; close() gives this session's
+    references back, and the last session to leave shuts them down.
+    """
+
+    def __init__(self,workspace_path: Path, on_tool_output: Optional[OutputCallback] = None):
         self.workspace_path = workspace_path
+        self.on_tool_output = on_tool_output
+        self.walker = get_workspace_walker(workspace_path)
+        self.watcher = get_workspace_watcher(workspace_path)
+        self.walker.attach_watcher(self.watcher)
+        self.git_backend = get_git_backend(workspace_path, self.watcher)
+        self.jobs = get_job_manager(workspace_path)
+        self.read_cache = ReadCache(self.watcher)
+        self._closed = False
         self.tools: Dict[str,BaseTool] = self._register_tools()
         logger.info(f"TOolExecutor initialized with {len(self.tools)} tools")
     
     def _register_tools(self) -> Dict[str,BaseTool]:
         tools={
-            "read_file": ReadFileTool(self.workspace_path),
+            "read_file": ReadFileTool(self.workspace_path, self.read_cache),
             "write_file": WriteFileTool(self.workspace_path),
+            "edit_file": EditFileTool(self.workspace_path),
             "list_directory": ListDirectoryTool(self.workspace_path),
-            "execute_command": ShellExecutorTool(self.workspace_path),
+            "search_code": CodeAnalyserTool(self.workspace_path),
+            "git_operation": GitOperationsTool(self.workspace_path, backend=self.git_backend),
+            "execute_command": ShellExecutorTool(
+                self.workspace_path, on_output=self.on_tool_output, jobs=self.jobs
+            ),
+            "manage_job": ManageJobTool(self.workspace_path, jobs=self.jobs),
         }
         
         return tools
     
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        for tool in self.tools.values():
+            tool.close()
+        release_job_manager(self.workspace_path)
+        release_git_backend(self.workspace_path)
+        release_workspace_watcher(self.workspace_path)
+    
     def get_tool_schema(self) ->List[Dict[str,Any]]:
         return [tool.get_schema() for tool in self.tools.values()]
     
@@ -32,6 +75,7 @@ class ToolExecutor:
         if tool_name not in self.tools:
             raise ValueError(f"Unknown tool: {tool_name}. Available: {list(self.tools.keys())}")
         tool = self.tools[tool_name]
+        result = None
         
         try: 
             logger.info(f"Executing tool: {tool_name}")
@@ -40,4 +84,30 @@ class ToolExecutor:
         except Exception as e:
             logger.error(f"Tool {tool_name} execution failed: {e}", exc_info =True)
             raise
-        
\ No newline at end of file
+        finally:
+            self._invalidate_walker(tool_name, result)
+    
+    async def aexecute(self, tool_name:str, parameters: Dict[str,Any])->Dict[str,Any]:
+        if tool_name not in self.tools:
+            raise ValueError(f"Unknown tool: {tool_name}. Available: {list(self.tools.keys())}")
+        tool = self.tools[tool_name]
+        result = None
+        
+        try: 
+            logger.info(f"Executing tool: {tool_name}")
+            result = await tool.aexecute(parameters)
+            return result
+        except Exception as e:
+            logger.error(f"Tool {tool_name} execution failed: {e}", exc_info =True)
+            raise
+        finally:
+            self._invalidate_walker(tool_name, result)
+    
+    def _invalidate_walker(self, tool_name:str, result:Optional[Dict[str,Any]]):
+        """Keep the shared file list in step with whatever the tool just changed."""
+        if tool_name in UNTRACKED_WRITE_TOOLS:
+            # A precise watcher has already journaled everything the command touched
+            if not self.watcher.precise:
+                self.walker.invalidate()
+        elif result and result.get("files_modified"):
+            self.walker.invalidate(result["files_modified"])
@@ -0,0 +1,335 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+
+RUN_SPAN = "agent.run"
+ITERATION_SPAN = "agent.iteration"
+LLM_SPAN = "llm.call"
+TOOL_SPAN = "tool.execute"
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON carries 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+@dataclass(eq=False)
+class Span:
+    """One timed operation of an agent run, shaped like an OpenTelemetry span."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str] = None
+    kind: int = KIND_INTERNAL
+    start_time_ns: int = 0
+    end_time_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status_code: int = STATUS_UNSET
+    status_message: str = ""
+
+    @property
+    def duration(self) -> float:
+        """Seconds, up to now while the span is still open."""
+        end = self.end_time_ns if self.end_time_ns is not None else time.time_ns()
+        return (end - self.start_time_ns) / 1e9
+
+    def set(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def set_error(self, error: Exception):
+        self.status_code = STATUS_ERROR
+        self.status_message = str(error)
+        self.attributes["error.type"] = type(error).__name__
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The span in OTLP/JSON form, as found under resourceSpans[].scopeSpans[].spans[]."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items() if value is not None
+            ],
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class Tracer:
+    """Spans of one orchestrator's runs.
+
+    Each run is one trace: an agent.run span, an agent.iteration span per
+    loop iteration, and llm.call and tool.execute spans inside the
+    iteration they belong to. Tool spans are opened on worker threads, so
+    finished spans are collected under a lock. When the run ends the
+    finished spans go to every exporter.
+    """
+
+    def __init__(self, exporters: Optional[List["SpanExporter"]] = None, resource: Optional[Dict[str, Any]] = None):
+        self.exporters = exporters or []
+        self.resource = resource or {}
+        self.spans: List[Span] = []
+        self.trace_id = ""
+        self.run_span: Optional[Span] = None
+        self.iteration_span: Optional[Span] = None
+        self._lock = threading.Lock()
+
+    def start_run(self, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        self.trace_id = _new_id(16)
+        with self._lock:
+            self.spans = []
+        self.iteration_span = None
+        self.run_span = self.start_span(RUN_SPAN, attributes=attributes)
+        return self.run_span
+
+    def start_iteration(self, iteration: int) -> Span:
+        if self.iteration_span is not None:
+            self.end_span(self.iteration_span)
+        self.iteration_span = self.start_span(
+            ITERATION_SPAN, parent=self.run_span, attributes={"agent.iteration": iteration}
+        )
+        return self.iteration_span
+
+    def start_span(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        kind: int = KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None
+    ) -> Span:
+        """Open a span; without a parent it goes under the current iteration, or the run."""
+        if parent is None and name != RUN_SPAN:
+            parent = self.iteration_span or self.run_span
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=_new_id(8),
+            parent_span_id=parent.span_id if parent else None,
+            kind=kind,
+            start_time_ns=time.time_ns(),
+        )
+        span.set(attributes or {})
+        return span
+
+    def end_span(self, span: Span, error: Optional[Exception] = None):
+        if span.end_time_ns is not None:
+            return
+        if error is not None:
+            span.set_error(error)
+        elif span.status_code == STATUS_UNSET:
+            span.status_code = STATUS_OK
+        span.end_time_ns = time.time_ns()
+        with self._lock:
+            self.spans.append(span)
+
+    def finish_run(self, error: Optional[Exception] = None):
+        if self.iteration_span is not None:
+            self.end_span(self.iteration_span)
+            self.iteration_span = None
+        if self.run_span is not None:
+            self.end_span(self.run_span, error)
+
+        spans = self.finished_spans()
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans, self.resource)
+            except Exception as e:
+                logger.warning(f"Span export with {type(exporter).__name__} failed: {e}")
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span.start_time_ns)
+
+    def summary(self) -> Dict[str, Any]:
+        spans = self.finished_spans()
+        # Results are built while the last iteration is still open
+        if self.iteration_span is not None and self.iteration_span.end_time_ns is None:
+            spans.append(self.iteration_span)
+        return summarize_spans(spans)
+
+
+def summarize_spans(spans: List[Span]) -> Dict[str, Any]:
+    """Where a run's time went: model calls, each tool, and each iteration."""
+    llm = {
+        "calls": 0,
+        "retries": 0,
+        "errors": 0,
+        "time": 0.0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_creation_tokens": 0,
+    }
+    tools: Dict[str, Dict[str, Any]] = {}
+    iterations: Dict[str, Dict[str, Any]] = {}
+
+    for span in spans:
+        if span.name == ITERATION_SPAN:
+            iterations.setdefault(span.span_id, {"llm_time": 0.0, "tool_time": 0.0}).update(
+                iteration=span.attributes.get("agent.iteration"),
+                time=round(span.duration, 4)
+            )
+
+    for span in spans:
+        iteration = iterations.get(span.parent_span_id)
+        attributes = span.attributes
+
+        if span.name == LLM_SPAN:
+            llm["calls"] += 1
+            llm["time"] += span.duration
+            llm["retries"] += 1 if attributes.get("llm.attempt", 1) > 1 else 0
+            llm["errors"] += 1 if span.status_code == STATUS_ERROR else 0
+            llm["input_tokens"] += attributes.get("gen_ai.usage.input_tokens", 0)
+            llm["output_tokens"] += attributes.get("gen_ai.usage.output_tokens", 0)
+            llm["cache_read_tokens"] += attributes.get("gen_ai.usage.cache_read_input_tokens", 0)
+            llm["cache_creation_tokens"] += attributes.get("gen_ai.usage.cache_creation_input_tokens", 0)
+            if iteration is not None:
+                iteration["llm_time"] += span.duration
+
+        elif span.name == TOOL_SPAN:
+            stats = tools.setdefault(attributes.get("tool.name", "unknown"), {
+                "calls": 0, "errors": 0, "time": 0.0, "max_time": 0.0,
+                "bytes_in": 0, "bytes_out": 0, "truncated": 0,
+            })
+            stats["calls"] += 1
+            stats["errors"] += 1 if span.status_code == STATUS_ERROR else 0
+            stats["time"] += span.duration
+            stats["max_time"] = max(stats["max_time"], span.duration)
+            stats["bytes_in"] += attributes.get("tool.bytes_in", 0)
+            stats["bytes_out"] += attributes.get("tool.bytes_out", 0)
+            stats["truncated"] += 1 if attributes.get("tool.truncated") else 0
+            if iteration is not None:
+                iteration["tool_time"] += span.duration
+
+    llm["time"] = round(llm["time"], 4)
+    for stats in tools.values():
+        stats["time"] = round(stats["time"], 4)
+        stats["max_time"] = round(stats["max_time"], 4)
+    for iteration in iterations.values():
+        iteration["llm_time"] = round(iteration["llm_time"], 4)
+        # Summed over tools, so parallel tools can add up to more than the iteration
+        iteration["tool_time"] = round(iteration["tool_time"], 4)
+
+    return {
+        "llm": llm,
+        "tools": tools,
+        "iterations": sorted(iterations.values(), key=lambda it: it.get("iteration") or 0),
+    }
+
+
+class SpanExporter:
+    """Receives the finished spans of each run."""
+
+    def export(self, spans: List[Span], resource: Dict[str, Any]):
+        raise NotImplementedError
+
+
+_file_locks: Dict[Path, threading.Lock] = {}
+_file_locks_lock = threading.Lock()
+
+
+class JSONFileExporter(SpanExporter):
+    """Appends each run to a file as one line of OTLP/JSON.
+
+    Every line is a complete ExportTraceServiceRequest, so the file can be
+    read line by line for offline analysis or posted as is to an OTLP/HTTP
+    collector. Orchestrators in one process can share a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path).resolve()
+        with _file_locks_lock:
+            self._lock = _file_locks.setdefault(self.path, threading.Lock())
+
+    def export(self, spans: List[Span], resource: Dict[str, Any]):
+        if not spans:
+            return
+
+        request = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in resource.items()]
+                },
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+        line = json.dumps(request, ensure_ascii=False, default=str) + "\n"
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class OpenTelemetryExporter(SpanExporter):
+    """Replays finished spans into the OpenTelemetry SDK's configured tracer provider.
+
+    Needs opentelemetry-api, and an SDK with an exporter set up by the
+    application for the spans to go anywhere.
+    """
+
+    def __init__(self, tracer_name: str = "klix_code.agent"):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(tracer_name)
+
+    def export(self, spans: List[Span], resource: Dict[str, Any]):
+        trace = self._trace
+        # Parents start before their children, so they have been replayed by the time a child needs them
+        replayed: Dict[str, Any] = {}
+        for span in spans:
+            parent = replayed.get(span.parent_span_id)
+            context = trace.set_span_in_context(parent) if parent is not None else None
+            otel_span = self._tracer.start_span(
+                span.name,
+                context=context,
+                kind=trace.SpanKind.CLIENT if span.kind == KIND_CLIENT else trace.SpanKind.INTERNAL,
+                attributes={**resource, **{k: v for k, v in span.attributes.items() if v is not None}},
+                start_time=span.start_time_ns,
+            )
+            if span.status_code == STATUS_ERROR:
+                otel_span.set_status(trace.Status(trace.StatusCode.ERROR, span.status_message))
+            replayed[span.span_id] = otel_span
+
+        for span in reversed(spans):
+            replayed[span.span_id].end(end_time=span.end_time_ns)
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from .models import User, UserCreate, UserLogin, TokenData
 from ..core.database import get_db
 from ..core.config import settings
+from ..core.metrics import time_password_hash, JWT_VERIFICATIONS, JWT_ISSUED, AUTH_ATTEMPTS
 
 # Password hashing
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
@@ -50,11 +51,13 @@ class AuthService:
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        with time_password_hash("verify"):
+            return pwd_context.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
         """Hash a password"""
-        return pwd_context.hash(password)
+        with time_password_hash("hash"):
+            return pwd_context.hash(password)
 
     def generate_api_key(self) -> str:
         """Generate a secure API key"""
@@ -70,6 +73,7 @@ class AuthService:
 
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+        JWT_ISSUED.inc()
         return encoded_jwt
 
     def verify_token(self, token: str) -> Optional[TokenData]:
@@ -80,15 +84,22 @@ class AuthService:
             email: str = payload.get("email")
 
             if user_id_str is None:
+                JWT_VERIFICATIONS.labels(result="invalid").inc()
                 return None
 
             try:
                 user_id = int(user_id_str)
             except (ValueError, TypeError):
+                JWT_VERIFICATIONS.labels(result="invalid").inc()
                 return None
 
+            JWT_VERIFICATIONS.labels(result="valid").inc()
             return TokenData(user_id=user_id, email=email)
+        except jwt.ExpiredSignatureError:
+            JWT_VERIFICATIONS.labels(result="expired").inc()
+            return None
         except jwt.PyJWTError:
+            JWT_VERIFICATIONS.labels(result="invalid").inc()
             return None
 
     def get_user_by_email(self, db: Session, email: str) -> Optional[User]:
@@ -133,17 +144,23 @@ class AuthService:
         """Authenticate user with email and password"""
         user = self.get_user_by_email(db, email)
         if not user:
+            AUTH_ATTEMPTS.labels(method="password", result="failure").inc()
             return None
         if not self.verify_password(password, user.hashed_password):
+            AUTH_ATTEMPTS.labels(method="password", result="failure").inc()
             return None
 
+        AUTH_ATTEMPTS.labels(method="password", result="success").inc()
+
         user.last_login = datetime.now(timezone.utc)
         db.commit()
         return user
 
     def authenticate_api_key(self, db: Session, api_key: str) -> Optional[User]:
         """Authenticate user with API key"""
-        return db.query(User).filter(User.api_key == api_key, User.is_active == True).first()
+        user = db.query(User).filter(User.api_key == api_key, User.is_active == True).first()
+        AUTH_ATTEMPTS.labels(method="api_key", result="success" if user else "failure").inc()
+        return user
 
     def revoke_api_key(self, db: Session, user_id: int) -> str:
         """Revoke current API key and generate new one"""
@@ -1,8 +1,18 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from .config import settings
+from .metrics import instrument_engine, DB_PING_DURATION, DB_UP
+from typing import Optional, Tuple
 import os
+import threading
+import time
+
+# How long a health check ping result is reused
+DB_PING_TTL = 5.0
+# Longest a health check ping may take to connect or to run its query
+DB_PING_TIMEOUT = 3
 
 # Create database engine
 engine = create_engine(
@@ -10,6 +20,7 @@ engine = create_engine(
     pool_pre_ping=True,
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
 )
+instrument_engine(engine)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -36,4 +47,69 @@ def create_tables():
 def init_db():
     """Initialize database with tables"""
     create_tables()
-    print("Database tables created successfully")
\ No newline at end of file
+    print("Database tables created successfully")
+
+
+def _ping_connect_args(url: str) -> dict:
+    """Driver options bounding how long the health check ping can block"""
+    if "sqlite" in url:
+        return {"check_same_thread": False, "timeout": DB_PING_TIMEOUT}
+    if url.startswith("postgresql"):
+        return {
+            "connect_timeout": DB_PING_TIMEOUT,
+            "options": f"-c statement_timeout={DB_PING_TIMEOUT * 1000}"
+        }
+    if url.startswith("mysql"):
+        return {"connect_timeout": DB_PING_TIMEOUT, "read_timeout": DB_PING_TIMEOUT}
+    return {}
+
+
+# A pool-less engine of its own, so the ping opens a fresh connection with the timeouts
+# above and never queues behind requests for one of the application pool's connections
+ping_engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=NullPool,
+    connect_args=_ping_connect_args(settings.DATABASE_URL)
+)
+
+_ping_lock = threading.Lock()
+# The last ping's result and when it was taken; replaced whole, as health checks read it without the lock
+_last_ping: Optional[Tuple[float, dict]] = None
+
+
+def check_database(ttl: float = DB_PING_TTL) -> dict:
+    """Ping the database with SELECT 1, reusing the last result for ttl seconds"""
+    global _last_ping
+
+    last = _last_ping
+    if last and time.monotonic() - last[0] < ttl:
+        return dict(last[1])
+
+    # One health check pings at a time; the others answer with the previous result
+    # instead of waiting, and only checks before the first result wait for it
+    acquired = _ping_lock.acquire(blocking=False) if last else _ping_lock.acquire(timeout=DB_PING_TIMEOUT * 2)
+    if not acquired:
+        return dict(last[1]) if last else {"status": "unavailable", "error": "TimeoutError", "latency_ms": None}
+
+    try:
+        last = _last_ping
+        if last and time.monotonic() - last[0] < ttl:
+            return dict(last[1])
+
+        start = time.perf_counter()
+        try:
+            with ping_engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            result = {"status": "connected"}
+        except Exception as e:
+            result = {"status": "unavailable", "error": type(e).__name__}
+        latency = time.perf_counter() - start
+
+        DB_PING_DURATION.observe(latency)
+        DB_UP.set(1 if result["status"] == "connected" else 0)
+
+        result["latency_ms"] = round(latency * 1000, 2)
+        _last_ping = (time.monotonic(), result)
+        return dict(result)
+    finally:
+        _ping_lock.release()
@@ -0,0 +1,196 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from starlette.responses import Response
+
+# Label used for requests that match no route, so scanners cannot blow up label cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests handled",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being handled",
+    ["method"]
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the SQLAlchemy pool"
+)
+DB_POOL_CONNECTIONS_CREATED = Counter(
+    "db_pool_connections_created_total",
+    "New database connections opened by the pool"
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to get a connection from the pool, including waiting for a free one and the pre-ping",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+DB_POOL_CONNECTION_HELD = Histogram(
+    "db_pool_connection_held_seconds",
+    "Time a connection stays checked out of the pool",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+DB_PING_DURATION = Histogram(
+    "db_ping_duration_seconds",
+    "Health check database ping latency",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+DB_UP = Gauge(
+    "db_up",
+    "Whether the last health check database ping succeeded"
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "auth_password_hash_duration_seconds",
+    "Password hashing and verification time",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+JWT_VERIFICATIONS = Counter(
+    "auth_jwt_verifications_total",
+    "JWT access token verifications",
+    ["result"]
+)
+JWT_ISSUED = Counter(
+    "auth_jwt_issued_total",
+    "JWT access tokens issued"
+)
+AUTH_ATTEMPTS = Counter(
+    "auth_attempts_total",
+    "Authentication attempts",
+    ["method", "result"]
+)
+
+
+@contextmanager
+def time_password_hash(operation: str):
+    """Time a password hash or verify call"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_DURATION.labels(operation=operation).observe(time.perf_counter() - start)
+
+
+def route_template(scope) -> str:
+    """Path template of the route a request matched, e.g. /api/users/{user_id}"""
+    # Routing leaves the matched route in the scope; a 404 leaves none
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+
+    # The route's path leaves out the prefixes of included routers and the root path,
+    # which are the part of the request path in front of what the route matches
+    path = scope["path"]
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is None or path_regex.match(path):
+        return template
+    for index, char in enumerate(path):
+        if char == "/" and index > 0 and path_regex.match(path[index:]):
+            return path[:index] + template
+    return template
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording latency, status and in-flight count of every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.labels(method=method, route=route).observe(duration)
+            HTTP_REQUESTS.labels(method=method, route=route, status=str(status_code)).inc()
+
+
+class PoolCollector:
+    """Reports the SQLAlchemy pool's current size and usage at scrape time"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        for name, description, method in (
+            ("db_pool_size", "Configured pool size", "size"),
+            ("db_pool_checked_out", "Connections currently checked out", "checkedout"),
+            ("db_pool_checked_in", "Idle connections in the pool", "checkedin"),
+            ("db_pool_overflow", "Connections open beyond the pool size", "overflow"),
+        ):
+            # Not every pool class (e.g. StaticPool, NullPool) tracks these
+            if hasattr(pool, method):
+                yield GaugeMetricFamily(name, description, value=getattr(pool, method)())
+
+
+def instrument_engine(engine):
+    """Record pool checkouts, checkout wait and connection hold times for an engine"""
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        # Every Session and Connection gets its DBAPI connection here, so this is the time spent waiting on the pool
+        start = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            DB_POOL_CHECKOUT_DURATION.observe(time.perf_counter() - start)
+
+    engine.raw_connection = timed_raw_connection
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS_CREATED.inc()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            DB_POOL_CONNECTION_HELD.observe(time.perf_counter() - checked_out_at)
+
+    REGISTRY.register(PoolCollector(engine))
+
+
+def metrics_response() -> Response:
+    """Current metrics in the Prometheus text format"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
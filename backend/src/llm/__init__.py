@@ -1,15 +1,36 @@
-from .base import BaseLLMClient, LLMResponse, LLMProvider
-from .anthropic_client import AnthropicClient
-from .openai_client import OpenAIClient
-from .gemini_client import GeminiClient
-from .factory import create_llm_client
+from .base import BaseLLMClient, AsyncBaseLLMClient, ThreadedLLMClient, LLMResponse, LLMProvider, StreamEvent
+from .anthropic_client import AnthropicClient, AsyncAnthropicClient
+from .openai_client import OpenAIClient, AsyncOpenAIClient
+from .transport import ClientRegistry, PoolConfig, get_client_registry
+from .rate_limiter import RateLimiter, RateLimitedLLMClient, AsyncRateLimitedLLMClient, get_rate_limiter
+from .router import LLMRouter, AsyncLLMRouter
+from .factory import create_llm_client, create_llm_router
+from .response_cache import ResponseCache, CacheMode, CachingLLMClient, AsyncCachingLLMClient
 
 __all__= [
     'BaseLLMClient',
+    'AsyncBaseLLMClient',
+    'ThreadedLLMClient',
     'LLMResponse',
     'LLMProvider',
+    'StreamEvent',
     'AnthropicClient',
+    'AsyncAnthropicClient',
     'OpenAIClient',
-    'GeminiClient',
+    'AsyncOpenAIClient',
+    'ClientRegistry',
+    'PoolConfig',
+    'get_client_registry',
+    'LLMRouter',
+    'AsyncLLMRouter',
     'create_llm_client',
+    'create_llm_router',
+    'RateLimiter',
+    'RateLimitedLLMClient',
+    'AsyncRateLimitedLLMClient',
+    'get_rate_limiter',
+    'ResponseCache',
+    'CacheMode',
+    'CachingLLMClient',
+    'AsyncCachingLLMClient',
 ]
\ No newline at end of file
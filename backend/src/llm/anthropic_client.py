@@ -1,70 +1,282 @@
-from typing import List,Dict,Any
+from typing import List,Dict,Any,Iterator,AsyncIterator,Tuple,Optional
 import logging
 
-from anthropic import Anthropic
 from anthropic.types import TextBlock, ToolUseBlock
 
 
-from .base import BaseLLMClient,LLMResponse
+from .base import BaseLLMClient,AsyncBaseLLMClient,LLMResponse,LLMProvider,ResponseBuilder,StreamEvent
+from .transport import get_client_registry
 
 logger = logging.getLogger(__name__)
 
 
 class AnthropicClient(BaseLLMClient):
-    def __init__(self, api_key:str, model:str = "claude-sonnet-4-20250514"):
+    provider = LLMProvider.ANTHROPIC
+
+    def __init__(
+        self,
+        api_key:str,
+        model:str = "claude-sonnet-4-20250514",
+        prompt_caching:bool = True,
+        base_url:Optional[str] = None
+    ):
         super().__init__(api_key, model)
-        self.client = Anthropic(api_key=api_key)
+        self.base_url = base_url
+        self.client = get_client_registry().get(LLMProvider.ANTHROPIC, api_key, base_url)
+        self.prompt_caching = prompt_caching
         logger.info(f"Anthropic client initialized with model: {model}")
-        
+
     def create_message(
-        self, 
-        message: List[Dict[str,Any]], 
-        system:str, 
-        tools: List[Dict[str,Any]], 
-        max_token: int = 4096, 
+        self,
+        messages: List[Dict[str,Any]],
+        system:str,
+        tools: List[Dict[str,Any]],
+        max_token: int = 4096,
         temperature:float=0.7
         ) -> LLMResponse:
-        
+
         try:
-            response =self.client.message.create(
-                model = self.model,
-                max_token =max_token,
-                temperature=temperature,
-                system=system,
-                message = message,
-                tools = tools if tools else None
+            response =self.client.messages.create(
+                **_build_request(self.model, messages, system, tools, max_token, temperature, self.prompt_caching)
             )
-            
-            content_blocks = []
-            
-            for block in response.content:
-                if isinstance(block,TextBlock):
-                    content_blocks.append({
-                        "type":"text",
-                        "text":block.text
-                    })
-                    
-                elif isinstance(block,ToolUseBlock):
-                    content_blocks.append({
-                        "type":"tool_use",
-                        "id": block.id,
-                        "name": block.name,
-                        "input": block.input
-                    })
-                    
-            return LLMResponse(
-                content=content_blocks,
-                stop_reason=response.stop_reason,
-                usage={
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens
-                }
-                model=response.model
+
+            return _parse_message(response)
+
+        except Exception as e:
+            logger.error(f"Anthropic API error: {e}", exc_info = True)
+            raise
+
+    def stream_message(
+        self,
+        messages: List[Dict[str,Any]],
+        system: str,
+        tools: List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+        ) -> Iterator[StreamEvent]:
+
+        builder = ResponseBuilder(self.model)
+
+        try:
+            stream = self.client.messages.create(
+                stream=True,
+                **_build_request(self.model, messages, system, tools, max_token, temperature, self.prompt_caching)
             )
-            
+
+            for event in stream:
+                yield from _translate_stream_event(builder, event)
+
+            yield StreamEvent(type="message_stop", response=builder.build())
+
         except Exception as e:
             logger.error(f"Anthropic API error: {e}", exc_info = True)
             raise
-    
+
     def convert_tools_to_provider_format(self, tools: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
-        return tools
\ No newline at end of file
+        return tools
+
+
+class AsyncAnthropicClient(AsyncBaseLLMClient):
+    provider = LLMProvider.ANTHROPIC
+
+    def __init__(
+        self,
+        api_key:str,
+        model:str = "claude-sonnet-4-20250514",
+        prompt_caching:bool = True,
+        base_url:Optional[str] = None
+    ):
+        super().__init__(api_key, model)
+        self.base_url = base_url
+        self.prompt_caching = prompt_caching
+        logger.info(f"Async Anthropic client initialized with model: {model}")
+
+    @property
+    def client(self):
+        # Looked up per call, connections belong to the event loop making it
+        return get_client_registry().get(LLMProvider.ANTHROPIC, self.api_key, self.base_url, asynchronous=True)
+
+    async def create_message(
+        self,
+        messages: List[Dict[str,Any]],
+        system:str,
+        tools: List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature:float=0.7
+        ) -> LLMResponse:
+
+        try:
+            response = await self.client.messages.create(
+                **_build_request(self.model, messages, system, tools, max_token, temperature, self.prompt_caching)
+            )
+
+            return _parse_message(response)
+
+        except Exception as e:
+            logger.error(f"Anthropic API error: {e}", exc_info = True)
+            raise
+
+    async def stream_message(
+        self,
+        messages: List[Dict[str,Any]],
+        system: str,
+        tools: List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+        ) -> AsyncIterator[StreamEvent]:
+
+        builder = ResponseBuilder(self.model)
+
+        try:
+            stream = await self.client.messages.create(
+                stream=True,
+                **_build_request(self.model, messages, system, tools, max_token, temperature, self.prompt_caching)
+            )
+
+            async for event in stream:
+                for stream_event in _translate_stream_event(builder, event):
+                    yield stream_event
+
+            yield StreamEvent(type="message_stop", response=builder.build())
+
+        except Exception as e:
+            logger.error(f"Anthropic API error: {e}", exc_info = True)
+            raise
+
+    def convert_tools_to_provider_format(self, tools: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        return tools
+
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# The API allows four breakpoints: tools, system, and the two most recent turns
+MESSAGE_CACHE_BREAKPOINTS = 2
+
+
+def _build_request(
+    model: str,
+    messages: List[Dict[str,Any]],
+    system: str,
+    tools: List[Dict[str,Any]],
+    max_token: int,
+    temperature: float,
+    prompt_caching: bool = False
+    ) -> Dict[str,Any]:
+
+    if prompt_caching:
+        system, tools, messages = _add_cache_breakpoints(system, tools, messages)
+
+    request = {
+        "model": model,
+        "max_tokens": max_token,
+        "temperature": temperature,
+        "system": system,
+        "messages": messages,
+    }
+
+    if tools:
+        request["tools"] = tools
+
+    return request
+
+
+def _add_cache_breakpoints(
+    system: str,
+    tools: List[Dict[str,Any]],
+    messages: List[Dict[str,Any]]
+    ) -> Tuple[Any, List[Dict[str,Any]], List[Dict[str,Any]]]:
+    """Mark the stable prefix of the request as cacheable.
+
+    The tool list and system prompt never change within a session. Marking the
+    last block of the two most recent user turns means the next request, which
+    appends to this one, reads everything up to its previous turn from cache.
+    Inputs are copied, never mutated, since messages belong to the caller.
+    """
+    if tools:
+        tools = tools[:-1] + [{**tools[-1], "cache_control": CACHE_CONTROL}]
+
+    if system:
+        system = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+
+    messages = list(messages)
+    user_indexes = [i for i, message in enumerate(messages) if message["role"] == "user"]
+
+    for index in user_indexes[-MESSAGE_CACHE_BREAKPOINTS:]:
+        content = messages[index]["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content:
+            continue
+
+        content = content[:-1] + [{**content[-1], "cache_control": CACHE_CONTROL}]
+        messages[index] = {**messages[index], "content": content}
+
+    return system, tools, messages
+
+
+def _usage_from(usage) -> Dict[str,int]:
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": getattr(usage, "output_tokens", 0),
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0
+    }
+
+
+def _parse_message(response) -> LLMResponse:
+    content_blocks = []
+
+    for block in response.content:
+        if isinstance(block,TextBlock):
+            content_blocks.append({
+                "type":"text",
+                "text":block.text
+            })
+
+        elif isinstance(block,ToolUseBlock):
+            content_blocks.append({
+                "type":"tool_use",
+                "id": block.id,
+                "name": block.name,
+                "input": block.input
+            })
+
+    return LLMResponse(
+        content=content_blocks,
+        stop_reason=response.stop_reason,
+        usage=_usage_from(response.usage),
+        model=response.model
+    )
+
+
+def _translate_stream_event(builder: ResponseBuilder, event) -> Iterator[StreamEvent]:
+    """Fold one raw SDK stream event into the builder, yielding any events it completes."""
+    if event.type == "message_start":
+        builder.model = event.message.model
+        builder.usage.update(_usage_from(event.message.usage))
+
+    elif event.type == "content_block_start":
+        block = event.content_block
+        if block.type == "tool_use":
+            builder.start_tool_use(event.index, block.id, block.name)
+        elif block.type == "text":
+            builder.append_text(event.index, block.text)
+            if block.text:
+                yield StreamEvent(type="text_delta", text=block.text)
+
+    elif event.type == "content_block_delta":
+        delta = event.delta
+        if delta.type == "text_delta":
+            builder.append_text(event.index, delta.text)
+            yield StreamEvent(type="text_delta", text=delta.text)
+        elif delta.type == "input_json_delta":
+            builder.append_tool_input(event.index, delta.partial_json)
+
+    elif event.type == "content_block_stop":
+        tool_block = builder.finish_block(event.index)
+        if tool_block is not None:
+            yield StreamEvent(type="tool_use", block=tool_block)
+
+    elif event.type == "message_delta":
+        builder.stop_reason = event.delta.stop_reason
+        builder.usage["output_tokens"] = event.usage.output_tokens
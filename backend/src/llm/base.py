@@ -1,54 +1,244 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import List, Dict,Any, Optional, Literal
+from dataclasses import dataclass, field
+from typing import List, Dict,Any, Optional, Literal, Iterator, AsyncIterator, Hashable
 from enum import Enum
+import asyncio
+import json
 
 class LLMProvider(str,Enum):
     ANTHROPIC = "anthropic"
     OPENAI = "openai"
     GEMINI = "gemini"
-    
+
 @dataclass
 class LLMResponse:
     content: List[Dict[str, Any]]
     stop_reason: str
     usage: Dict[str, int]
     model: str
-    
+
     def get_text(self) ->str:
         texts = []
-        
+
         for block in self.content:
             if block.get("type") == "text":
                 texts.append(block.get("text",""))
         return "\n\n".join(texts)
-    
+
     def get_tool_calls(self) -> List[Dict[str,Any]]:
         tools = []
         for block in self.content:
             if block.get("type") == "tool_use":
                 tools.append(block)
-                
+
         return tools
 
+    def prompt_tokens(self) -> int:
+        """Full prompt size. input_tokens only counts the part not served from the prompt cache."""
+        return (
+            self.usage.get("input_tokens", 0)
+            + self.usage.get("cache_creation_input_tokens", 0)
+            + self.usage.get("cache_read_input_tokens", 0)
+        )
+
+
+@dataclass
+class StreamEvent:
+    """One step of a streamed response.
+
+    text_delta carries a piece of text, tool_use carries a tool_use block whose
+    input is complete, and message_stop carries the fully assembled response.
+    The orchestrators add tool_output events, with a piece of a running
+    command's output as text and {"name", "stream"} as block.
+    """
+    type: Literal["text_delta", "tool_use", "message_stop", "tool_output"]
+    text: str = ""
+    block: Optional[Dict[str, Any]] = None
+    response: Optional[LLMResponse] = None
+
+
+class ResponseBuilder:
+    """Assembles an LLMResponse from streamed content block fragments."""
+
+    def __init__(self, model: str = ""):
+        self.model = model
+        self.stop_reason: Optional[str] = None
+        self.usage: Dict[str, int] = {}
+        self._blocks: Dict[Hashable, Dict[str, Any]] = {}
+        self._partial_json: Dict[Hashable, List[str]] = {}
+
+    def append_text(self, key: Hashable, text: str):
+        block = self._blocks.setdefault(key, {"type": "text", "text": ""})
+        block["text"] += text
+
+    def start_tool_use(self, key: Hashable, tool_id: str, name: str):
+        self._blocks[key] = {
+            "type": "tool_use",
+            "id": tool_id,
+            "name": name,
+            "input": {}
+        }
+        self._partial_json[key] = []
+
+    def append_tool_input(self, key: Hashable, partial_json: str):
+        self._partial_json.setdefault(key, []).append(partial_json)
+
+    def finish_block(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Close a block. Returns the tool_use block once its input JSON is complete."""
+        if key not in self._partial_json:
+            return None
+
+        raw_input = "".join(self._partial_json.pop(key))
+        block = self._blocks[key]
+        block["input"] = json.loads(raw_input) if raw_input else {}
+        return block
+
+    def open_tool_keys(self) -> List[Hashable]:
+        return list(self._partial_json.keys())
+
+    def build(self) -> LLMResponse:
+        return LLMResponse(
+            content=list(self._blocks.values()),
+            stop_reason=self.stop_reason or "end_turn",
+            usage=self.usage,
+            model=self.model
+        )
+
+
 class BaseLLMClient(ABC):
+    # Which account-wide limits apply, None for clients that are not a known provider
+    provider: Optional[LLMProvider] = None
+
     def __init__(self,api_key:str,model:str):
         self.api_key = api_key
         self.model = model
-        
+
     @abstractmethod
     def create_message(
         self,
-        message:List[Dict[str,Any]],
+        messages:List[Dict[str,Any]],
         system: str,
         tools:List[Dict[str,Any]],
         max_token: int,
         temperature: float
     ) -> LLMResponse:
-        
+
         pass
-    
+
+    def stream_message(
+        self,
+        messages:List[Dict[str,Any]],
+        system: str,
+        tools:List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> Iterator[StreamEvent]:
+        """Stream a response. Clients without native streaming replay the full response."""
+        response = self.create_message(messages, system, tools, max_token, temperature)
+
+        for block in response.content:
+            if block.get("type") == "text":
+                yield StreamEvent(type="text_delta", text=block.get("text", ""))
+            elif block.get("type") == "tool_use":
+                yield StreamEvent(type="tool_use", block=block)
+
+        yield StreamEvent(type="message_stop", response=response)
+
     @abstractmethod
     def convert_tools_to_provider_format(self, tools:List[Dict[str,Any]]) -> Any:
         pass
-        
\ No newline at end of file
+
+
+class AsyncBaseLLMClient(ABC):
+    provider: Optional[LLMProvider] = None
+
+    def __init__(self,api_key:str,model:str):
+        self.api_key = api_key
+        self.model = model
+
+    @abstractmethod
+    async def create_message(
+        self,
+        messages:List[Dict[str,Any]],
+        system: str,
+        tools:List[Dict[str,Any]],
+        max_token: int,
+        temperature: float
+    ) -> LLMResponse:
+
+        pass
+
+    async def stream_message(
+        self,
+        messages:List[Dict[str,Any]],
+        system: str,
+        tools:List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> AsyncIterator[StreamEvent]:
+        """Stream a response. Clients without native streaming replay the full response."""
+        response = await self.create_message(messages, system, tools, max_token, temperature)
+
+        for block in response.content:
+            if block.get("type") == "text":
+                yield StreamEvent(type="text_delta", text=block.get("text", ""))
+            elif block.get("type") == "tool_use":
+                yield StreamEvent(type="tool_use", block=block)
+
+        yield StreamEvent(type="message_stop", response=response)
+
+    @abstractmethod
+    def convert_tools_to_provider_format(self, tools:List[Dict[str,Any]]) -> Any:
+        pass
+
+
+class ThreadedLLMClient(AsyncBaseLLMClient):
+    """A BaseLLMClient behind the AsyncBaseLLMClient interface.
+
+    Each call, and each step of a stream, runs on a worker thread, so the
+    synchronous Orchestrator can drive any client through the async loop.
+    """
+
+    def __init__(self, client: BaseLLMClient):
+        super().__init__(client.api_key, client.model)
+        self.client = client
+        # Rate limiting is keyed on the wrapped client's provider account
+        self.provider = getattr(client, "provider", None)
+
+    async def create_message(
+        self,
+        messages:List[Dict[str,Any]],
+        system: str,
+        tools:List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        return await asyncio.to_thread(self.client.create_message, messages, system, tools, max_token, temperature)
+
+    async def stream_message(
+        self,
+        messages:List[Dict[str,Any]],
+        system: str,
+        tools:List[Dict[str,Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> AsyncIterator[StreamEvent]:
+        events = self.client.stream_message(messages, system, tools, max_token, temperature)
+        finished = object()
+        stepping = False
+        try:
+            while True:
+                stepping = True
+                event = await asyncio.to_thread(next, events, finished)
+                stepping = False
+                if event is finished:
+                    return
+                yield event
+        finally:
+            # A step still running on its thread when the caller gave up cannot be interrupted
+            close = getattr(events, "close", None)
+            if close and not stepping:
+                close()
+
+    def convert_tools_to_provider_format(self, tools:List[Dict[str,Any]]) -> Any:
+        return self.client.convert_tools_to_provider_format(tools)
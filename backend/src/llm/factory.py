@@ -0,0 +1,46 @@
+from typing import List, Dict, Any, Optional, Union
+
+from .base import BaseLLMClient, AsyncBaseLLMClient, LLMProvider
+from .anthropic_client import AnthropicClient, AsyncAnthropicClient
+from .openai_client import OpenAIClient, AsyncOpenAIClient
+from .router import LLMRouter, AsyncLLMRouter
+
+
+CLIENT_CLASSES = {
+    LLMProvider.ANTHROPIC: (AnthropicClient, AsyncAnthropicClient),
+    LLMProvider.OPENAI: (OpenAIClient, AsyncOpenAIClient),
+}
+
+
+def create_llm_client(
+    provider: Union[LLMProvider, str],
+    api_key: str,
+    model: Optional[str] = None,
+    base_url: Optional[str] = None,
+    asynchronous: bool = False
+) -> Union[BaseLLMClient, AsyncBaseLLMClient]:
+    """Client for one provider, with that provider's default model unless one is given."""
+    provider = LLMProvider(provider)
+    if provider not in CLIENT_CLASSES:
+        raise ValueError(f"Unsupported LLM provider: {provider.value}")
+
+    client_class = CLIENT_CLASSES[provider][1 if asynchronous else 0]
+    options: Dict[str, Any] = {"api_key": api_key, "base_url": base_url}
+    if model:
+        options["model"] = model
+    return client_class(**options)
+
+
+def create_llm_router(
+    providers: List[Dict[str, Any]],
+    asynchronous: bool = False,
+    **router_options
+) -> Union[LLMRouter, AsyncLLMRouter]:
+    """LLMRouter over one client per entry of providers, best first.
+
+    Each entry holds create_llm_client arguments: provider, api_key and
+    optionally model and base_url. router_options go to the router.
+    """
+    clients = [create_llm_client(asynchronous=asynchronous, **spec) for spec in providers]
+    router_class = AsyncLLMRouter if asynchronous else LLMRouter
+    return router_class(clients, **router_options)
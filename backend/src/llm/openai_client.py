@@ -1,92 +1,158 @@
-from typing import List,Dict,Any
+from typing import List,Dict,Any,Iterator,AsyncIterator,Optional
 import logging
 import json
 
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
 except ImportError:
     OpenAI = None
+    AsyncOpenAI = None
     
-from .base import BaseLLMClient, LLMResponse
+from .base import BaseLLMClient, AsyncBaseLLMClient, LLMResponse, LLMProvider, ResponseBuilder, StreamEvent
+from .transport import get_client_registry
 
 logger = logging.getLogger(__name__)
 
-class OpenAIClient(BaseLLMClient):
-    def __init__(self, api_key:str, model:str = "gpt-4-turbo-preview"):
-        if OpenAI is None:
-            raise ImportError("openai package not installed. Install with: pip install openai")
+class OpenAIFormatMixin:
+    """Request building and response parsing shared by the sync and async OpenAI clients."""
+    
+    model: str
+    
+    def _parse_completion(self, response) -> LLMResponse:
+        message = response.choices[0].message
         
-        super().__init__(api_key,model)
-        self.client = OpenAI(api_key=api_key)
-        logger.info(f"OpenAI client initialized with model: {model}")
+        content_blocks = []
         
-    def create_message(
-        self, 
-        messages: List[Dict[str,Any]], 
-        system: str, 
-        tools: List[Dict[str,Any]], 
-        max_token: int = 4096, 
-        temperature: float = 0.7
-        ) -> LLMResponse:
+        if message.content:
+            content_blocks.append({
+                "type":"text",
+                "text":message.content
+            })
         
-        try:
-            openai_messages = self._convert_messages(messages,system)
-            
-            openai_tools = self.convert_tools_to_provider_format(tools) if tools else None
-            
-            kwargs = {
-                "model" : self.model,
-                "messages": openai_messages,
-                "max_token": max_token,
-                "temperature": temperature,
-            }
-            
-            if openai_tools:
-                kwargs["tools"] = openai_tools
-                kwargs["tool_choice"] = "auto"
-                
-            response = self.client.chat.completions.create(**kwargs)
-            
-            message = response.choices[0].message
-            
-            content_blocks = []
-            
-            if message.content:
+        if message.tool_calls:
+            for tool_call in message.tool_calls:
                 content_blocks.append({
-                    "type":"text",
-                    "text":message.content
+                    "type": "tool_use",
+                    "id": tool_call.id,
+                    "name": tool_call.function.name,
+                    "input": json.loads(tool_call.function.arguments)
                 })
+                
+        stop_reason = "end_turn"
+        if message.tool_calls:
+            stop_reason = "tool_use"
+        elif response.choices[0].finish_reason == "length":
+            stop_reason = "max_token"
             
-            if message.tool_calls:
-                for tool_call in message.tool_calls:
-                    content_blocks.append({
-                        "type": "tool_use",
-                        "id": tool_call.id,
-                        "name": tool_call.function.name,
-                        "input": json.loads(tool_call.function.arguments)
-                    })
-                    
-            stop_reason = "end_turn"
-            if message.tool_calls:
-                stop_reason = "tool_use"
-            elif response.choices[0].finish_reason == "length":
-                stop_reason = "max_token"
+        return LLMResponse(
+            content=content_blocks,
+            stop_reason=stop_reason,
+            usage=self._usage_from(response.usage),
+            model= response.model
+        )
+    
+    def _translate_stream_chunk(self, builder: ResponseBuilder, chunk) -> Iterator[StreamEvent]:
+        """Fold one streamed chunk into the builder, yielding any events it completes."""
+        builder.model = chunk.model or builder.model
+        
+        if chunk.usage:
+            builder.usage = self._usage_from(chunk.usage)
+        
+        if not chunk.choices:
+            return
+        
+        choice = chunk.choices[0]
+        delta = choice.delta
+        
+        if delta.content:
+            builder.append_text("text", delta.content)
+            yield StreamEvent(type="text_delta", text=delta.content)
+        
+        for tool_call in delta.tool_calls or []:
+            key = ("tool", tool_call.index)
+            
+            if tool_call.id:
+                # A new tool call starting means every earlier one has all of its arguments
+                for open_key in builder.open_tool_keys():
+                    yield StreamEvent(type="tool_use", block=builder.finish_block(open_key))
+                builder.start_tool_use(key, tool_call.id, tool_call.function.name)
                 
-            return LLMResponse(
-                content=content_blocks,
-                stop_reason=stop_reason,
-                usage={
-                    "input_tokens": response.usage.prompt_tokens,
-                    "output_tokens": response.usage.completion_tokens
-                },
-                model= response.model
-            )
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}",exc_info =True)
-            raise
+            if tool_call.function and tool_call.function.arguments:
+                builder.append_tool_input(key, tool_call.function.arguments)
+        
+        if choice.finish_reason:
+            builder.stop_reason = choice.finish_reason
+            for open_key in builder.open_tool_keys():
+                yield StreamEvent(type="tool_use", block=builder.finish_block(open_key))
+    
+    def _usage_from(self, usage) -> Dict[str,int]:
+        # prompt_tokens includes cached tokens; split them out to match the Anthropic usage keys
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        
+        return {
+            "input_tokens": usage.prompt_tokens - cached_tokens,
+            "output_tokens": usage.completion_tokens,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": cached_tokens
+        }
+    
+    def _finish_stream(self, builder: ResponseBuilder) -> LLMResponse:
+        finish_reason = builder.stop_reason
+        
+        response = builder.build()
+        response.stop_reason = "end_turn"
+        if response.get_tool_calls():
+            response.stop_reason = "tool_use"
+        elif finish_reason == "length":
+            response.stop_reason = "max_token"
+            
+        return response
+    
+    def _build_stream_request(
+        self, 
+        messages: List[Dict[str,Any]], 
+        system: str, 
+        tools: List[Dict[str,Any]], 
+        max_token: int, 
+        temperature: float
+        ) -> Dict[str,Any]:
+        
+        kwargs = self._build_request(messages, system, tools, max_token, temperature)
+        kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
+    
+    def _build_request(
+        self, 
+        messages: List[Dict[str,Any]], 
+        system: str, 
+        tools: List[Dict[str,Any]], 
+        max_token: int, 
+        temperature: float
+        ) -> Dict[str,Any]:
+        
+        # OpenAI caches the longest previously seen request prefix automatically, so
+        # everything ahead of the newest turn must serialize byte-identically each
+        # call: system prompt first, tools in a fixed order, arguments with sorted keys.
+        openai_messages = self._convert_messages(messages,system)
+        
+        openai_tools = self.convert_tools_to_provider_format(tools) if tools else None
+        
+        kwargs = {
+            "model" : self.model,
+            "messages": openai_messages,
+            "max_tokens": max_token,
+            "temperature": temperature,
+        }
+        
+        if openai_tools:
+            kwargs["tools"] = openai_tools
+            kwargs["tool_choice"] = "auto"
             
+        return kwargs
         
-    def _convert_message(self, messages:List[Dict[str,Any]],system:str)-> List[Dict[str,Any]]:
+    def _convert_messages(self, messages:List[Dict[str,Any]],system:str)-> List[Dict[str,Any]]:
         openai_messages = []
         
         if system:
@@ -128,7 +194,7 @@ class OpenAIClient(BaseLLMClient):
                                 "type":"function",
                                 "function":{
                                     "name": block["name"],
-                                    "arguments": json.dumps(block["input"])
+                                    "arguments": json.dumps(block["input"], sort_keys=True)
                                 }
                             })
                             
@@ -153,7 +219,7 @@ class OpenAIClient(BaseLLMClient):
     def convert_tools_to_provider_format(self, tools:List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         openai_tools = []
         
-        for tool in tools:
+        for tool in sorted(tools, key=lambda tool: tool["name"]):
             openai_tools.append({
                 "type":"function",
                 "function": {
@@ -162,4 +228,119 @@ class OpenAIClient(BaseLLMClient):
                     "parameters": tool["input_schema"]
                 }
             })
-        return openai_tools
\ No newline at end of file
+        return openai_tools
+
+
+class OpenAIClient(OpenAIFormatMixin, BaseLLMClient):
+    provider = LLMProvider.OPENAI
+    
+    def __init__(self, api_key:str, model:str = "gpt-4-turbo-preview", base_url:Optional[str] = None):
+        if OpenAI is None:
+            raise ImportError("openai package not installed. Install with: pip install openai")
+        
+        super().__init__(api_key,model)
+        self.base_url = base_url
+        self.client = get_client_registry().get(LLMProvider.OPENAI, api_key, base_url)
+        logger.info(f"OpenAI client initialized with model: {model}")
+        
+    def create_message(
+        self, 
+        messages: List[Dict[str,Any]], 
+        system: str, 
+        tools: List[Dict[str,Any]], 
+        max_token: int = 4096, 
+        temperature: float = 0.7
+        ) -> LLMResponse:
+        
+        try:
+            kwargs = self._build_request(messages, system, tools, max_token, temperature)
+                
+            response = self.client.chat.completions.create(**kwargs)
+            
+            return self._parse_completion(response)
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}",exc_info =True)
+            raise
+    
+    def stream_message(
+        self, 
+        messages: List[Dict[str,Any]], 
+        system: str, 
+        tools: List[Dict[str,Any]], 
+        max_token: int = 4096, 
+        temperature: float = 0.7
+        ) -> Iterator[StreamEvent]:
+        
+        builder = ResponseBuilder(self.model)
+        
+        try:
+            kwargs = self._build_stream_request(messages, system, tools, max_token, temperature)
+            
+            for chunk in self.client.chat.completions.create(**kwargs):
+                yield from self._translate_stream_chunk(builder, chunk)
+            
+            yield StreamEvent(type="message_stop", response=self._finish_stream(builder))
+            
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}",exc_info =True)
+            raise
+
+
+class AsyncOpenAIClient(OpenAIFormatMixin, AsyncBaseLLMClient):
+    provider = LLMProvider.OPENAI
+    
+    def __init__(self, api_key:str, model:str = "gpt-4-turbo-preview", base_url:Optional[str] = None):
+        if AsyncOpenAI is None:
+            raise ImportError("openai package not installed. Install with: pip install openai")
+        
+        super().__init__(api_key,model)
+        self.base_url = base_url
+        logger.info(f"Async OpenAI client initialized with model: {model}")
+    
+    @property
+    def client(self):
+        # Looked up per call, connections belong to the event loop making it
+        return get_client_registry().get(LLMProvider.OPENAI, self.api_key, self.base_url, asynchronous=True)
+        
+    async def create_message(
+        self, 
+        messages: List[Dict[str,Any]], 
+        system: str, 
+        tools: List[Dict[str,Any]], 
+        max_token: int = 4096, 
+        temperature: float = 0.7
+        ) -> LLMResponse:
+        
+        try:
+            kwargs = self._build_request(messages, system, tools, max_token, temperature)
+                
+            response = await self.client.chat.completions.create(**kwargs)
+            
+            return self._parse_completion(response)
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}",exc_info =True)
+            raise
+    
+    async def stream_message(
+        self, 
+        messages: List[Dict[str,Any]], 
+        system: str, 
+        tools: List[Dict[str,Any]], 
+        max_token: int = 4096, 
+        temperature: float = 0.7
+        ) -> AsyncIterator[StreamEvent]:
+        
+        builder = ResponseBuilder(self.model)
+        
+        try:
+            kwargs = self._build_stream_request(messages, system, tools, max_token, temperature)
+            
+            async for chunk in await self.client.chat.completions.create(**kwargs):
+                for stream_event in self._translate_stream_chunk(builder, chunk):
+                    yield stream_event
+            
+            yield StreamEvent(type="message_stop", response=self._finish_stream(builder))
+            
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}",exc_info =True)
+            raise
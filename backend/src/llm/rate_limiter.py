@@ -0,0 +1,401 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from .base import BaseLLMClient, AsyncBaseLLMClient, LLMResponse, LLMProvider, StreamEvent
+from .transport import get_client_registry
+
+logger = logging.getLogger(__name__)
+
+
+# (limit, remaining) header names per provider, for requests and tokens
+RATE_LIMIT_HEADERS = {
+    LLMProvider.ANTHROPIC: {
+        "requests": ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining"),
+        "tokens": ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining"),
+    },
+    LLMProvider.OPENAI: {
+        "requests": ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests"),
+        "tokens": ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens"),
+    },
+}
+
+
+def estimate_request_tokens(
+    messages: List[Dict[str, Any]],
+    system: str,
+    tools: List[Dict[str, Any]],
+    max_token: int
+) -> int:
+    """Tokens a request may use: its prompt at about 4 characters a token, plus the whole output budget."""
+    prompt_chars = len(system) + len(json.dumps(messages, default=str)) + len(json.dumps(tools))
+    return prompt_chars // 4 + max_token
+
+
+def response_tokens(response: LLMResponse) -> int:
+    return response.prompt_tokens() + response.usage.get("output_tokens", 0)
+
+
+class TokenBucket:
+    """Continuously refilling bucket of per_minute units. None means unlimited."""
+
+    def __init__(self, per_minute: Optional[float] = None):
+        self.per_minute = per_minute
+        self.level = per_minute or 0.0
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.per_minute is None:
+            return 0.0
+        self._refill(now)
+        # A request larger than the bucket waits for a full bucket rather than forever
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.per_minute
+
+    def take(self, amount: float):
+        if self.per_minute is not None:
+            self.level -= min(amount, self.per_minute)
+
+    def give_back(self, amount: float):
+        if self.per_minute is not None:
+            self.level = min(self.per_minute, self.level + amount)
+
+    def set_limit(self, limit: float, remaining: Optional[float], now: float):
+        if self.per_minute is None:
+            self.level = limit
+            self.updated = now
+        else:
+            self._refill(now)
+        self.per_minute = limit
+        self.level = min(self.level, limit)
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+    def _refill(self, now: float):
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+
+@dataclass
+class Permit:
+    session: str
+    tokens: int
+    waited: float = 0.0
+
+
+@dataclass(eq=False)
+class _Waiter:
+    session: str
+    tokens: int
+    enqueued_at: float
+    event: Optional[threading.Event] = None
+    future: Optional[asyncio.Future] = None
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    permit: Optional[Permit] = None
+
+
+class RateLimiter:
+    """Client-side requests-per-minute and tokens-per-minute limits for one provider account.
+
+    Callers acquire a permit before each request, reserving one request and
+    an estimate of its tokens, and settle it afterwards with the tokens
+    actually used. Waiting callers are queued per session and served round
+    robin, so one busy session cannot starve the others.
+
+    Limits start out unknown (unlimited) unless given, and follow the
+    provider's rate-limit headers as responses arrive; a 429 pauses all
+    grants for its retry-after. Sync and async callers share one limiter.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self.granted = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def acquire(self, session: str, tokens: int) -> Permit:
+        waiter = _Waiter(session, tokens, time.monotonic(), event=threading.Event())
+        self._enqueue(waiter)
+        waiter.event.wait()
+        return waiter.permit
+
+    async def aacquire(self, session: str, tokens: int) -> Permit:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(session, tokens, time.monotonic(), future=loop.create_future(), loop=loop)
+        self._enqueue(waiter)
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+
+    def settle(self, permit: Permit, used_tokens: int):
+        """Correct the token reservation once the real usage is known."""
+        with self._lock:
+            if used_tokens < permit.tokens:
+                self.tokens.give_back(permit.tokens - used_tokens)
+            else:
+                self.tokens.take(used_tokens - permit.tokens)
+            self._dispatch()
+
+    def update_from_headers(self, provider: LLMProvider, status_code: int, headers):
+        names = RATE_LIMIT_HEADERS.get(provider, {})
+        now = time.monotonic()
+
+        with self._lock:
+            for bucket, (limit_name, remaining_name) in zip((self.requests, self.tokens), names.values()):
+                limit = _header_number(headers, limit_name)
+                if limit:
+                    bucket.set_limit(limit, _header_number(headers, remaining_name), now)
+
+            if status_code == 429:
+                self.throttled += 1
+                retry_after = _header_number(headers, "retry-after") or 1.0
+                self.paused_until = max(self.paused_until, now + retry_after)
+                logger.warning(f"Rate limited by provider, pausing requests for {retry_after}s")
+
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests.per_minute,
+                "tokens_per_minute": self.tokens.per_minute,
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+                "sessions_waiting": len(self._queues),
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            self._queues.setdefault(waiter.session, deque()).append(waiter)
+            self._dispatch()
+
+    def _cancel(self, waiter: _Waiter):
+        with self._lock:
+            if waiter.permit is not None:
+                # Granted as the caller gave up, hand the reservation back
+                self.requests.give_back(1)
+                self.tokens.give_back(waiter.tokens)
+            else:
+                queue = self._queues.get(waiter.session)
+                if queue and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[waiter.session]
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant permits round robin by session while the buckets allow. Called with the lock held."""
+        now = time.monotonic()
+        while self._queues:
+            if now < self.paused_until:
+                self._schedule(self.paused_until - now)
+                return
+
+            session, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(waiter.tokens, now))
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            queue.popleft()
+            # The session goes to the back of the line
+            del self._queues[session]
+            if queue:
+                self._queues[session] = queue
+
+            waited = now - waiter.enqueued_at
+            self.granted += 1
+            self.waited_seconds += waited
+            waiter.permit = Permit(session=session, tokens=waiter.tokens, waited=waited)
+            if waiter.event is not None:
+                waiter.event.set()
+            else:
+                try:
+                    waiter.loop.call_soon_threadsafe(_resolve, waiter.future, waiter.permit)
+                except RuntimeError:
+                    # The waiting loop is gone
+                    self.requests.give_back(1)
+                    self.tokens.give_back(waiter.tokens)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+
+def _resolve(future: asyncio.Future, permit: Permit):
+    if not future.done():
+        future.set_result(permit)
+
+
+def _header_number(headers, name: str) -> Optional[float]:
+    try:
+        value = headers.get(name)
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters: Dict[Tuple[Optional[LLMProvider], str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter_key(provider: Optional[LLMProvider], api_key: str) -> Tuple[Optional[LLMProvider], str]:
+    return provider, hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def get_rate_limiter(provider: Optional[LLMProvider], api_key: str) -> RateLimiter:
+    """The limiter shared by every client using this provider account."""
+    key = _limiter_key(provider, api_key)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter()
+            _limiters[key] = limiter
+        return limiter
+
+
+def _observe_response(response):
+    """Feed rate-limit headers from the shared HTTP pool to the account's limiter."""
+    request_headers = response.request.headers
+    if "x-api-key" in request_headers:
+        provider, api_key = LLMProvider.ANTHROPIC, request_headers["x-api-key"]
+    elif request_headers.get("authorization", "").startswith("Bearer "):
+        provider, api_key = LLMProvider.OPENAI, request_headers["authorization"][len("Bearer "):]
+    else:
+        return
+
+    with _limiters_lock:
+        limiter = _limiters.get(_limiter_key(provider, api_key))
+    if limiter is not None:
+        limiter.update_from_headers(provider, response.status_code, response.headers)
+
+
+get_client_registry().add_response_observer(_observe_response)
+
+
+class _RateLimitedMixin:
+    def _setup_limiter(self, client, limiter: Optional[RateLimiter], session: Optional[str]):
+        self.client = client
+        self.limiter = limiter or get_rate_limiter(getattr(client, "provider", None), client.api_key)
+        self.session = session or f"client-{id(self):x}"
+
+    def convert_tools_to_provider_format(self, tools: List[Dict[str, Any]]) -> Any:
+        return self.client.convert_tools_to_provider_format(tools)
+
+
+class RateLimitedLLMClient(_RateLimitedMixin, BaseLLMClient):
+    """Wraps a client so each call first waits for a permit from the account's RateLimiter.
+
+    Each wrapper is one session for fair queueing; sessions default to the
+    wrapper itself, so every orchestrator gets its own place in line.
+    """
+
+    def __init__(self, client: BaseLLMClient, limiter: Optional[RateLimiter] = None, session: Optional[str] = None):
+        super().__init__(client.api_key, client.model)
+        self._setup_limiter(client, limiter, session)
+
+    def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        permit = self.limiter.acquire(self.session, estimate_request_tokens(messages, system, tools, max_token))
+        used = 0
+        try:
+            response = self.client.create_message(messages, system, tools, max_token, temperature)
+            used = response_tokens(response)
+            return response
+        finally:
+            self.limiter.settle(permit, used)
+
+    def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> Iterator[StreamEvent]:
+        permit = self.limiter.acquire(self.session, estimate_request_tokens(messages, system, tools, max_token))
+        used = 0
+        try:
+            for event in self.client.stream_message(messages, system, tools, max_token, temperature):
+                if event.type == "message_stop":
+                    used = response_tokens(event.response)
+                yield event
+        finally:
+            self.limiter.settle(permit, used)
+
+
+class AsyncRateLimitedLLMClient(_RateLimitedMixin, AsyncBaseLLMClient):
+    """RateLimitedLLMClient for AsyncBaseLLMClient."""
+
+    def __init__(self, client: AsyncBaseLLMClient, limiter: Optional[RateLimiter] = None, session: Optional[str] = None):
+        super().__init__(client.api_key, client.model)
+        self._setup_limiter(client, limiter, session)
+
+    async def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        permit = await self.limiter.aacquire(self.session, estimate_request_tokens(messages, system, tools, max_token))
+        used = 0
+        try:
+            response = await self.client.create_message(messages, system, tools, max_token, temperature)
+            used = response_tokens(response)
+            return response
+        finally:
+            self.limiter.settle(permit, used)
+
+    async def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> AsyncIterator[StreamEvent]:
+        permit = await self.limiter.aacquire(self.session, estimate_request_tokens(messages, system, tools, max_token))
+        used = 0
+        try:
+            async for event in self.client.stream_message(messages, system, tools, max_token, temperature):
+                if event.type == "message_stop":
+                    used = response_tokens(event.response)
+                yield event
+        finally:
+            self.limiter.settle(permit, used)
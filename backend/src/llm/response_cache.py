@@ -0,0 +1,318 @@
+from collections import OrderedDict
+from dataclasses import asdict
+from enum import Enum
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from .base import BaseLLMClient, AsyncBaseLLMClient, LLMResponse, StreamEvent
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_VERSION = 1
+MAX_CACHE_ENTRIES = 10000
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class CacheMode(str, Enum):
+    # Serve and store deterministic (temperature 0) requests
+    READ_WRITE = "read_write"
+    # Store every response, whatever the temperature, without serving any
+    RECORD = "record"
+    # Serve every request from the cache and never call the provider
+    REPLAY = "replay"
+
+
+class ReplayMissError(Exception):
+    """A replayed run made a request that was never recorded"""
+
+
+def default_cache_dir() -> Path:
+    root = Path(os.environ.get("KLIX_CACHE_DIR", Path.home() / ".cache" / "klix_code"))
+    return root / "llm_responses"
+
+
+def request_fingerprint(
+    model: str,
+    messages: List[Dict[str, Any]],
+    system: str,
+    tools: List[Dict[str, Any]],
+    max_token: int,
+    temperature: float
+) -> str:
+    """Stable hash of everything that determines a response."""
+    request = {
+        "version": CACHE_VERSION,
+        "model": model,
+        "system": system,
+        "tools": tools,
+        "messages": messages,
+        "max_token": max_token,
+        "temperature": temperature,
+    }
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk LLM responses, one JSON file per request fingerprint.
+
+    The least recently used entries are evicted once there are more than
+    max_entries of them or they take more than max_bytes. Recency is the
+    file mtime, touched on every hit, so it survives restarts and is shared
+    by processes using the same directory. Writes go through a temporary
+    file and a rename, so a reader never sees half an entry.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_entries: int = MAX_CACHE_ENTRIES,
+        max_bytes: int = MAX_CACHE_BYTES
+    ):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # fingerprint -> entry size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def get(self, key: str) -> Optional[LLMResponse]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return LLMResponse(**data["response"])
+
+    def put(self, key: str, response: LLMResponse):
+        path = self._path(key)
+        data = json.dumps({"version": CACHE_VERSION, "response": asdict(response)}, ensure_ascii=False)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".tmp{os.getpid()}.{threading.get_ident()}")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not store LLM response in cache: {e}")
+            return
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        if not self.cache_dir.is_dir():
+            return
+
+        found: List[Tuple[int, str, int]] = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime_ns, path.stem, stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+
+_caches: Dict[Path, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(cache_dir: Optional[Path] = None) -> ResponseCache:
+    """The ResponseCache shared by every client caching into this directory."""
+    cache_dir = (cache_dir or default_cache_dir()).resolve()
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = ResponseCache(cache_dir)
+            _caches[cache_dir] = cache
+        return cache
+
+
+class _CachingMixin:
+    """Which requests the cache answers or records, shared by the sync and async wrappers."""
+
+    def _setup_cache(self, client, cache: Optional[ResponseCache], mode: CacheMode):
+        self.client = client
+        self.cache = cache or get_response_cache()
+        self.mode = CacheMode(mode)
+
+    def _cache_key(self, messages, system, tools, max_token, temperature) -> Optional[str]:
+        if self.mode == CacheMode.READ_WRITE and temperature != 0:
+            return None
+        return request_fingerprint(self.model, messages, system, tools, max_token, temperature)
+
+    def _cached(self, key: Optional[str]) -> Optional[LLMResponse]:
+        if key is None or self.mode == CacheMode.RECORD:
+            return None
+
+        response = self.cache.get(key)
+        if response is None and self.mode == CacheMode.REPLAY:
+            raise ReplayMissError(f"No recorded response for request {key[:16]}")
+        return response
+
+    def _store(self, key: Optional[str], response: LLMResponse):
+        if key is not None and self.mode != CacheMode.REPLAY:
+            self.cache.put(key, response)
+
+    def convert_tools_to_provider_format(self, tools: List[Dict[str, Any]]) -> Any:
+        return self.client.convert_tools_to_provider_format(tools)
+
+
+def _replay_events(response: LLMResponse) -> Iterator[StreamEvent]:
+    for block in response.content:
+        if block.get("type") == "text":
+            yield StreamEvent(type="text_delta", text=block.get("text", ""))
+        elif block.get("type") == "tool_use":
+            yield StreamEvent(type="tool_use", block=block)
+
+    yield StreamEvent(type="message_stop", response=response)
+
+
+class CachingLLMClient(_CachingMixin, BaseLLMClient):
+    """Wraps a client with a ResponseCache.
+
+    In read_write mode only temperature 0 requests are cached, since anything
+    else is meant to vary between runs. record and replay cache every request
+    and together make a deterministic record/replay layer: record a run once
+    against the provider, then replay it as often as needed without network
+    access, failing loudly on any request that was not recorded.
+    """
+
+    def __init__(
+        self,
+        client: BaseLLMClient,
+        cache: Optional[ResponseCache] = None,
+        mode: CacheMode = CacheMode.READ_WRITE
+    ):
+        super().__init__(client.api_key, client.model)
+        self._setup_cache(client, cache, mode)
+
+    def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        key = self._cache_key(messages, system, tools, max_token, temperature)
+        response = self._cached(key)
+        if response is None:
+            response = self.client.create_message(messages, system, tools, max_token, temperature)
+            self._store(key, response)
+        return response
+
+    def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> Iterator[StreamEvent]:
+        key = self._cache_key(messages, system, tools, max_token, temperature)
+        response = self._cached(key)
+        if response is not None:
+            yield from _replay_events(response)
+            return
+
+        for event in self.client.stream_message(messages, system, tools, max_token, temperature):
+            if event.type == "message_stop":
+                self._store(key, event.response)
+            yield event
+
+
+class AsyncCachingLLMClient(_CachingMixin, AsyncBaseLLMClient):
+    """CachingLLMClient for AsyncBaseLLMClient."""
+
+    def __init__(
+        self,
+        client: AsyncBaseLLMClient,
+        cache: Optional[ResponseCache] = None,
+        mode: CacheMode = CacheMode.READ_WRITE
+    ):
+        super().__init__(client.api_key, client.model)
+        self._setup_cache(client, cache, mode)
+
+    async def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        key = self._cache_key(messages, system, tools, max_token, temperature)
+        response = self._cached(key)
+        if response is None:
+            response = await self.client.create_message(messages, system, tools, max_token, temperature)
+            self._store(key, response)
+        return response
+
+    async def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> AsyncIterator[StreamEvent]:
+        key = self._cache_key(messages, system, tools, max_token, temperature)
+        response = self._cached(key)
+        if response is not None:
+            for event in _replay_events(response):
+                yield event
+            return
+
+        async for event in self.client.stream_message(messages, system, tools, max_token, temperature):
+            if event.type == "message_stop":
+                self._store(key, event.response)
+            yield event
@@ -0,0 +1,496 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Callable
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from .base import BaseLLMClient, AsyncBaseLLMClient, LLMResponse, StreamEvent
+
+logger = logging.getLogger(__name__)
+
+
+# Errors worth trying another provider for; anything else would fail there too
+FAILOVER_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+LATENCY_WINDOW = 100
+ERROR_WINDOW = 50
+# p95 is only trusted after this many samples, hedge_after is used before that
+MIN_LATENCY_SAMPLES = 10
+
+FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 30.0
+# Hedge a complete response or a stream's first event after this long without p95 data
+HEDGE_AFTER = 20.0
+MIN_HEDGE_DELAY = 0.5
+
+
+def should_fail_over(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code in FAILOVER_STATUS_CODES
+
+
+class ProviderHealth:
+    """Recent latency and errors of one client, plus its circuit breaker.
+
+    Latencies are kept separately for complete responses and for the first
+    event of a stream. failure_threshold consecutive failures open the
+    circuit; after cooldown seconds it half-opens, and the next outcome
+    closes it again or restarts the cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies: Dict[str, deque] = {
+            "response": deque(maxlen=LATENCY_WINDOW),
+            "first_event": deque(maxlen=LATENCY_WINDOW),
+        }
+        self.outcomes: deque = deque(maxlen=ERROR_WINDOW)
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def record_success(self, kind: str, latency: float):
+        with self._lock:
+            self.latencies[kind].append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            if self.opened_at is not None:
+                logger.info(f"Circuit for {self.name} closed")
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (
+                self.opened_at is None and self.consecutive_failures >= self.failure_threshold
+            ):
+                logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self.opened_at = time.monotonic()
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, kind: str, fraction: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies[kind])
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "p50": self.percentile("response", 0.5),
+            "p95": self.percentile("response", 0.95),
+            "first_event_p95": self.percentile("first_event", 0.95),
+        }
+
+
+class _RouterMixin:
+    """Ranking and health bookkeeping shared by the sync and async routers."""
+
+    def _setup_router(
+        self,
+        clients: List[Any],
+        hedge: bool,
+        hedge_after: float,
+        failure_threshold: int,
+        cooldown: float
+    ):
+        if not clients:
+            raise ValueError("LLMRouter needs at least one client")
+        self.clients = clients
+        # A rate limiter around the router is keyed on the primary client's account, and
+        # needs its provider to pick up that account's rate-limit headers
+        self.provider = getattr(clients[0], "provider", None)
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.health = [
+            ProviderHealth(f"{type(client).__name__}:{client.model}", failure_threshold, cooldown)
+            for client in clients
+        ]
+
+    def _ranked(self, kind: str) -> List[int]:
+        """Client indexes best first: open circuits last, then by median latency weighted by error rate.
+
+        A client without enough samples is assumed as fast as the best known
+        one, so the configured order decides until there is data.
+        """
+        medians = [health.percentile(kind, 0.5) for health in self.health]
+        known = [median for median in medians if median is not None]
+        neutral = min(known) if known else 0.0
+
+        def key(index: int):
+            health = self.health[index]
+            median = medians[index] if medians[index] is not None else neutral
+            return (health.state == "open", median * (1 + 4 * health.error_rate()))
+
+        return sorted(range(len(self.clients)), key=key)
+
+    def _hedge_delay(self, index: int, kind: str) -> float:
+        p95 = self.health[index].percentile(kind, 0.95)
+        return max(p95, MIN_HEDGE_DELAY) if p95 is not None else self.hedge_after
+
+    def _attempts(self, kind: str) -> Iterator[List[int]]:
+        """Groups of client indexes to try in turn: a primary plus, when hedging, its backup."""
+        ranked = self._ranked(kind)
+        step = 2 if self.hedge and len(ranked) > 1 else 1
+        for start in range(0, len(ranked), step):
+            yield ranked[start:start + step]
+
+    def router_stats(self) -> List[Dict[str, Any]]:
+        return [dict(health.stats(), client=health.name) for health in self.health]
+
+    def convert_tools_to_provider_format(self, tools: List[Dict[str, Any]]) -> Any:
+        return tools
+
+
+class LLMRouter(_RouterMixin, BaseLLMClient):
+    """One client over several, picking by health and hedging slow requests.
+
+    Each call goes to the healthiest client: lowest median latency weighted
+    by recent error rate, with open circuit breakers tried last. With
+    hedge=True, a request still unanswered after the client's p95 latency
+    is duplicated to the next best client and whichever succeeds first
+    wins. Failures that another provider might not share (overload, rate
+    limits, 5xx, connection errors) fail over down the ranking; others are
+    raised at once.
+
+    Streams are hedged on their first event. Once an event has been passed
+    on the stream is committed to that client and is never switched.
+    """
+
+    def __init__(
+        self,
+        clients: List[BaseLLMClient],
+        hedge: bool = True,
+        hedge_after: float = HEDGE_AFTER,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        cooldown: float = CIRCUIT_COOLDOWN,
+        max_workers: int = 64
+    ):
+        super().__init__(clients[0].api_key if clients else "", clients[0].model if clients else "")
+        self._setup_router(clients, hedge, hedge_after, failure_threshold, cooldown)
+        # Calls and stream pumps run here, including the losing side of a hedge until it finishes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+    def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        last_error: Optional[Exception] = None
+
+        call = lambda index: self._executor.submit(
+            self._timed_call, index, messages, system, tools, max_token, temperature
+        )
+
+        for group in self._attempts("response"):
+            futures = {call(group[0]): group[0]}
+            deadline = time.monotonic() + self._hedge_delay(group[0], "response") if len(group) > 1 else None
+
+            while futures:
+                timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"Hedging slow request to {self.health[group[0]].name} with {self.health[group[1]].name}")
+                    futures[call(group[1])] = group[1]
+                    deadline = None
+                    continue
+
+                for future in done:
+                    index = futures.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        if not should_fail_over(e):
+                            raise
+                        logger.warning(f"{self.health[index].name} failed, failing over: {e}")
+                        last_error = e
+                        if deadline is not None:
+                            # The primary failed before the hedge was due, start the backup now
+                            futures[call(group[1])] = group[1]
+                            deadline = None
+
+        raise last_error
+
+    def _timed_call(self, index: int, messages, system, tools, max_token, temperature) -> LLMResponse:
+        started = time.monotonic()
+        try:
+            response = self.clients[index].create_message(messages, system, tools, max_token, temperature)
+        except Exception as e:
+            if should_fail_over(e):
+                self.health[index].record_failure()
+            raise
+        self.health[index].record_success("response", time.monotonic() - started)
+        return response
+
+    def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> Iterator[StreamEvent]:
+        last_error: Optional[Exception] = None
+        start_stream = lambda client: client.stream_message(messages, system, tools, max_token, temperature)
+
+        for group in self._attempts("first_event"):
+            items: "queue.Queue" = queue.Queue()
+            pumps = {group[0]: self._start_pump(group[0], start_stream, items)}
+            deadline = time.monotonic() + self._hedge_delay(group[0], "first_event") if len(group) > 1 else None
+
+            try:
+                winner = None
+                while winner is None and pumps:
+                    try:
+                        timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                        index, kind, payload = items.get(timeout=timeout)
+                    except queue.Empty:
+                        logger.info(f"Hedging slow stream from {self.health[group[0]].name} with {self.health[group[1]].name}")
+                        pumps[group[1]] = self._start_pump(group[1], start_stream, items)
+                        deadline = None
+                        continue
+
+                    if index not in pumps:
+                        continue
+                    if kind == "error":
+                        del pumps[index]
+                        if not should_fail_over(payload):
+                            raise payload
+                        logger.warning(f"{self.health[index].name} failed, failing over: {payload}")
+                        last_error = payload
+                        if deadline is not None:
+                            # The primary failed before the hedge was due, start the backup now
+                            pumps[group[1]] = self._start_pump(group[1], start_stream, items)
+                            deadline = None
+                    else:
+                        winner = index
+                        for other in [other for other in pumps if other != index]:
+                            pumps.pop(other).set()
+
+                if winner is None:
+                    continue
+
+                while kind != "end":
+                    if kind == "error":
+                        raise payload
+                    yield payload
+                    index, kind, payload = items.get()
+                    while index != winner:
+                        index, kind, payload = items.get()
+                return
+
+            finally:
+                # Also stops the winner when the caller abandons the stream
+                for cancelled in pumps.values():
+                    cancelled.set()
+
+        raise last_error
+
+    def _start_pump(self, index: int, start_stream: Callable, items: "queue.Queue") -> threading.Event:
+        cancelled = threading.Event()
+        self._executor.submit(self._pump, index, start_stream, items, cancelled)
+        return cancelled
+
+    def _pump(self, index: int, start_stream: Callable, items: "queue.Queue", cancelled: threading.Event):
+        started = time.monotonic()
+        first = True
+        try:
+            stream = start_stream(self.clients[index])
+            try:
+                for event in stream:
+                    if first:
+                        self.health[index].record_success("first_event", time.monotonic() - started)
+                        first = False
+                    if cancelled.is_set():
+                        return
+                    items.put((index, "event", event))
+            finally:
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+            items.put((index, "end", None))
+        except Exception as e:
+            if should_fail_over(e):
+                self.health[index].record_failure()
+            items.put((index, "error", e))
+
+
+class AsyncLLMRouter(_RouterMixin, AsyncBaseLLMClient):
+    """LLMRouter for AsyncBaseLLMClient. The losing side of a hedge is cancelled."""
+
+    def __init__(
+        self,
+        clients: List[AsyncBaseLLMClient],
+        hedge: bool = True,
+        hedge_after: float = HEDGE_AFTER,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        cooldown: float = CIRCUIT_COOLDOWN
+    ):
+        super().__init__(clients[0].api_key if clients else "", clients[0].model if clients else "")
+        self._setup_router(clients, hedge, hedge_after, failure_threshold, cooldown)
+
+    async def create_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> LLMResponse:
+        last_error: Optional[Exception] = None
+
+        call = lambda index: asyncio.create_task(
+            self._timed_call(index, messages, system, tools, max_token, temperature)
+        )
+
+        for group in self._attempts("response"):
+            tasks = {call(group[0]): group[0]}
+            deadline = time.monotonic() + self._hedge_delay(group[0], "response") if len(group) > 1 else None
+            try:
+                while tasks:
+                    timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                    done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        logger.info(f"Hedging slow request to {self.health[group[0]].name} with {self.health[group[1]].name}")
+                        tasks[call(group[1])] = group[1]
+                        deadline = None
+                        continue
+
+                    for task in done:
+                        index = tasks.pop(task)
+                        try:
+                            return task.result()
+                        except Exception as e:
+                            if not should_fail_over(e):
+                                raise
+                            logger.warning(f"{self.health[index].name} failed, failing over: {e}")
+                            last_error = e
+                            if deadline is not None:
+                                tasks[call(group[1])] = group[1]
+                                deadline = None
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        raise last_error
+
+    async def _timed_call(self, index: int, messages, system, tools, max_token, temperature) -> LLMResponse:
+        started = time.monotonic()
+        try:
+            response = await self.clients[index].create_message(messages, system, tools, max_token, temperature)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if should_fail_over(e):
+                self.health[index].record_failure()
+            raise
+        self.health[index].record_success("response", time.monotonic() - started)
+        return response
+
+    async def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str,
+        tools: List[Dict[str, Any]],
+        max_token: int = 4096,
+        temperature: float = 0.7
+    ) -> AsyncIterator[StreamEvent]:
+        last_error: Optional[Exception] = None
+
+        for group in self._attempts("first_event"):
+            items: "asyncio.Queue" = asyncio.Queue()
+            pumps = {group[0]: asyncio.create_task(self._pump(group[0], items, messages, system, tools, max_token, temperature))}
+            deadline = time.monotonic() + self._hedge_delay(group[0], "first_event") if len(group) > 1 else None
+
+            try:
+                winner = None
+                while winner is None and pumps:
+                    try:
+                        timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                        index, kind, payload = await asyncio.wait_for(items.get(), timeout)
+                    except asyncio.TimeoutError:
+                        logger.info(f"Hedging slow stream from {self.health[group[0]].name} with {self.health[group[1]].name}")
+                        pumps[group[1]] = asyncio.create_task(
+                            self._pump(group[1], items, messages, system, tools, max_token, temperature)
+                        )
+                        deadline = None
+                        continue
+
+                    if index not in pumps:
+                        continue
+                    if kind == "error":
+                        del pumps[index]
+                        if not should_fail_over(payload):
+                            raise payload
+                        logger.warning(f"{self.health[index].name} failed, failing over: {payload}")
+                        last_error = payload
+                        if deadline is not None:
+                            pumps[group[1]] = asyncio.create_task(
+                                self._pump(group[1], items, messages, system, tools, max_token, temperature)
+                            )
+                            deadline = None
+                    else:
+                        winner = index
+                        for other, task in list(pumps.items()):
+                            if other != index:
+                                task.cancel()
+                                del pumps[other]
+
+                if winner is None:
+                    continue
+
+                while kind != "end":
+                    if kind == "error":
+                        raise payload
+                    yield payload
+                    index, kind, payload = await items.get()
+                    while index != winner:
+                        index, kind, payload = await items.get()
+                return
+
+            finally:
+                for task in pumps.values():
+                    task.cancel()
+
+        raise last_error
+
+    async def _pump(self, index: int, items: "asyncio.Queue", messages, system, tools, max_token, temperature):
+        started = time.monotonic()
+        first = True
+        try:
+            async for event in self.clients[index].stream_message(messages, system, tools, max_token, temperature):
+                if first:
+                    self.health[index].record_success("first_event", time.monotonic() - started)
+                    first = False
+                items.put_nowait((index, "event", event))
+            items.put_nowait((index, "end", None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if should_fail_over(e):
+                self.health[index].record_failure()
+            items.put_nowait((index, "error", e))
@@ -0,0 +1,209 @@
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, List, Callable
+import asyncio
+import atexit
+import hashlib
+import importlib.util
+import logging
+import threading
+import weakref
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .base import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolConfig:
+    """Connection pool shared by every LLM client in the process."""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    # Needs the h2 package, plain HTTP/1.1 keep-alive is used without it
+    http2: bool = True
+    connect_timeout: float = 10.0
+    # Long enough for a full non-streaming response
+    read_timeout: float = 600.0
+
+
+class _PoolCounters:
+    """Request counters fed by httpx event hooks, which also pass each response on to observers."""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.observers: List[Callable[[Any], None]] = []
+        self._lock = threading.Lock()
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, response):
+        with self._lock:
+            self.responses += 1
+        for observer in self.observers:
+            try:
+                observer(response)
+            except Exception as e:
+                logger.warning(f"Response observer failed: {e}")
+
+    async def aon_request(self, request):
+        self.on_request(request)
+
+    async def aon_response(self, response):
+        self.on_response(response)
+
+
+def _pool_connections(http_client) -> list:
+    # httpx does not expose its pool; httpcore's ConnectionPool lists its connections
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    return list(getattr(pool, "connections", []) or [])
+
+
+class ClientRegistry:
+    """Process-wide provider SDK clients on one tuned HTTP connection pool.
+
+    SDK clients are shared per (provider, API key, base URL), so every
+    orchestrator, router and planner step talking to the same endpoint
+    reuses the same keep-alive connections instead of paying a new TLS
+    handshake per session. Sync clients share one httpx.Client. Async
+    connections cannot cross event loops, so each running loop gets its own
+    httpx.AsyncClient and SDK clients, released together with the loop.
+
+    base_url makes it possible to point everything at a local mock server.
+    """
+
+    def __init__(self, pool: Optional[PoolConfig] = None):
+        self.pool = pool or PoolConfig()
+        self.counters = _PoolCounters()
+        self._http_client = None
+        self._clients: Dict[Tuple, Any] = {}
+        # event loop -> (httpx.AsyncClient, {key: SDK client})
+        self._loops: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def add_response_observer(self, observer: Callable[[Any], None]):
+        """Call observer with every httpx.Response received through the shared pools."""
+        self.counters.observers.append(observer)
+
+    def configure(self, pool: PoolConfig):
+        """Use new pool limits. Clients handed out before keep their old pool."""
+        with self._lock:
+            self.pool = pool
+            self._http_client = None
+            self._clients = {}
+            self._loops = weakref.WeakKeyDictionary()
+
+    def get(self, provider: LLMProvider, api_key: str, base_url: Optional[str] = None, asynchronous: bool = False):
+        key = (LLMProvider(provider), hashlib.sha256(api_key.encode("utf-8")).hexdigest(), base_url)
+
+        with self._lock:
+            if not asynchronous:
+                client = self._clients.get(key)
+                if client is None:
+                    if self._http_client is None and httpx is not None:
+                        self._http_client = httpx.Client(**self._http_options(asynchronous=False))
+                    client = _create_sdk_client(key[0], api_key, base_url, self._http_client, asynchronous=False)
+                    self._clients[key] = client
+                return client
+
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Not inside a loop, so nothing to share the connections with
+                return _create_sdk_client(key[0], api_key, base_url, None, asynchronous=True)
+
+            http_client, clients = self._loops.get(loop, (None, None))
+            if clients is None:
+                if httpx is not None:
+                    http_client = httpx.AsyncClient(**self._http_options(asynchronous=True))
+                clients = {}
+                self._loops[loop] = (http_client, clients)
+
+            client = clients.get(key)
+            if client is None:
+                client = _create_sdk_client(key[0], api_key, base_url, http_client, asynchronous=True)
+                clients[key] = client
+            return client
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            http_clients = [self._http_client] if self._http_client is not None else []
+            http_clients += [http_client for http_client, _ in self._loops.values() if http_client is not None]
+            sdk_clients = len(self._clients) + sum(len(clients) for _, clients in self._loops.values())
+
+        connections = [conn for http_client in http_clients for conn in _pool_connections(http_client)]
+        return {
+            "http2": self._http2_enabled(),
+            "max_connections": self.pool.max_connections,
+            "max_keepalive_connections": self.pool.max_keepalive_connections,
+            "sdk_clients": sdk_clients,
+            "http_clients": len(http_clients),
+            "connections": len(connections),
+            "idle_connections": sum(1 for conn in connections if conn.is_idle()),
+            "requests": self.counters.requests,
+            "in_flight": self.counters.requests - self.counters.responses,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._clients = {}
+
+    def _http2_enabled(self) -> bool:
+        return self.pool.http2 and importlib.util.find_spec("h2") is not None
+
+    def _http_options(self, asynchronous: bool) -> Dict[str, Any]:
+        if self.pool.http2 and not self._http2_enabled():
+            logger.info("h2 is not installed, LLM clients fall back to HTTP/1.1 keep-alive")
+
+        counters = self.counters
+        hooks = (
+            {"request": [counters.aon_request], "response": [counters.aon_response]}
+            if asynchronous else
+            {"request": [counters.on_request], "response": [counters.on_response]}
+        )
+        return {
+            "http2": self._http2_enabled(),
+            "limits": httpx.Limits(
+                max_connections=self.pool.max_connections,
+                max_keepalive_connections=self.pool.max_keepalive_connections,
+                keepalive_expiry=self.pool.keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(self.pool.read_timeout, connect=self.pool.connect_timeout),
+            "event_hooks": hooks,
+        }
+
+
+def _create_sdk_client(provider: LLMProvider, api_key: str, base_url: Optional[str], http_client, asynchronous: bool):
+    options: Dict[str, Any] = {"api_key": api_key}
+    if base_url:
+        options["base_url"] = base_url
+    if http_client is not None:
+        options["http_client"] = http_client
+
+    if provider == LLMProvider.ANTHROPIC:
+        from anthropic import Anthropic, AsyncAnthropic
+        return (AsyncAnthropic if asynchronous else Anthropic)(**options)
+
+    if provider == LLMProvider.OPENAI:
+        from openai import OpenAI, AsyncOpenAI
+        return (AsyncOpenAI if asynchronous else OpenAI)(**options)
+
+    raise ValueError(f"No shared transport for provider: {provider}")
+
+
+_registry = ClientRegistry()
+atexit.register(_registry.close)
+
+
+def get_client_registry() -> ClientRegistry:
+    return _registry
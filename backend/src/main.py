@@ -1,9 +1,11 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 from .core.config import settings
-from .core.database import init_db
+from .core.database import init_db, check_database
+from .core.metrics import PrometheusMiddleware, metrics_response
 from .auth.routes import router as auth_router
 
 # Initialize FastAPI app
@@ -23,6 +25,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record request metrics
+app.add_middleware(PrometheusMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -44,11 +49,24 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "version": "1.0.0"
-    }
+    database = await run_in_threadpool(check_database)
+    healthy = database["status"] == "connected"
+
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "healthy" if healthy else "unhealthy",
+            "database": database["status"],
+            "database_latency_ms": database["latency_ms"],
+            "version": "1.0.0"
+        }
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return metrics_response()
 
 
 # Include routers
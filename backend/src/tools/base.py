@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any
 from pathlib import Path
+import asyncio
 
 class BaseTool(ABC):
     def __init__(self,workspace_path:Path):
@@ -14,6 +15,13 @@ class BaseTool(ABC):
     def execute(self,parameters:Dict[str,Any]) -> Dict[str,Any]:
         pass
     
+    async def aexecute(self,parameters:Dict[str,Any]) -> Dict[str,Any]:
+        """Async entry point. Tools without native async I/O run on a worker thread."""
+        return await asyncio.to_thread(self.execute, parameters)
+    
+    def close(self):
+        """Release whatever the tool keeps running between calls."""
+    
     def validate_path(self,path:str) -> Path:
         full_path = (self.workspace_path/path).resolve()
         
@@ -21,5 +29,9 @@ class BaseTool(ABC):
             raise ValueError(f"Path {path} is outside workspace")
         
         return full_path
+
+    def relative_path(self, path: str) -> str:
+        """Workspace-relative POSIX form of a path argument, however it was spelled."""
+        return self.validate_path(path).relative_to(self.workspace_path).as_posix()
     
     
\ No newline at end of file
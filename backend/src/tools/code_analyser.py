@@ -1,13 +1,27 @@
-from pathlib import Path
-from typing import Dict, Any, List
+from pathlib import Path, PurePath
+from typing import Dict, Any, List, Optional
 import logging 
+import os
 import re
 
 from .base import BaseTool
+from .search_index import TrigramIndex
+from .scanner import compile_query, release_pool, retain_pool, scan
 
 logger = logging.getLogger(__name__)
 
+MAX_RESULT_FILES = 20
+MAX_MATCHES_PER_FILE = 10
+
 class CodeAnalyserTool(BaseTool):
+    def __init__(self, workspace_path:Path, index: Optional[TrigramIndex] = None):
+        super().__init__(workspace_path)
+        self.index = index or TrigramIndex(workspace_path)
+        retain_pool()
+
+    def close(self):
+        self.index.close()
+        release_pool()
     
     def get_schema(self) -> Dict[str,Any]:
         return {
@@ -47,48 +61,35 @@ class CodeAnalyserTool(BaseTool):
         use_regex = parameters.get("regex", False)
         
         try: 
-            files = list(self.workspace_path.rglob(file_pattern))
+            # The index narrows the search to files containing every trigram of the
+            # query's required literals, so most files are never opened
+            candidates = self.index.candidates(query, use_regex, case_sensitive)
+            if candidates is None:
+                candidates = self.index.all_files()
             
-            ignore_dirs = {'.git','node_modules','__pychache__','.venv','dist','build'}
-            files = [f for f in files if not any(d in f.parts for d in ignore_dirs)]
+            files = [
+                str(self.workspace_path / rel_path) for rel_path in candidates
+                if PurePath(rel_path).match(file_pattern)
+            ]
             
-            results = []
+            source, flags = compile_query(query, use_regex, case_sensitive)
             
-            if use_regex:
-                flags = 0 if case_sensitive else re.IGNORECASE
-                pattern = re.compile(query,flags)
-                
-            else:
-                pattern = query if case_sensitive else query.lower()
-                
-            for file_path in files:
-                if not file_path.is_file():
-                    continue
-                
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    lines = content.split('\n')
-                    
-                    matches = []
-                    
-                    for line_num, line in enumerate(lines,1):
-                        if use_regex:
-                            if pattern.search(line):
-                                matches.append((line_num, line.strip()))
-                            else:
-                                search_line = line if case_sensitive else line.lower()
-                                if pattern in search_line:
-                                    matches.append((line_num,line.strip()))
-                                    
-                    if matches:
-                        rel_path = file_path.relative_to(self.workspace_path)
-                        results.append({
-                            "file": str(rel_path),
-                            "matches": matches
-                        })
-                except (UnicodeDecodeError,PermissionError):
-                    continue
-                
+            scan_result = scan(
+                files,
+                source,
+                flags,
+                max_files=MAX_RESULT_FILES,
+                max_matches=MAX_MATCHES_PER_FILE
+            )
+            
+            results = [
+                {
+                    "file": os.path.relpath(found.file, self.workspace_path),
+                    "matches": found.matches,
+                    "match_count": found.match_count
+                }
+                for found in scan_result.results
+            ]
             
             if not results:
                 return{
@@ -96,29 +97,41 @@ class CodeAnalyserTool(BaseTool):
                     "success": True
                 }
             
+            match_count = sum(r['match_count'] for r in results)
+            
+            # Scanning stops once MAX_RESULT_FILES files matched, so totals are lower bounds then
+            at_least = "at least " if scan_result.truncated else ""
+            
             output_lines = [
-                f"Found {sum(len(r['matches']) for r in results)} match(es) in {len(results)} file(s)",
+                f"Found {at_least}{match_count} match(es) in {at_least}{len(results)} file(s)",
                 "=" * 60
             ]
             
-            for result in results[:20]: 
+            for result in results[:MAX_RESULT_FILES]: 
                 output_lines.append(f"\n {result['file']}")
-                for line_num, line in result['matches'][:10]: 
+                for line_num, line in result['matches'][:MAX_MATCHES_PER_FILE]: 
                     output_lines.append(f"  {line_num:4d} | {line}")
                 
-                if len(result['matches']) > 10:
-                    output_lines.append(f"  ... and {len(result['matches']) - 10} more matches")
+                if result['match_count'] > MAX_MATCHES_PER_FILE:
+                    output_lines.append(f"  ... and {result['match_count'] - MAX_MATCHES_PER_FILE} more matches")
 
-            if len(results)>20:
-                output_lines.append(f"\n... and {len(results) - 20} more files")
+            if scan_result.truncated:
+                output_lines.append("\n... and more files (narrow the query or file_pattern to see them)")
                 
             return {
                 "content": "\n".join(output_lines),
-                "match_count": sum(len(r['matches']) for r in results),
+                "match_count": match_count,
                 "file_count": len(results),
+                "truncated": scan_result.truncated,
                 "success": True
             }
             
+        except re.error as e:
+            return {
+                "content": f"Error: invalid search pattern: {str(e)}",
+                "success": False
+            }
+            
         except Exception as e:
             logger.error(f"Error searching code: {e}", exc_info=True)
             return {
@@ -1,23 +1,49 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
 from .base import BaseTool
+from .workspace_walker import WorkspaceWalker, get_workspace_walker
+from .line_index import get_line_index, iter_lines
+from .scanner import BINARY_SNIFF_BYTES, is_binary
+from .read_cache import ReadCache, ReadCacheEntry, UNCHANGED_MARKER, CHANGED_MARKER, page_digest, unified_page_diff
 
 logger = logging.getLogger(__name__)
 
+# Pages are kept under the orchestrator's 10,000 char tool result cut
+PAGE_CHAR_BUDGET = 8000
+OUTLINE_CHAR_BUDGET = 1500
+DEFAULT_PAGE_LINES = 2000
+MAX_LINE_CHARS = 1000
+
 class ReadFileTool(BaseTool):
+    def __init__(self, workspace_path:Path, read_cache: Optional[ReadCache] = None):
+        super().__init__(workspace_path)
+        self.read_cache = read_cache or ReadCache()
     
     def get_schema(self) -> Dict[str,Any]:
         return {
             "name": "read_file",
-            "description": "Read the contents of a file in the workspace",
+            "description": (
+                "Read the contents of a file in the workspace. Large files come back one page at a time "
+                "with an outline of their definitions; use offset and limit to read other line ranges. "
+                "Re-reading a range you already have returns only a marker or a diff of what changed"
+            ),
             "input_schema": {
                 "type": "object",
                 "properties": {
                     "path": {
                         "type": "string",
                         "description": "Relative path to the file from workspace root"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "1-based line number to start reading from",
+                        "default": 1
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of lines to read"
                     }
                 },
                 "required": ["path"]
@@ -26,6 +52,8 @@ class ReadFileTool(BaseTool):
         
     def execute(self, parameters:Dict[str,Any]) ->Dict[str,Any]:
         path_str = parameters["path"]
+        offset = max(int(parameters.get("offset") or 1), 1)
+        limit = max(int(parameters.get("limit") or DEFAULT_PAGE_LINES), 1)
         
         try:
             file_path = self.validate_path(path_str)
@@ -35,15 +63,89 @@ class ReadFileTool(BaseTool):
                     "content": f"Error: File not found: {path_str}",
                     "success": False
                 }
+            
+            key = (self.relative_path(path_str), offset, parameters.get("limit"))
+            cached = self.read_cache.get(key)
+            stat = file_path.stat()
+            if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                return self._unchanged_result(path_str, cached, get_line_index(file_path).total_lines)
+            
+            with open(file_path, "rb") as f:
+                if is_binary(f.read(BINARY_SNIFF_BYTES)):
+                    raise UnicodeDecodeError("utf-8", b"", 0, 1, "binary content")
+            
+            index = get_line_index(file_path)
+            
+            if offset > max(index.total_lines, 1):
+                return {
+                    "content": f"Error: offset {offset} is past the end of {path_str} ({index.total_lines} lines)",
+                    "success": False
+                }
+            
+            page = []
+            page_lines = []
+            page_chars = 0
+            for line_num, raw_line in iter_lines(file_path, index, offset):
+                if line_num >= offset + limit:
+                    break
                 
-            content = file_path.read_text(encoding='utf-8')
+                line = raw_line.decode('utf-8').rstrip('\r\n')
+                if len(line) > MAX_LINE_CHARS:
+                    line = line[:MAX_LINE_CHARS] + f" ... [{len(line) - MAX_LINE_CHARS} more chars]"
+                
+                formatted = f"{line_num:4d} | {line}"
+                if page and page_chars + len(formatted) > PAGE_CHAR_BUDGET:
+                    break
+                page.append(formatted)
+                page_lines.append(line)
+                page_chars += len(formatted) + 1
+            
+            start_line = offset if page else 0
+            end_line = offset + len(page) - 1 if page else 0
+            
+            digest = page_digest(page_lines)
+            entry = ReadCacheEntry(stat.st_mtime_ns, stat.st_size, digest, page_lines, offset, self.read_cache.turn)
+            if cached and cached.digest == digest:
+                entry.turn = cached.turn
+                self.read_cache.put(key, entry)
+                return self._unchanged_result(path_str, cached, index.total_lines)
+            self.read_cache.put(key, entry)
+            
+            if cached:
+                diff = unified_page_diff(path_str, cached, page_lines, offset)
+                if sum(len(line) + 1 for line in diff) < page_chars:
+                    return {
+                        "content": (
+                            f"{CHANGED_MARKER} {cached.turn}] {path_str} (lines {start_line}-{end_line} "
+                            f"of {index.total_lines}), diff against the version read then:\n" + "\n".join(diff)
+                        ),
+                        "total_lines": index.total_lines,
+                        "start_line": start_line,
+                        "end_line": end_line,
+                        "success": True
+                    }
+            complete = offset == 1 and end_line == index.total_lines
+            
+            if complete:
+                header = f"File: {path_str}"
+            else:
+                header = f"File: {path_str} (lines {start_line}-{end_line} of {index.total_lines})"
+            output_lines = [header, '='*60] + page
+            
+            if end_line < index.total_lines and page:
+                output_lines.append(
+                    f"\n... {index.total_lines - end_line} more lines. "
+                    f"Call read_file with offset={end_line + 1} to continue."
+                )
+                # First look at a large file: show where things are so the next read can be targeted
+                if offset == 1 and index.outline:
+                    output_lines.extend(self._format_outline(index.outline))
             
-            lines = content.split('\n')
-            numbered_content = '\n'.join(
-                f"{i+1:4d} | {line}"for i, line in enumerate(lines)
-            )
             return {
-                "content": f"File: {path_str}\n{'='*60}\n{numbered_content}",
+                "content": "\n".join(output_lines),
+                "total_lines": index.total_lines,
+                "start_line": start_line,
+                "end_line": end_line,
                 "success": True
             }
             
@@ -58,6 +160,31 @@ class ReadFileTool(BaseTool):
                 "content": f"Error reading file: {str(e)}",
                 "success": False
             }
+    
+    def _unchanged_result(self, path_str:str, cached:ReadCacheEntry, total_lines:int) -> Dict[str,Any]:
+        end_line = cached.start_line + len(cached.lines) - 1
+        return {
+            "content": (
+                f"{UNCHANGED_MARKER} {cached.turn}] {path_str} (lines {cached.start_line}-{end_line} "
+                f"of {total_lines}) is identical to what read_file returned then."
+            ),
+            "total_lines": total_lines,
+            "start_line": cached.start_line,
+            "end_line": end_line,
+            "success": True
+        }
+    
+    def _format_outline(self, outline: List[Tuple[int,str]]) -> List[str]:
+        lines = ["\nOutline:"]
+        chars = 0
+        for line_num, text in outline:
+            entry = f"{line_num:4d} | {text}"
+            chars += len(entry) + 1
+            if chars > OUTLINE_CHAR_BUDGET:
+                lines.append(f"  ... {len(outline) - len(lines) + 1} more definitions")
+                break
+            lines.append(entry)
+        return lines
             
 class WriteFileTool(BaseTool):
     
@@ -108,10 +235,14 @@ class WriteFileTool(BaseTool):
             }
             
 class ListDirectoryTool(BaseTool):
+    def __init__(self, workspace_path:Path, walker: Optional[WorkspaceWalker] = None):
+        super().__init__(workspace_path)
+        self.walker = walker or get_workspace_walker(workspace_path)
+        
     def get_schema(self) -> Dict[str,Any]:
         return {
             "name": "list_directory",
-            "description": "List files and directories in a path",
+            "description": "List files and directories in a path (entries ignored by .gitignore are skipped)",
             "input_schema": {
                 "type": "object",
                 "properties": {
@@ -131,7 +262,7 @@ class ListDirectoryTool(BaseTool):
         
     def execute(self, parameters: Dict[str,Any]) -> Dict[str,Any]:
         path_str = parameters["path"]
-        recurcive = parameters.get("recurcive",False)
+        recursive = parameters.get("recursive",False)
         
         try:
             dir_path = self.validate_path(path_str)
@@ -147,21 +278,16 @@ class ListDirectoryTool(BaseTool):
                     "success": False
                 }
                 
-            if recurcive:
-                items = sorted(dir_path.rglob('*'))
-            else: 
-                items = sorted(dir_path.iterdir())
-            
+            rel_dir = dir_path.relative_to(self.workspace_path).as_posix()
+            items = self.walker.list_dir(rel_dir, recursive)
             
             output_lines = [f"Contents of {path_str}:", "="*60]
             
-            for item in items:
-                rel_path = item.relative_to(self.workspace_path)
-                if items.is_dir():
+            for rel_path, entry in items:
+                if entry is None:
                     output_lines.append(f"{rel_path}/")
                 else:
-                    size = item.stat().st_size
-                    output_lines.append(f"{rel_path} ({size} bytes)")
+                    output_lines.append(f"{rel_path} ({entry.size} bytes)")
                     
             return {
                 "content": "\n".join(output_lines),
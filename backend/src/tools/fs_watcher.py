@@ -0,0 +1,351 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+from .workspace_walker import WorkspaceWalker, get_workspace_walker
+
+logger = logging.getLogger(__name__)
+
+
+# A burst touching more paths than this is journaled as "everything changed"
+MAX_BATCH_PATHS = 2000
+MAX_JOURNAL_ENTRIES = 1000
+
+# Once events start arriving, keep reading until the workspace has been quiet
+# this long (or BURST_MAX_WAIT has passed) so a checkout lands as one batch
+SETTLE_SECONDS = 0.05
+BURST_MAX_WAIT = 0.5
+
+POLL_INTERVAL = 2.0
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class ChangeJournal:
+    """Append-only log of changed workspace paths.
+
+    Each consumer keeps its own cursor and asks for everything recorded since.
+    An entry of None means "anything may have changed"; it is also returned
+    when a cursor has fallen off the end of the retained entries.
+    """
+
+    def __init__(self, max_entries: int = MAX_JOURNAL_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: List[Tuple[int, Optional[Set[str]]]] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def cursor(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def record(self, paths: Optional[Set[str]]):
+        if paths is not None and not paths:
+            return
+        if paths is not None and len(paths) > MAX_BATCH_PATHS:
+            paths = None
+
+        with self._lock:
+            self._seq += 1
+            self._entries.append((self._seq, paths))
+            del self._entries[:-self.max_entries]
+
+    def changes_since(self, cursor: int) -> Tuple[int, Optional[Set[str]]]:
+        with self._lock:
+            if cursor == self._seq:
+                return cursor, set()
+            if not self._entries or self._entries[0][0] > cursor + 1:
+                return self._seq, None
+
+            changed: Set[str] = set()
+            for seq, paths in self._entries:
+                if seq <= cursor:
+                    continue
+                if paths is None:
+                    return self._seq, None
+                changed |= paths
+            return self._seq, changed
+
+
+class FileSystemWatcher:
+    """Feeds a ChangeJournal with workspace-relative paths changed on disk."""
+
+    # True when every change is reported by the time changes_since() returns,
+    # so callers can skip their own invalidation after running commands
+    precise = False
+
+    def __init__(self, workspace_path: Path, walker: WorkspaceWalker):
+        self.workspace_path = workspace_path
+        self.walker = walker
+        self.journal = ChangeJournal()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def cursor(self) -> int:
+        return self.journal.cursor()
+
+    def changes_since(self, cursor: int) -> Tuple[int, Optional[Set[str]]]:
+        return self.journal.changes_since(cursor)
+
+
+class InotifyWatcher(FileSystemWatcher):
+    """Linux inotify watches on every non-ignored directory.
+
+    Events queue up in the kernel between turns and are drained on demand,
+    so a whole burst is journaled as one batch when a consumer next asks.
+    """
+
+    precise = True
+
+    def __init__(self, workspace_path: Path, walker: WorkspaceWalker):
+        super().__init__(workspace_path, walker)
+        self._libc = _load_libc()
+        self._fd = -1
+        self._watches: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        try:
+            for rel_dir in [""] + self.walker.directories():
+                self._add_watch(rel_dir)
+        except OSError:
+            self.stop()
+            raise
+
+        logger.info(f"Watching {len(self._watches)} directories under {self.workspace_path}")
+
+    def stop(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+        self._fd = -1
+        self._watches = {}
+
+    def changes_since(self, cursor: int) -> Tuple[int, Optional[Set[str]]]:
+        with self._lock:
+            self._drain()
+        return self.journal.changes_since(cursor)
+
+    def _add_watch(self, rel_dir: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(self.workspace_path / rel_dir), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch failed for {rel_dir or '.'}: {os.strerror(errno)}")
+        self._watches[wd] = rel_dir
+
+    def _drain(self):
+        if self._fd < 0:
+            return
+
+        changed: Optional[Set[str]] = set()
+        deadline = None
+
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                data = b""
+
+            if data:
+                deadline = deadline or time.monotonic() + BURST_MAX_WAIT
+                if changed is not None:
+                    changed = self._parse_events(data, changed)
+                continue
+
+            if deadline is None:
+                break
+            remaining = min(SETTLE_SECONDS, deadline - time.monotonic())
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                break
+
+        if deadline is not None:
+            self.journal.record(changed)
+
+    def _parse_events(self, data: bytes, changed: Set[str]) -> Optional[Set[str]]:
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+
+            rel_dir = self._watches.get(wd)
+            if rel_dir is None:
+                continue
+
+            if mask & IN_IGNORED:
+                del self._watches[wd]
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if not rel_dir:
+                    return None
+                changed.add(rel_dir)
+                continue
+
+            name = os.fsdecode(name)
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            changed.add(rel_path)
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_new_tree(rel_path, changed)
+
+        return changed
+
+    def _watch_new_tree(self, rel_dir: str, changed: Set[str]):
+        # Files created inside a new directory before its watch exists produce no events
+        if self.walker.is_ignored(rel_dir, True):
+            return
+
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            try:
+                self._add_watch(current)
+                entries = list(os.scandir(self.workspace_path / current))
+            except OSError as e:
+                logger.debug(f"Could not watch new directory {current}: {e}")
+                continue
+
+            for entry in entries:
+                rel_path = f"{current}/{entry.name}"
+                changed.add(rel_path)
+                if entry.is_dir(follow_symlinks=False) and not self.walker.is_ignored(rel_path, True):
+                    stack.append(rel_path)
+
+
+class PollingWatcher(FileSystemWatcher):
+    """Fallback that diffs a fresh walk against the previous one every POLL_INTERVAL."""
+
+    def __init__(self, workspace_path: Path, walker: WorkspaceWalker, interval: float = POLL_INTERVAL):
+        super().__init__(workspace_path, walker)
+        self.interval = interval
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._snapshot = self._take_snapshot()
+        self._thread = threading.Thread(target=self._run, name="workspace-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Workspace poll failed: {e}")
+
+    def poll(self):
+        snapshot = self._take_snapshot()
+        changed = {
+            path for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        self.journal.record(changed)
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        files, dirs = self.walker.scan()
+        snapshot = {path: (entry.mtime_ns, entry.size) for path, entry in files.items()}
+        snapshot.update((path, (-1, -1)) for path in dirs)
+        return snapshot
+
+
+def _load_libc():
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    # Raises AttributeError off Linux
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def create_watcher(workspace_path: Path, walker: WorkspaceWalker) -> FileSystemWatcher:
+    """Start an inotify watcher, or a polling one where inotify is unavailable."""
+    try:
+        watcher = InotifyWatcher(workspace_path, walker)
+        watcher.start()
+        return watcher
+    except (OSError, AttributeError) as e:
+        logger.info(f"inotify unavailable ({e}), polling {workspace_path} for changes")
+
+    watcher = PollingWatcher(workspace_path, walker)
+    watcher.start()
+    return watcher
+
+
+_watchers: Dict[Path, FileSystemWatcher] = {}
+_watcher_refs: Dict[Path, int] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_workspace_watcher(workspace_path: Path) -> FileSystemWatcher:
+    """The watcher shared by every ToolExecutor on this workspace.
+
+    Each call takes a reference that release_workspace_watcher() gives back.
+    """
+    workspace_path = workspace_path.resolve()
+    with _watchers_lock:
+        watcher = _watchers.get(workspace_path)
+        if watcher is None:
+            watcher = create_watcher(workspace_path, get_workspace_walker(workspace_path))
+            _watchers[workspace_path] = watcher
+        _watcher_refs[workspace_path] = _watcher_refs.get(workspace_path, 0) + 1
+        return watcher
+
+
+def release_workspace_watcher(workspace_path: Path):
+    """Give back a get_workspace_watcher() reference.
+
+    The last one stops the watcher, so a process working through many
+    workspaces holds inotify instances only for those in use.
+    """
+    workspace_path = workspace_path.resolve()
+    with _watchers_lock:
+        refs = _watcher_refs.get(workspace_path, 0) - 1
+        if refs > 0:
+            _watcher_refs[workspace_path] = refs
+            return
+        _watcher_refs.pop(workspace_path, None)
+        watcher = _watchers.pop(workspace_path, None)
+
+    if watcher is not None:
+        watcher.walker.detach_watcher(watcher)
+        watcher.stop()
@@ -0,0 +1,320 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import atexit
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# The builtin fsmonitor daemon only exists on macOS and Windows; elsewhere the
+# workspace watcher is what keeps repeated status calls cheap
+STATUS_CONFIG = ["-c", "core.untrackedCache=true", "-c", "core.preloadIndex=true"]
+if sys.platform in ("darwin", "win32"):
+    STATUS_CONFIG += ["-c", "core.fsmonitor=true"]
+
+STATUS_ARGS = ["status", "--short"]
+
+MAX_CACHED_DIFFS = 128
+# A single file's diff is read up to this much; the rest is dropped with a note
+MAX_FILE_DIFF_BYTES = 2_000_000
+
+NULL_OID = "0" * 40
+
+
+class GitCommandError(Exception):
+    pass
+
+
+@dataclass
+class FileDiff:
+    # Everything before the first hunk: diff --git, index, ---/+++ lines
+    header: List[str]
+    # Each hunk as rendered text, starting with its @@ line
+    hunks: List[str]
+    truncated: bool = False
+
+
+class GitBackend:
+    """Git access for one workspace that avoids re-forking git where it can.
+
+    Object reads go through a single long-lived `git cat-file --batch`
+    process. `git status` output is cached and reused until the workspace
+    watcher journals a change or the index, HEAD or the current branch ref
+    moves; without a precise watcher nothing is cached. Everything else is a
+    plain git invocation, made with optional locks disabled so read-only
+    commands never contend with the user's own git. Status is the exception:
+    it takes the optional index lock to persist the untracked cache.
+    """
+
+    def __init__(self, workspace_path: Path, watcher=None):
+        self.workspace_path = workspace_path
+        self.watcher = watcher
+        self._cursor = watcher.cursor() if watcher else 0
+        self._git_dir: Optional[Path] = None
+
+        self._status: Optional[subprocess.CompletedProcess] = None
+        self._status_key: Optional[Tuple] = None
+        self._status_lock = threading.Lock()
+
+        self._cat_file: Optional[subprocess.Popen] = None
+        self._cat_file_lock = threading.Lock()
+
+        self._diffs: "OrderedDict[Tuple, FileDiff]" = OrderedDict()
+        self._diffs_lock = threading.Lock()
+
+    def run(self, args: List[str], timeout: int = 30, optional_locks: bool = False) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["git"] + args,
+            cwd=str(self.workspace_path),
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env={**os.environ, "GIT_OPTIONAL_LOCKS": "1" if optional_locks else "0"}
+        )
+
+    def stream(self, args: List[str]) -> Iterator[str]:
+        """Lines of a git command's output as it produces them.
+
+        Stopping early kills the command. A failure is raised once the output
+        is exhausted, as GitCommandError carrying git's stderr.
+        """
+        process = subprocess.Popen(
+            ["git"] + args,
+            cwd=str(self.workspace_path),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"}
+        )
+        finished = False
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+            finished = True
+        finally:
+            if not finished:
+                process.kill()
+            stderr = process.stderr.read()
+            process.stdout.close()
+            process.stderr.close()
+            returncode = process.wait()
+
+        if returncode != 0:
+            raise GitCommandError(stderr.strip() or f"git {args[0]} exited with {returncode}")
+
+    def file_diff(self, selection: List[str], path: str) -> Optional[FileDiff]:
+        """The diff of one file split into hunks, None if the file is unchanged.
+
+        Rendered diffs are cached by the blob ids on both sides, with the
+        file's stat standing in for the id of a working tree side.
+        """
+        raw = self.run(["diff", "--raw", "-z", "--no-abbrev"] + selection + ["--", path])
+        if raw.returncode != 0:
+            raise GitCommandError(raw.stderr.strip())
+
+        fields = raw.stdout.split("\0")
+        if len(fields) < 2 or not fields[0].startswith(":"):
+            return None
+
+        _, _, old_oid, new_oid, _ = fields[0][1:].split(" ", 4)
+        if new_oid == NULL_OID:
+            try:
+                stat = os.stat(self.workspace_path / path)
+                new_oid = f"worktree:{stat.st_mtime_ns}:{stat.st_size}"
+            except OSError:
+                new_oid = "deleted"
+
+        key = (path, old_oid, new_oid)
+        with self._diffs_lock:
+            cached = self._diffs.get(key)
+            if cached is not None:
+                self._diffs.move_to_end(key)
+                return cached
+
+        diff = self._render_diff(["diff", "--no-color", "--no-ext-diff"] + selection + ["--", path])
+
+        with self._diffs_lock:
+            self._diffs[key] = diff
+            while len(self._diffs) > MAX_CACHED_DIFFS:
+                self._diffs.popitem(last=False)
+        return diff
+
+    def _render_diff(self, args: List[str]) -> FileDiff:
+        diff = FileDiff(header=[], hunks=[])
+        hunk: List[str] = []
+        read = 0
+
+        for line in self.stream(args):
+            read += len(line) + 1
+            if read > MAX_FILE_DIFF_BYTES:
+                diff.truncated = True
+                break
+
+            if line.startswith("@@"):
+                if hunk:
+                    diff.hunks.append("\n".join(hunk))
+                hunk = [line]
+            elif hunk:
+                hunk.append(line)
+            else:
+                diff.header.append(line)
+
+        if hunk:
+            diff.hunks.append("\n".join(hunk))
+        return diff
+
+    def status(self, timeout: int = 30) -> subprocess.CompletedProcess:
+        with self._status_lock:
+            key = self._status_state()
+            if self._status is not None and key is not None and key == self._status_key:
+                return self._status
+
+            # The untracked cache and refreshed stat data live in the index, which status only
+            # writes back when it may take the optional index lock; without that every call
+            # starts cold. Git skips the write if the lock is already held.
+            result = self.run(STATUS_CONFIG + STATUS_ARGS, timeout, optional_locks=True)
+            if result.returncode == 0:
+                # Keyed by the state from before the run, so anything that moved during it misses next time
+                self._status, self._status_key = result, key
+            return result
+
+    def invalidate(self):
+        with self._status_lock:
+            self._status = None
+            self._status_key = None
+            self._git_dir = None
+
+    def _status_state(self) -> Optional[Tuple]:
+        if self.watcher is None or not self.watcher.precise:
+            return None
+
+        self._cursor, changed = self.watcher.changes_since(self._cursor)
+        if changed is None or changed:
+            self._status = None
+
+        git_dir = self._resolve_git_dir()
+        if git_dir is None:
+            return None
+
+        files = [git_dir / "index", git_dir / "HEAD", git_dir / "packed-refs"]
+        try:
+            head = (git_dir / "HEAD").read_text().strip()
+        except OSError:
+            return None
+        if head.startswith("ref: "):
+            files.append(git_dir / head[5:])
+
+        state = []
+        for path in files:
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def _resolve_git_dir(self) -> Optional[Path]:
+        if self._git_dir is None:
+            result = self.run(["rev-parse", "--absolute-git-dir"])
+            if result.returncode != 0:
+                return None
+            self._git_dir = Path(result.stdout.strip())
+        return self._git_dir
+
+    def read_object(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        """(object id, type, content) for anything cat-file accepts, e.g. HEAD:path. None if missing."""
+        if "\n" in spec:
+            raise ValueError("Object name cannot contain a newline")
+
+        with self._cat_file_lock:
+            for attempt in range(2):
+                try:
+                    process = self._cat_file_process()
+                    process.stdin.write(spec.encode("utf-8") + b"\n")
+                    process.stdin.flush()
+
+                    header = process.stdout.readline().decode("utf-8", errors="replace").split()
+                    if len(header) != 3:
+                        if not header:
+                            raise BrokenPipeError("cat-file exited")
+                        return None
+
+                    oid, object_type, size = header
+                    content = process.stdout.read(int(size) + 1)[:-1]
+                    return oid, object_type, content
+
+                except (BrokenPipeError, OSError, ValueError) as e:
+                    logger.warning(f"git cat-file failed, restarting it: {e}")
+                    self._close_cat_file()
+                    if attempt:
+                        raise
+        return None
+
+    def _cat_file_process(self) -> subprocess.Popen:
+        if self._cat_file is None or self._cat_file.poll() is not None:
+            self._cat_file = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=str(self.workspace_path),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._cat_file
+
+    def _close_cat_file(self):
+        if self._cat_file is not None:
+            self._cat_file.kill()
+            self._cat_file.wait()
+            self._cat_file = None
+
+    def close(self):
+        with self._cat_file_lock:
+            self._close_cat_file()
+
+
+_backends: Dict[Path, GitBackend] = {}
+_backend_refs: Dict[Path, int] = {}
+_backends_lock = threading.Lock()
+
+
+def get_git_backend(workspace_path: Path, watcher=None) -> GitBackend:
+    """The git backend shared by every tool operating on this workspace.
+
+    Each call takes a reference that release_git_backend() gives back.
+    """
+    workspace_path = workspace_path.resolve()
+    with _backends_lock:
+        backend = _backends.get(workspace_path)
+        if backend is None:
+            backend = GitBackend(workspace_path, watcher)
+            _backends[workspace_path] = backend
+            atexit.register(backend.close)
+        elif backend.watcher is None and watcher is not None:
+            backend.watcher = watcher
+            backend._cursor = watcher.cursor()
+            backend.invalidate()
+        _backend_refs[workspace_path] = _backend_refs.get(workspace_path, 0) + 1
+        return backend
+
+
+def release_git_backend(workspace_path: Path):
+    """Give back a get_git_backend() reference; the last one stops the cat-file process."""
+    workspace_path = workspace_path.resolve()
+    with _backends_lock:
+        refs = _backend_refs.get(workspace_path, 0) - 1
+        if refs > 0:
+            _backend_refs[workspace_path] = refs
+            return
+        _backend_refs.pop(workspace_path, None)
+        backend = _backends.pop(workspace_path, None)
+
+    if backend is not None:
+        atexit.unregister(backend.close)
+        backend.close()
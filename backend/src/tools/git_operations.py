@@ -1,24 +1,33 @@
 import subprocess
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
 from .base import BaseTool
+from .git_backend import GitBackend, GitCommandError, get_git_backend
 
 logger = logging.getLogger(__name__)
 
+SHOW_CHAR_LIMIT = 8000
+DIFF_PAGE_CHARS = 5000
+MAX_SUMMARY_FILES = 200
+
 class GitOperationsTool(BaseTool):
     
+    def __init__(self, workspace_path: Path, backend: Optional[GitBackend] = None):
+        super().__init__(workspace_path)
+        self.backend = backend or get_git_backend(workspace_path)
+    
     def get_schema(self) -> Dict[str,Any]:
         return {
             "name": "git_operation",
-            "description": "Perform git operations (status, diff, log, add, commit)",
+            "description": "Perform git operations (status, diff, log, add, commit, show)",
             "input_schema": {
                 "type": "object",
                 "properties": {
                     "operation": {
                         "type": "string",
-                        "enum": ["status", "diff", "log", "add", "commit", "init"],
+                        "enum": ["status", "diff", "log", "add", "commit", "init", "show"],
                         "description": "Git operation to perform"
                     },
                     "files": {
@@ -34,6 +43,29 @@ class GitOperationsTool(BaseTool):
                         "type": "integer",
                         "description": "Number of log entries to show (for log)",
                         "default": 10
+                    },
+                    "staged": {
+                        "type": "boolean",
+                        "description": "Diff staged changes instead of unstaged ones (for diff)",
+                        "default": False
+                    },
+                    "revision_range": {
+                        "type": "string",
+                        "description": "Commit or range to diff against, e.g. HEAD~3 or main..HEAD (for diff)"
+                    },
+                    "page": {
+                        "type": "integer",
+                        "description": "Page of a file's hunks (for diff with path)",
+                        "default": 1
+                    },
+                    "revision": {
+                        "type": "string",
+                        "description": "Revision to read the file from (for show)",
+                        "default": "HEAD"
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "File to show as of the revision (for show), or whose hunks to diff (for diff)"
                     }
                 },
                 "required": ["operation"]
@@ -47,7 +79,7 @@ class GitOperationsTool(BaseTool):
             if operation == "status":
                 return self._git_status()
             elif operation=="diff":
-                return self._git_diff()
+                return self._git_diff(parameters)
             elif operation=="log":
                 limit = parameters.get("limit",10)
                 return self._git_log(limit)
@@ -56,15 +88,23 @@ class GitOperationsTool(BaseTool):
                 return self._git_add(files)
             elif operation=="commit":
                 message = parameters.get("message","")
-                return self._get_commit(message)
+                return self._git_commit(message)
             elif operation =="init":
                 return self._git_init()
+            elif operation=="show":
+                revision = parameters.get("revision","HEAD")
+                return self._git_show(revision, parameters.get("path",""))
             else:
                 return{
                     "content": f"Unknown git operation: {operation}",
                     "success": False
                 }
                 
+        except GitCommandError as e:
+            return {
+                "content": f"Error: {e}",
+                "success": False
+            }
         except Exception as e:
             logger.error(f"Git operation failed: {e}",exc_info=True)
             return {
@@ -73,17 +113,10 @@ class GitOperationsTool(BaseTool):
             }
             
     def _run_git_command(self,args: list, timeout:int=30) -> subprocess.CompletedProcess:
-        cmd = ["git"] + args
-        return subprocess.run(
-            cmd,
-            cwd=str(self.workspace_path),
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
+        return self.backend.run(args, timeout)
         
     def _git_status(self) ->Dict[str,Any]:
-        result = self._run_git_command(["status","--short"])
+        result = self.backend.status()
         
         if result.returncode != 0:
             return{
@@ -103,28 +136,106 @@ class GitOperationsTool(BaseTool):
             "success": True
         }
         
-    def _git_diff(self) -> Dict[str,Any]:
-        result = self._run_git_command(["diff"])
-        
-        if result.returncode != 0:
+    def _git_diff(self,parameters:Dict[str,Any]) -> Dict[str,Any]:
+        """A --numstat summary of what changed, or the hunks of one file a page at a time."""
+        revision_range = parameters.get("revision_range") or ""
+        if revision_range.startswith("-"):
             return {
-                "content": f"Error: {result.stderr}",
+                "content": f"Error: Invalid revision range: {revision_range}",
                 "success": False
             }
         
-        output = result.stdout.strip()
+        selection = (["--cached"] if parameters.get("staged") else []) + ([revision_range] if revision_range else [])
+        described = revision_range or "unstaged"
+        if parameters.get("staged"):
+            described = f"staged vs {revision_range}" if revision_range else "staged"
         
-        if not output:
+        path = parameters.get("path")
+        if path:
+            rel_path = self.validate_path(path).relative_to(self.workspace_path.resolve()).as_posix()
+            return self._git_file_diff(selection, described, rel_path, parameters.get("page", 1))
+        
+        files = []
+        added = removed = changed = 0
+        for line in self.backend.stream(["-c", "core.quotePath=false", "diff", "--numstat"] + selection):
+            plus, minus, name = line.split("\t", 2)
+            changed += 1
+            if plus != "-":
+                added += int(plus)
+                removed += int(minus)
+            if len(files) < MAX_SUMMARY_FILES:
+                files.append(f"{'bin' if plus == '-' else '+' + plus:>7} {'' if minus == '-' else '-' + minus:<7} {name}")
+        
+        if not changed:
             return {
                 "content": "No changes to show",
                 "success": True
             }
         
-        if len(output) > 5000:
-            output = output[:5000] + "\n\n... (diff truncated)"
-            
+        if changed > len(files):
+            files.append(f"... and {changed - len(files)} more files")
+        
+        return {
+            "content": (
+                f"Git Diff ({described}): {changed} files changed, +{added} -{removed}\n"
+                + "\n".join(files)
+                + "\n\nCall diff again with path to see a file's hunks."
+            ),
+            "success": True
+        }
+        
+    def _git_file_diff(self,selection:list,described:str,path:str,page:int) -> Dict[str,Any]:
+        diff = self.backend.file_diff(selection, path)
+        if diff is None:
+            return {
+                "content": f"No changes to {path} ({described})",
+                "success": True
+            }
+        
+        if not diff.hunks:
+            # Binary files, mode changes and the like have no hunks
+            return {
+                "content": f"Git Diff ({described}):\n" + "\n".join(diff.header),
+                "success": True
+            }
+        
+        hunks = [
+            hunk if len(hunk) <= DIFF_PAGE_CHARS else hunk[:DIFF_PAGE_CHARS] + "\n... (hunk truncated)"
+            for hunk in diff.hunks
+        ]
+        
+        # (first, last) hunk index of each page, the file header is repeated on every page
+        budget = DIFF_PAGE_CHARS - sum(len(line) + 1 for line in diff.header)
+        pages = []
+        size = 0
+        for index, hunk in enumerate(hunks):
+            # Hunks are joined with a newline
+            if pages and size + 1 + len(hunk) <= budget:
+                pages[-1] = (pages[-1][0], index)
+                size += 1 + len(hunk)
+            else:
+                pages.append((index, index))
+                size = len(hunk)
+        
+        if page < 1 or page > len(pages):
+            return {
+                "content": f"Error: page {page} out of range, {path} has {len(pages)} pages of hunks",
+                "success": False
+            }
+        
+        first, last = pages[page - 1]
+        content = (
+            f"Git Diff of {path} ({described}), page {page} of {len(pages)}, "
+            f"hunks {first + 1}-{last + 1} of {len(hunks)}:\n"
+            + "\n".join(diff.header + hunks[first:last + 1])
+        )
+        if page < len(pages):
+            content += f"\n\n[More hunks follow. Call diff with page={page + 1} to continue.]"
+        elif diff.truncated:
+            content += "\n\n... (diff truncated, file changes are too large to show in full)"
+        
         return {
-            "content": f"Git Diff:\n{output}",
+            "content": content,
             "success": True
         }
         
@@ -155,6 +266,7 @@ class GitOperationsTool(BaseTool):
             }
             
         result = self._run_git_command(["add"] + files)
+        self.backend.invalidate()
         
         if result.returncode != 0:
             return{
@@ -176,6 +288,7 @@ class GitOperationsTool(BaseTool):
             }
             
         result = self._run_git_command(["commit","-m",message])
+        self.backend.invalidate()
         
         if result.returncode !=0:
             return {
@@ -190,6 +303,7 @@ class GitOperationsTool(BaseTool):
         
     def _git_init(self) -> Dict[str,Any]:
         result = self._run_git_command(["init"])
+        self.backend.invalidate()
         
         if result.returncode != 0:
             return {
@@ -200,4 +314,43 @@ class GitOperationsTool(BaseTool):
         return {
             "content": "Git repository initialized",
             "success": True
-        }
\ No newline at end of file
+        }
+        
+    def _git_show(self,revision:str,path:str) -> Dict[str,Any]:
+        if not path:
+            return {
+                "content": "Error: No path specified",
+                "success": False
+            }
+        
+        rel_path = self.validate_path(path).relative_to(self.workspace_path.resolve()).as_posix()
+        # ./ makes git resolve the path from the workspace rather than the repository root
+        obj = self.backend.read_object(f"{revision}:./{rel_path}")
+        
+        if obj is None:
+            return {
+                "content": f"Error: {path} does not exist at {revision}",
+                "success": False
+            }
+        
+        _, object_type, content = obj
+        if object_type != "blob":
+            return {
+                "content": f"Error: {path} is a {object_type} at {revision}, not a file",
+                "success": False
+            }
+        
+        if b"\0" in content[:8192]:
+            return {
+                "content": f"{path} at {revision} is a binary file ({len(content)} bytes)",
+                "success": True
+            }
+        
+        output = content.decode("utf-8", errors="replace")
+        if len(output) > SHOW_CHAR_LIMIT:
+            output = output[:SHOW_CHAR_LIMIT] + "\n\n... (file truncated)"
+        
+        return {
+            "content": f"{path} at {revision}:\n{output}",
+            "success": True
+        }
@@ -0,0 +1,241 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+import atexit
+import itertools
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+from .output_buffer import BoundedOutput
+
+logger = logging.getLogger(__name__)
+
+
+MAX_RUNNING_JOBS = 4
+MAX_FINISHED_JOBS = 16
+
+# Wall clock and CPU limits for a single job, a dev server included
+JOB_MAX_RUNTIME = 3600
+JOB_CPU_SECONDS = 3600
+
+JOB_HEAD_BYTES = 2000
+# Each tail() returns at most this much per stream, under the tool result cut
+JOB_TAIL_BYTES = 4000
+
+KILL_GRACE_SECONDS = 3.0
+
+
+class JobLimitError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    command: str
+    process: subprocess.Popen
+    started_at: float
+    stdout: BoundedOutput = field(default_factory=lambda: BoundedOutput(JOB_HEAD_BYTES, JOB_TAIL_BYTES))
+    stderr: BoundedOutput = field(default_factory=lambda: BoundedOutput(JOB_HEAD_BYTES, JOB_TAIL_BYTES))
+    finished_at: Optional[float] = None
+    returncode: Optional[int] = None
+    killed_reason: Optional[str] = None
+    # Bytes of each stream already returned by tail()
+    seen: Dict[str, int] = field(default_factory=lambda: {"stdout": 0, "stderr": 0})
+    done: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    @property
+    def runtime(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def status_line(self) -> str:
+        if self.running:
+            state = "running"
+        elif self.killed_reason:
+            state = f"killed ({self.killed_reason}), exit code {self.returncode}"
+        else:
+            state = f"exited with code {self.returncode}"
+        return (
+            f"{self.id}: {state} after {self.runtime:.1f}s, "
+            f"{self.stdout.total_bytes} bytes stdout, {self.stderr.total_bytes} bytes stderr | {self.command}"
+        )
+
+
+class JobManager:
+    """Background commands for one workspace.
+
+    Each job runs in its own process group with CPU and wall-clock limits.
+    Reader threads drain its stdout and stderr into head+tail buffers, so a
+    long-running server costs constant memory, and tail() returns what was
+    printed since the previous tail() wherever the buffers still hold it.
+    At most max_running jobs run at once; finished jobs are kept around for
+    polling until MAX_FINISHED_JOBS newer ones have finished.
+    """
+
+    def __init__(self, workspace_path: Path, max_running: int = MAX_RUNNING_JOBS):
+        self.workspace_path = workspace_path
+        self.max_running = max_running
+        self.jobs: Dict[str, Job] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, command: str, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> Job:
+        with self._lock:
+            running = [job for job in self.jobs.values() if job.running]
+            if len(running) >= self.max_running:
+                raise JobLimitError(
+                    f"{len(running)} background jobs are already running (limit {self.max_running}); "
+                    f"kill one first: {', '.join(job.id for job in running)}"
+                )
+
+            shell = shutil.which("bash") or "/bin/sh"
+            process = subprocess.Popen(
+                [shell, "-c", f"ulimit -t {JOB_CPU_SECONDS} 2>/dev/null; {command}"],
+                cwd=cwd or str(self.workspace_path),
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True
+            )
+
+            job = Job(id=f"job-{next(self._ids)}", command=command, process=process, started_at=time.monotonic())
+            self.jobs[job.id] = job
+            self._prune_finished()
+
+        readers = [
+            threading.Thread(target=self._drain, args=(stream, output), daemon=True)
+            for stream, output in ((process.stdout, job.stdout), (process.stderr, job.stderr))
+        ]
+        for reader in readers:
+            reader.start()
+        threading.Thread(target=self._wait, args=(job, readers), name=f"{job.id}-waiter", daemon=True).start()
+
+        logger.info(f"Started background {job.id} (pid {process.pid}): {command}")
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job: {job_id}. Known jobs: {', '.join(self.jobs) or 'none'}")
+        return job
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def tail(self, job_id: str, stream: str) -> str:
+        job = self.get(job_id)
+        output: BoundedOutput = getattr(job, stream)
+
+        with self._lock:
+            new_bytes = output.total_bytes - job.seen[stream]
+            job.seen[stream] = output.total_bytes
+
+            data = output.last(min(new_bytes, output.tail_bytes))
+
+        text = data.decode("utf-8", errors="replace")
+        if new_bytes > len(data):
+            return f"... [{new_bytes - len(data)} bytes omitted] ...\n{text}"
+        return text
+
+    def kill(self, job_id: str, reason: str = "killed on request") -> Job:
+        job = self.get(job_id)
+        if job.running:
+            self._terminate(job, reason)
+            job.done.wait(timeout=KILL_GRACE_SECONDS)
+        return job
+
+    def shutdown(self):
+        for job in self.list():
+            if job.running:
+                self.kill(job.id, reason="agent shutting down")
+
+    def _terminate(self, job: Job, reason: str):
+        """SIGTERM the job's process group, SIGKILL it after the grace period, and reap it."""
+        job.killed_reason = reason
+        self._signal(job, signal.SIGTERM)
+        try:
+            job.process.wait(timeout=KILL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            self._signal(job, signal.SIGKILL)
+            job.process.wait()
+
+    def _signal(self, job: Job, sig: int):
+        try:
+            os.killpg(job.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _drain(self, stream, output: BoundedOutput):
+        with stream:
+            for chunk in iter(lambda: stream.read1(64 * 1024), b""):
+                with self._lock:
+                    output.write(chunk)
+
+    def _wait(self, job: Job, readers: List[threading.Thread]):
+        try:
+            job.process.wait(timeout=JOB_MAX_RUNTIME)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{job.id} exceeded {JOB_MAX_RUNTIME}s, killing it")
+            # Not kill(), which would wait on job.done, which only this thread sets
+            self._terminate(job, reason=f"exceeded {JOB_MAX_RUNTIME}s runtime limit")
+
+        job.returncode = job.process.wait()
+        # Let the readers pick up the last output before the job reports as finished
+        for reader in readers:
+            reader.join(timeout=KILL_GRACE_SECONDS)
+        job.finished_at = time.monotonic()
+        job.done.set()
+        logger.info(job.status_line())
+
+    def _prune_finished(self):
+        finished = [job for job in self.jobs.values() if not job.running]
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.id]
+
+
+_managers: Dict[Path, JobManager] = {}
+_manager_refs: Dict[Path, int] = {}
+_managers_lock = threading.Lock()
+
+
+def get_job_manager(workspace_path: Path) -> JobManager:
+    """The job manager shared by every tool operating on this workspace.
+
+    Each call takes a reference that release_job_manager() gives back.
+    """
+    workspace_path = workspace_path.resolve()
+    with _managers_lock:
+        manager = _managers.get(workspace_path)
+        if manager is None:
+            manager = JobManager(workspace_path)
+            _managers[workspace_path] = manager
+            atexit.register(manager.shutdown)
+        _manager_refs[workspace_path] = _manager_refs.get(workspace_path, 0) + 1
+        return manager
+
+
+def release_job_manager(workspace_path: Path):
+    """Give back a get_job_manager() reference; the last one kills the workspace's jobs."""
+    workspace_path = workspace_path.resolve()
+    with _managers_lock:
+        refs = _manager_refs.get(workspace_path, 0) - 1
+        if refs > 0:
+            _manager_refs[workspace_path] = refs
+            return
+        _manager_refs.pop(workspace_path, None)
+        manager = _managers.pop(workspace_path, None)
+
+    if manager is not None:
+        atexit.unregister(manager.shutdown)
+        manager.shutdown()
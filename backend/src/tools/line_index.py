@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple, Iterator
+import os
+import re
+import threading
+
+# Byte offset of every LINE_INDEX_STRIDE-th line is kept, so seeking to any
+# line reads at most that many lines past the nearest checkpoint
+LINE_INDEX_STRIDE = 1000
+MAX_CACHED_INDEXES = 256
+
+MAX_OUTLINE_ENTRIES = 200
+MAX_OUTLINE_LINE_CHARS = 120
+
+CODE_OUTLINE_PATTERN = re.compile(
+    rb"^\s*(?:export\s+)?(?:default\s+)?(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?"
+    rb"(?:def|class|function|func|fn|struct|impl|interface|trait|enum|type|module)\s+[\w$]"
+)
+MARKDOWN_OUTLINE_PATTERN = re.compile(rb"^#{1,6}\s")
+MARKDOWN_SUFFIXES = {".md", ".markdown", ".rst"}
+
+
+@dataclass
+class LineIndex:
+    mtime_ns: int
+    size: int
+    total_lines: int = 0
+    # offsets[i] is the byte offset of line i * LINE_INDEX_STRIDE + 1
+    offsets: List[int] = field(default_factory=list)
+    # (line number, stripped definition line) for top-level-looking definitions
+    outline: List[Tuple[int, str]] = field(default_factory=list)
+
+    def seek_point(self, line: int) -> Tuple[int, int]:
+        """Nearest checkpoint at or before a 1-based line: (line number, byte offset)."""
+        slot = min((max(line, 1) - 1) // LINE_INDEX_STRIDE, len(self.offsets) - 1)
+        return slot * LINE_INDEX_STRIDE + 1, self.offsets[slot]
+
+
+def build_line_index(path: Path) -> LineIndex:
+    """Count lines, record checkpoints and collect an outline in one streaming pass."""
+    pattern = MARKDOWN_OUTLINE_PATTERN if path.suffix.lower() in MARKDOWN_SUFFIXES else CODE_OUTLINE_PATTERN
+
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        index = LineIndex(mtime_ns=stat.st_mtime_ns, size=stat.st_size, offsets=[0])
+        offset = 0
+
+        for line_num, line in enumerate(f, start=1):
+            if line_num % LINE_INDEX_STRIDE == 1 and line_num > 1:
+                index.offsets.append(offset)
+            offset += len(line)
+            index.total_lines = line_num
+
+            if len(index.outline) < MAX_OUTLINE_ENTRIES and pattern.match(line):
+                text = line.decode("utf-8", errors="replace").strip()
+                index.outline.append((line_num, text[:MAX_OUTLINE_LINE_CHARS]))
+
+    return index
+
+
+def iter_lines(path: Path, index: LineIndex, start: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (line number, raw line) from a 1-based start line without reading what precedes its checkpoint."""
+    line_num, offset = index.seek_point(start)
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if line_num >= start:
+                yield line_num, line
+            line_num += 1
+
+
+_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_line_index(path: Path) -> LineIndex:
+    """Cached LineIndex for a file, rebuilt when its mtime or size changes."""
+    stat = os.stat(path)
+    key = str(path)
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index and index.mtime_ns == stat.st_mtime_ns and index.size == stat.st_size:
+            _indexes.move_to_end(key)
+            return index
+
+    index = build_line_index(path)
+
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+
+    return index
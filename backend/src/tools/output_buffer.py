@@ -0,0 +1,59 @@
+HEAD_BYTES = 3000
+TAIL_BYTES = 3000
+
+
+class BoundedOutput:
+    """Keeps the first head_bytes and last tail_bytes of a stream, counting the rest.
+
+    Memory use is bounded by head_bytes + 2 * tail_bytes however much is
+    written, and everything in between is only accounted for in total_bytes.
+    """
+
+    def __init__(self, head_bytes: int = HEAD_BYTES, tail_bytes: int = TAIL_BYTES):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    @property
+    def omitted_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - min(len(self.tail), self.tail_bytes)
+
+    def write(self, data: bytes):
+        self.total_bytes += len(data)
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head.extend(data[:room])
+            data = data[room:]
+        if not data:
+            return
+
+        if len(data) >= self.tail_bytes:
+            self.tail[:] = data[-self.tail_bytes:]
+            return
+
+        self.tail.extend(data)
+        # Trim in batches so a stream of small writes does not shift the buffer every time
+        if len(self.tail) > 2 * self.tail_bytes:
+            del self.tail[:-self.tail_bytes]
+
+    def last(self, n: int) -> bytes:
+        """The last n bytes written, or as many of them as are still held."""
+        if self.total_bytes == len(self.head) + len(self.tail):
+            suffix = self.head + self.tail
+        else:
+            suffix = self.tail
+        return bytes(suffix[-n:]) if n > 0 else b""
+
+    def text(self) -> str:
+        tail = self.tail[-self.tail_bytes:]
+        omitted = self.omitted_bytes
+
+        if not omitted:
+            return bytes(self.head + tail).decode("utf-8", errors="replace")
+
+        head_text = self.head.decode("utf-8", errors="replace")
+        tail_text = bytes(tail).decode("utf-8", errors="replace")
+        return f"{head_text}\n\n... [{omitted} bytes omitted] ...\n\n{tail_text}"
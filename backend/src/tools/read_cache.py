@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import difflib
+import hashlib
+import re
+import threading
+
+# Prefixes of read_file results that only make sense next to an earlier read
+UNCHANGED_MARKER = "[Unchanged since turn"
+CHANGED_MARKER = "[Changed since turn"
+DELTA_PREFIXES = (UNCHANGED_MARKER, CHANGED_MARKER)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@")
+
+# (path, offset, limit) as passed to read_file
+ReadKey = Tuple[str, int, Optional[int]]
+
+
+@dataclass
+class ReadCacheEntry:
+    mtime_ns: int
+    size: int
+    digest: str
+    lines: List[str]
+    start_line: int
+    turn: int
+
+
+def page_digest(lines: List[str]) -> str:
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+class ReadCache:
+    """What the model has already seen from read_file during one session.
+
+    Entries are keyed by the requested range and hold the exact lines returned
+    together with the file's mtime and size at the time. A re-read of an
+    untouched file is answered from the stat alone; a file whose mtime moved
+    but whose page hashes the same is still reported unchanged, and a real
+    change is answered with a unified diff against the lines the model saw.
+
+    With a watcher, journaled paths are re-checked by content even when their
+    stat looks the same, which covers writes inside one mtime tick.
+
+    The orchestrator sets turn each iteration, resets the cache per run and
+    calls forget() when context compaction removes a read the cache vouches for.
+    """
+
+    def __init__(self, watcher=None):
+        self.turn = 0
+        self.watcher = watcher
+        self._cursor = watcher.cursor() if watcher else 0
+        self._entries: Dict[ReadKey, ReadCacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.turn = 0
+            self._entries = {}
+
+    def get(self, key: ReadKey) -> Optional[ReadCacheEntry]:
+        with self._lock:
+            self._sync()
+            return self._entries.get(key)
+
+    def _sync(self):
+        if self.watcher is None:
+            return
+
+        self._cursor, changed = self.watcher.changes_since(self._cursor)
+        for key, entry in self._entries.items():
+            if changed is None or key[0] in changed:
+                # Stat no longer proves anything, fall back to comparing digests
+                entry.mtime_ns = -1
+
+    def put(self, key: ReadKey, entry: ReadCacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+
+    def forget(self, path: str):
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items() if key[0] != path}
+
+
+def unified_page_diff(path: str, old: ReadCacheEntry, new_lines: List[str], new_start: int) -> List[str]:
+    """Diff two views of a page, with hunk headers in file line numbers."""
+    diff = difflib.unified_diff(
+        old.lines,
+        new_lines,
+        fromfile=f"{path} (turn {old.turn})",
+        tofile=f"{path} (now)",
+        lineterm="",
+        n=2
+    )
+
+    shifted = []
+    for line in diff:
+        match = HUNK_HEADER.match(line)
+        if match:
+            old_from = int(match.group(1)) + old.start_line - 1
+            new_from = int(match.group(3)) + new_start - 1
+            line = f"@@ -{old_from}{match.group(2) or ''} +{new_from}{match.group(4) or ''} @@"
+        shifted.append(line)
+    return shifted
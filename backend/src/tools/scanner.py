@@ -0,0 +1,245 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import atexit
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+BINARY_SNIFF_BYTES = 8192
+
+# Below this many candidate bytes the process pool costs more than it saves: each
+# spawned worker re-imports the agent, which alone takes longer than scanning this much
+PARALLEL_SCAN_MIN_BYTES = 8 * 1024 * 1024
+SCAN_CHUNK_SIZE = 32
+
+
+@dataclass
+class FileMatches:
+    file: str
+    matches: List[Tuple[int, str]]
+    match_count: int
+
+
+@dataclass
+class ScanResult:
+    results: List[FileMatches] = field(default_factory=list)
+    # True when scanning stopped early because max_files was reached
+    truncated: bool = False
+
+
+def compile_query(query: str, use_regex: bool, case_sensitive: bool) -> Tuple[bytes, int]:
+    """Byte-level pattern for a search_code query.
+
+    Matching happens on raw bytes, so regex classes such as \\w and
+    case-insensitive matching only cover ASCII.
+    """
+    source = query.encode("utf-8")
+    if not use_regex:
+        source = re.escape(source)
+
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    re.compile(source, flags)
+    return source, flags
+
+
+@lru_cache(maxsize=32)
+def _compiled(source: bytes, flags: int):
+    return re.compile(source, flags)
+
+
+def is_binary(data: bytes) -> bool:
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+
+def scan_file(path: str, source: bytes, flags: int, max_matches: int) -> Optional[Tuple[List[Tuple[int, str]], int]]:
+    """Find matching lines in one file without decoding or splitting it.
+
+    Returns the first max_matches (line number, stripped line) pairs plus the
+    total number of matching lines, or None when nothing matched. Line numbers
+    are only computed for reported hits.
+    """
+    pattern = _compiled(source, flags)
+
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if is_binary(buf[:BINARY_SNIFF_BYTES]):
+                    return None
+                return _scan_buffer(buf, pattern, max_matches)
+    except (OSError, ValueError):
+        return None
+
+
+def _scan_buffer(buf, pattern, max_matches: int) -> Optional[Tuple[List[Tuple[int, str]], int]]:
+    matches: List[Tuple[int, str]] = []
+    match_count = 0
+    line_num = 1
+    counted_to = 0
+    pos = 0
+    size = len(buf)
+
+    while pos < size:
+        match = pattern.search(buf, pos)
+        if match is None:
+            break
+
+        line_start = buf.rfind(b"\n", 0, match.start()) + 1
+        line_end = buf.find(b"\n", match.start())
+        if line_end == -1:
+            line_end = size
+
+        # search_code matches line by line; a hit that spills past the end of
+        # its line (e.g. through \s) only counts if the line matches by itself
+        if match.end() > line_end and not pattern.search(buf[line_start:line_end]):
+            pos = line_end + 1
+            continue
+
+        match_count += 1
+        if len(matches) < max_matches:
+            line_num += buf[counted_to:line_start].count(b"\n")
+            counted_to = line_start
+            line = buf[line_start:line_end].decode("utf-8", errors="replace")
+            matches.append((line_num, line.strip()))
+
+        pos = line_end + 1
+
+    if not match_count:
+        return None
+    return matches, match_count
+
+
+def _scan_chunk(paths: List[str], source: bytes, flags: int, max_matches: int) -> List[Tuple[str, List[Tuple[int, str]], int]]:
+    found = []
+    for path in paths:
+        hit = scan_file(path, source, flags, max_matches)
+        if hit is not None:
+            found.append((path, hit[0], hit[1]))
+    return found
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_users = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the agent runs tools from worker threads
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 2,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(shutdown)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def retain_pool():
+    """Take a reference to the scan process pool, which release_pool() gives back."""
+    global _pool_users
+    with _pool_lock:
+        _pool_users += 1
+
+
+def release_pool():
+    """Give back a retain_pool() reference; the last one shuts the pool down."""
+    global _pool, _pool_users
+    with _pool_lock:
+        _pool_users = max(_pool_users - 1, 0)
+        if _pool_users:
+            return
+        pool, _pool = _pool, None
+    _stop(pool)
+
+
+def shutdown():
+    """Stop the scan worker processes; the next parallel scan starts new ones."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    _stop(pool)
+
+
+def _stop(pool: Optional[ProcessPoolExecutor]):
+    atexit.unregister(shutdown)
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _worth_parallel(paths: List[str]) -> bool:
+    if (os.cpu_count() or 1) < 2:
+        return False
+    total = 0
+    for path in paths:
+        try:
+            total += os.stat(path).st_size
+        except OSError:
+            continue
+        if total >= PARALLEL_SCAN_MIN_BYTES:
+            return True
+    return False
+
+
+def scan(
+    paths: List[str],
+    source: bytes,
+    flags: int,
+    max_files: int,
+    max_matches: int,
+    parallel: bool = True
+) -> ScanResult:
+    """Scan files in order and stop once max_files files have matched."""
+    result = ScanResult()
+
+    if not parallel or not _worth_parallel(paths):
+        chunks = (_scan_chunk(paths[i:i + SCAN_CHUNK_SIZE], source, flags, max_matches)
+                  for i in range(0, len(paths), SCAN_CHUNK_SIZE))
+        return _collect(chunks, result, max_files)
+
+    futures = []
+    try:
+        pool = _get_pool()
+        futures = [
+            pool.submit(_scan_chunk, paths[i:i + SCAN_CHUNK_SIZE], source, flags, max_matches)
+            for i in range(0, len(paths), SCAN_CHUNK_SIZE)
+        ]
+        return _collect((future.result() for future in futures), result, max_files)
+
+    except BrokenProcessPool as e:
+        logger.warning(f"Scan process pool broke, scanning in-process: {e}")
+        _reset_pool()
+        return scan(paths, source, flags, max_files, max_matches, parallel=False)
+
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _collect(chunks, result: ScanResult, max_files: int) -> ScanResult:
+    for chunk in chunks:
+        for path, matches, match_count in chunk:
+            if len(result.results) == max_files:
+                result.truncated = True
+                return result
+            result.results.append(FileMatches(path, matches, match_count))
+    return result
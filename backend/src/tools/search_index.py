@@ -0,0 +1,341 @@
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+import atexit
+import hashlib
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .workspace_walker import WorkspaceWalker, FileEntry, get_workspace_walker
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_VERSION = 1
+INDEX_FILE_NAME = "trigram_index.pkl"
+
+# Larger files are not indexed and are always treated as candidates
+MAX_INDEXED_FILE_SIZE = 2 * 1024 * 1024
+
+# Writing the index out costs time in its whole size, so incremental updates are
+# persisted at most this often, or once this many files changed, and on close
+INDEX_SAVE_INTERVAL = 60.0
+INDEX_SAVE_CHANGED_FILES = 256
+
+
+def workspace_cache_dir(workspace_path: Path) -> Path:
+    """Per-workspace cache directory, kept outside the workspace so it never shows up in git status."""
+    root = Path(os.environ.get("KLIX_CACHE_DIR", Path.home() / ".cache" / "klix_code"))
+    digest = hashlib.sha1(str(workspace_path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return root / digest
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """Literal substrings that any match of a regex must contain.
+
+    Only plain concatenations are followed; alternations, character classes
+    and optional repeats end a literal run. Returns [] when nothing useful
+    can be extracted, meaning every file is a candidate.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return []
+
+    literals: List[str] = []
+    _collect_literals(parsed, literals)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def _collect_literals(sequence, literals: List[str]):
+    run: List[str] = []
+
+    def end_run():
+        if run:
+            literals.append("".join(run))
+            run.clear()
+
+    for op, arg in sequence:
+        if op is sre_parse.LITERAL:
+            run.append(chr(arg))
+        elif op is sre_parse.AT:
+            # Anchors are zero width and do not break adjacency
+            continue
+        elif op is sre_parse.SUBPATTERN:
+            end_run()
+            _collect_literals(arg[-1], literals)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            end_run()
+            min_count, _, item = arg
+            if min_count >= 1:
+                _collect_literals(item, literals)
+        else:
+            end_run()
+
+    end_run()
+
+
+class TrigramIndex:
+    """On-disk trigram index of the text files in a workspace.
+
+    Maps every lowercased trigram to the ids of files containing it, so a query
+    only opens files that contain all trigrams of its required literals. The
+    index is persisted under the workspace cache directory and refreshed
+    incrementally against the shared WorkspaceWalker's file list: only files
+    whose mtime or size changed are re-read. With a watcher attached to the
+    walker, only the journaled paths are even compared.
+
+    Changed files get a fresh id instead of being scrubbed from the posting
+    lists; stale ids are filtered at query time and the postings are rebuilt
+    once they make up half of all ids.
+
+    A freshly built index is saved right away; later updates are batched, see
+    INDEX_SAVE_INTERVAL, and close() writes out whatever is left.
+    """
+
+    def __init__(
+        self,
+        workspace_path: Path,
+        cache_dir: Optional[Path] = None,
+        walker: Optional[WorkspaceWalker] = None
+    ):
+        self.workspace_path = workspace_path
+        self.walker = walker or get_workspace_walker(workspace_path)
+        self.cache_dir = cache_dir or workspace_cache_dir(workspace_path)
+        self.index_path = self.cache_dir / INDEX_FILE_NAME
+
+        # rel path -> (mtime_ns, size, file id or None when not indexed)
+        self.files: Dict[str, Tuple[int, int, Optional[int]]] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.live_ids: Set[int] = set()
+        self.unindexed: Set[str] = set()
+        self.binary: Set[str] = set()
+        self.next_id = 0
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        # Watcher journal position as of the last full comparison with the walker
+        self._cursor: Optional[int] = None
+        # When the on-disk copy was last written or read, None if there is none yet
+        self._saved_at: Optional[float] = None
+        self._unsaved_changes = 0
+
+    def candidates(self, query: str, use_regex: bool = False, case_sensitive: bool = False) -> Optional[List[str]]:
+        """Sorted paths of files that may match, or None when the query cannot be narrowed."""
+        literals = required_literals(query, 0 if case_sensitive else re.IGNORECASE) if use_regex else [query]
+        literals = [literal.lower() for literal in literals if len(literal) >= 3]
+
+        with self._lock:
+            self._refresh()
+
+            if not literals:
+                return None
+
+            matched: Optional[Set[int]] = None
+            for literal in literals:
+                for trigram in trigrams(literal):
+                    ids = self.postings.get(trigram, set())
+                    matched = set(ids) if matched is None else matched & ids
+                    if not matched:
+                        break
+                if not matched:
+                    break
+
+            matched_ids = (matched or set()) & self.live_ids
+            paths = {path for path, (_, _, file_id) in self.files.items() if file_id in matched_ids}
+
+            return sorted(paths | self.unindexed)
+
+    def all_files(self) -> List[str]:
+        """Sorted paths of every indexed, non-binary file."""
+        with self._lock:
+            self._refresh()
+            return sorted(path for path in self.files if path not in self.binary)
+
+    def flush(self):
+        """Write out changes the batched saves have not persisted yet."""
+        with self._lock:
+            if self._unsaved_changes:
+                self._save()
+
+    def close(self):
+        self.flush()
+
+    def _refresh(self):
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+
+        watcher = self.walker.watcher
+        if watcher is not None and self._cursor is not None:
+            self._cursor, changed_paths = watcher.changes_since(self._cursor)
+            if changed_paths is not None and self._refresh_paths(changed_paths):
+                return
+
+        if watcher is not None:
+            self._cursor, _ = watcher.changes_since(watcher.cursor())
+
+        seen = set()
+        changed = 0
+
+        for file_entry in self.walker.files():
+            rel_path = file_entry.path
+            seen.add(rel_path)
+            entry = self.files.get(rel_path)
+            if entry and entry[0] == file_entry.mtime_ns and entry[1] == file_entry.size:
+                continue
+
+            self._forget(rel_path)
+            self._index_file(file_entry)
+            changed += 1
+
+        for rel_path in set(self.files) - seen:
+            self._forget(rel_path)
+            del self.files[rel_path]
+            changed += 1
+
+        if changed:
+            if self.next_id > 2 * max(len(self.live_ids), 1024):
+                self._rebuild_postings()
+            self._changed(changed)
+
+    def _refresh_paths(self, changed_paths: Set[str]) -> bool:
+        """Re-index just the journaled paths. False when a full comparison is needed."""
+        for rel_path in changed_paths:
+            if rel_path not in self.files and self.walker.entry(rel_path) is None \
+                    and not self.walker.is_ignored(rel_path, False):
+                # Most likely a directory that appeared or vanished as a whole
+                return False
+
+        changed = 0
+        for rel_path in changed_paths:
+            file_entry = self.walker.entry(rel_path)
+            entry = self.files.get(rel_path)
+            if file_entry and entry and entry[0] == file_entry.mtime_ns and entry[1] == file_entry.size:
+                continue
+            if file_entry is None and entry is None:
+                continue
+
+            self._forget(rel_path)
+            self.files.pop(rel_path, None)
+            if file_entry is not None:
+                self._index_file(file_entry)
+            changed += 1
+
+        if changed:
+            self._changed(changed)
+        return True
+
+    def _changed(self, count: int):
+        if not self._unsaved_changes:
+            # Registered only while there is something to write, so closed indexes can be collected
+            atexit.register(self.flush)
+        self._unsaved_changes += count
+
+        if (
+            self._saved_at is None
+            or self._unsaved_changes >= INDEX_SAVE_CHANGED_FILES
+            or time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL
+        ):
+            self._save()
+
+    def _index_file(self, file_entry: FileEntry):
+        rel_path = file_entry.path
+        if file_entry.size > MAX_INDEXED_FILE_SIZE:
+            self.files[rel_path] = (file_entry.mtime_ns, file_entry.size, None)
+            self.unindexed.add(rel_path)
+            return
+
+        try:
+            text = (self.workspace_path / rel_path).read_text(encoding="utf-8")
+        except UnicodeDecodeError:
+            self.files[rel_path] = (file_entry.mtime_ns, file_entry.size, None)
+            self.binary.add(rel_path)
+            return
+        except OSError:
+            return
+
+        file_id = self.next_id
+        self.next_id += 1
+        for trigram in trigrams(text.lower()):
+            self.postings.setdefault(trigram, set()).add(file_id)
+
+        self.files[rel_path] = (file_entry.mtime_ns, file_entry.size, file_id)
+        self.live_ids.add(file_id)
+
+    def _forget(self, rel_path: str):
+        entry = self.files.get(rel_path)
+        if entry and entry[2] is not None:
+            self.live_ids.discard(entry[2])
+        self.unindexed.discard(rel_path)
+        self.binary.discard(rel_path)
+
+    def _rebuild_postings(self):
+        logger.info(f"Rebuilding trigram index for {self.workspace_path}")
+        stale = list(self.files.items())
+        self.files = {}
+        self.postings = {}
+        self.live_ids = set()
+        self.unindexed = set()
+        self.binary = set()
+        self.next_id = 0
+
+        for rel_path, (mtime_ns, size, _) in stale:
+            self._index_file(FileEntry(rel_path, size, mtime_ns))
+
+    def _load(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+
+        if data.get("version") != INDEX_VERSION or data.get("workspace") != str(self.workspace_path):
+            return
+
+        self.files = data["files"]
+        self.postings = data["postings"]
+        self.live_ids = data["live_ids"]
+        self.unindexed = data["unindexed"]
+        self.binary = data["binary"]
+        self.next_id = data["next_id"]
+        self._saved_at = time.monotonic()
+        logger.info(f"Loaded trigram index with {len(self.files)} files from {self.index_path}")
+
+    def _save(self):
+        data = {
+            "version": INDEX_VERSION,
+            "workspace": str(self.workspace_path),
+            "files": self.files,
+            "postings": self.postings,
+            "live_ids": self.live_ids,
+            "unindexed": self.unindexed,
+            "binary": self.binary,
+            "next_id": self.next_id,
+        }
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(f".tmp{os.getpid()}")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not persist trigram index: {e}")
+
+        # A failed write is not retried until the next batch is due
+        self._saved_at = time.monotonic()
+        self._unsaved_changes = 0
+        atexit.unregister(self.flush)
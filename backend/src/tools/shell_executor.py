@@ -1,15 +1,34 @@
-import subprocess
-from typing import Dict,Any
+from pathlib import Path
+from typing import Dict,Any,Optional
 import logging
 from .base import BaseTool
+from .shell_session import ShellSessionPool, OutputCallback
+from .job_manager import JobManager, JobLimitError, get_job_manager
 
 logger = logging.getLogger(__name__)
 
 class ShellExecutorTool(BaseTool):
+    def __init__(
+        self,
+        workspace_path:Path,
+        sessions: Optional[ShellSessionPool] = None,
+        on_output: Optional[OutputCallback] = None,
+        jobs: Optional[JobManager] = None
+    ):
+        super().__init__(workspace_path)
+        self.sessions = sessions or ShellSessionPool(workspace_path)
+        self.on_output = on_output
+        self.jobs = jobs or get_job_manager(workspace_path)
+    
     def get_schema(self) -> Dict[str,Any]:
         return {
             "name": "execute_command",
-            "description": "Execute a shell command in the workspace directory",
+            "description": (
+                "Execute a shell command. Commands run in a persistent shell that starts in the workspace "
+                "directory, so cd, exported variables and activated virtualenvs carry over between calls. "
+                "Set background to start long-running commands such as dev servers or slow test suites "
+                "and get a job id back immediately; follow them up with manage_job"
+            ),
             "input_schema": {
                 "type": "object",
                 "properties": {
@@ -21,67 +40,204 @@ class ShellExecutorTool(BaseTool):
                         "type": "integer",
                         "description": "Timeout in seconds (default 30)",
                         "default": 30
+                    },
+                    "session": {
+                        "type": "string",
+                        "description": "Name of the shell session to use, for keeping separate working state",
+                        "default": "default"
+                    },
+                    "background": {
+                        "type": "boolean",
+                        "description": "Run as a background job in the session's directory and environment",
+                        "default": False
                     }
                 },
                 "required": ["command"]
             }
         }
         
+    DANGEROUS_PATTERNS = {
+        "rm -rf /",
+        "mkfs",
+        "dd if=",
+        ":(){:|:&};:",  # Fork bomb
+        "chmod -R 777 /",
+    }
+        
     def execute(self, parameters:Dict[str,Any]) -> Dict[str,Any]:
         command = parameters["command"]
         timeout = parameters.get("timeout",30)
+        session_name = parameters.get("session","default")
         
-        dangerous_patterns = {
-            "rm -rf /",
-            "mkfs",
-            "dd if=",
-            ":(){:|:&};:",  # Fork bomb
-            "chmod -R 777 /",
-        }
+        blocked = self._check_dangerous(command)
+        if blocked:
+            return blocked
+        
+        try:
+            if parameters.get("background", False):
+                return self._start_job(command, session_name)
+            
+            logger.info(f"Executing command in session {session_name}: {command}")
+            
+            result = self.sessions.get(session_name).run(command, timeout, self.on_output)
+            
+            formatted = self._format_result(command, result.returncode, result.stdout, result.stderr)
+            formatted["stdout_bytes"] = result.stdout_bytes
+            formatted["stderr_bytes"] = result.stderr_bytes
+            if result.timed_out:
+                formatted["content"] = f"Error: Command timed out after {timeout} seconds and was stopped\n" + formatted["content"]
+                formatted["success"] = False
+            if result.session_restarted:
+                formatted["content"] += "\n\n[Shell session was restarted; working directory and variables were reset]"
+            return formatted
+            
+        except Exception as e:
+            logger.error(f"Error executing command: {e}")
+            return {
+                "content": f"Error executing command: {str(e)}",
+                "success": False
+            }
+    
+    def close(self):
+        self.sessions.close()
+    
+    def _start_job(self, command:str, session_name:str) -> Dict[str,Any]:
+        cwd, env = self.sessions.get(session_name).environment()
+        
+        try:
+            job = self.jobs.start(command, cwd=cwd or None, env=env or None)
+        except JobLimitError as e:
+            return {
+                "content": f"Error: {str(e)}",
+                "success": False
+            }
         
-        for pattern in dangerous_patterns:
+        return {
+            "content": (
+                f"Started background job {job.id}: {command}\n"
+                f"Use manage_job with job_id={job.id} to check its status, tail its output or kill it."
+            ),
+            "job_id": job.id,
+            "success": True
+        }
+    
+    def _check_dangerous(self, command:str) -> Optional[Dict[str,Any]]:
+        for pattern in self.DANGEROUS_PATTERNS:
             if pattern in command:
                 return {
                     "content": f"Error: Dangerous command blocked: {pattern}",
                     "success": False
                 }
+        return None
+    
+    def _format_result(self, command:str, returncode:int, stdout:str, stderr:str) -> Dict[str,Any]:
+        output_parts = [
+            f"Command: {command}",
+            f"Exit code: {returncode}",
+            "=" * 60
+        ]
+        
+        if stdout:
+            output_parts.append("STDOUT:")
+            output_parts.append(stdout)
+        
+        if stderr:
+            output_parts.append("STDERR:")
+            output_parts.append(stderr)
+        
+        return {
+            "content": "\n".join(output_parts),
+            "exit_code": returncode,
+            "success": returncode == 0
+        }
+
+
+class ManageJobTool(BaseTool):
+    def __init__(self, workspace_path:Path, jobs: Optional[JobManager] = None):
+        super().__init__(workspace_path)
+        self.jobs = jobs or get_job_manager(workspace_path)
+    
+    def get_schema(self) -> Dict[str,Any]:
+        return {
+            "name": "manage_job",
+            "description": "Check on background jobs started with execute_command: list them, get a job's status, read its new output, or kill it",
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    "operation": {
+                        "type": "string",
+                        "enum": ["list", "status", "tail", "kill"],
+                        "description": "tail returns the output printed since the last tail"
+                    },
+                    "job_id": {
+                        "type": "string",
+                        "description": "Job id returned by execute_command (not needed for list)"
+                    }
+                },
+                "required": ["operation"]
+            }
+        }
+    
+    def execute(self, parameters:Dict[str,Any]) -> Dict[str,Any]:
+        operation = parameters["operation"]
+        job_id = parameters.get("job_id")
         
         try:
-            logger.info(f"Executing command: {command}")
-            
-            result=subprocess.run(
-                command,
-                shell=True,
-                cwd=str(self.workspace_path),
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
+            if operation == "list":
+                jobs = self.jobs.list()
+                lines = [job.status_line() for job in jobs] or ["No background jobs"]
+                return {
+                    "content": "\n".join(lines),
+                    "success": True
+                }
             
-            output_parts = [
-                f"Command: {command}",
-                f"Exit code: {result.returncode}",
-                "=" * 60
-            ]
+            if not job_id:
+                return {
+                    "content": f"Error: job_id is required for {operation}",
+                    "success": False
+                }
             
-            if result.stdout:
-                output_parts.append("STDOUT:")
-                output_parts.append(result.stdout)
+            if operation == "status":
+                job = self.jobs.get(job_id)
+            elif operation == "tail":
+                job = self.jobs.get(job_id)
+                stdout = self.jobs.tail(job_id, "stdout")
+                stderr = self.jobs.tail(job_id, "stderr")
+                output_parts = [job.status_line(), "=" * 60]
+                if stdout:
+                    output_parts += ["STDOUT:", stdout]
+                if stderr:
+                    output_parts += ["STDERR:", stderr]
+                if not (stdout or stderr):
+                    output_parts.append("(no new output)")
+                return {
+                    "content": "\n".join(output_parts),
+                    "running": job.running,
+                    "success": True
+                }
+            elif operation == "kill":
+                job = self.jobs.kill(job_id)
+            else:
+                return {
+                    "content": f"Error: Unknown operation: {operation}",
+                    "success": False
+                }
             
             return {
-                "content": "\n".join(output_parts),
-                "exit_code": result.returncode,
-                "success": result.returncode == 0
+                "content": job.status_line(),
+                "running": job.running,
+                "exit_code": job.returncode,
+                "success": True
             }
             
-        except subprocess.TimeoutExpired:
-            return{
-                "content": f"Error: Command timed out after {timeout} seconds",
+        except KeyError as e:
+            return {
+                "content": f"Error: {e.args[0]}",
                 "success": False
             }
         except Exception as e:
-            logger.error(f"Error executing command: {e}")
+            logger.error(f"Error managing job {job_id}: {e}")
             return {
-                "content": f"Error executing command: {str(e)}",
+                "content": f"Error managing job: {str(e)}",
                 "success": False
-            }
\ No newline at end of file
+            }
@@ -0,0 +1,349 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import atexit
+import codecs
+import logging
+import os
+import re
+import secrets
+import selectors
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from .output_buffer import BoundedOutput
+
+logger = logging.getLogger(__name__)
+
+
+MAX_SESSIONS = 4
+
+# After a timeout the command's processes are signalled and the shell gets this
+# long to print its sentinel before the whole session is replaced
+KILL_GRACE_SECONDS = 3.0
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Longest possible sentinel line: newline, marker, exit code, newline
+SENTINEL_WINDOW = 64
+
+# Called with the stream name ("stdout" or "stderr") and each piece of decoded output
+OutputCallback = Callable[[str, str], None]
+
+
+@dataclass
+class CommandResult:
+    returncode: int
+    # Head and tail of each stream, see BoundedOutput
+    stdout: str
+    stderr: str
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    timed_out: bool = False
+    # True when the shell itself had to be restarted, losing cwd and variables
+    session_restarted: bool = False
+
+
+class ShellSessionError(Exception):
+    pass
+
+
+class ShellSession:
+    """One long-lived shell that runs commands one after another.
+
+    Commands run in the shell process itself, so cd, exported variables and
+    sourced virtualenvs carry over to the next command. Each command is
+    followed by a sentinel line carrying its exit code on stdout and a plain
+    sentinel on stderr, which is how the end of its output is found. Both
+    streams are read as they are produced into head+tail BoundedOutputs, so a
+    chatty command costs constant memory, and each piece is handed to the
+    optional on_output callback on the way.
+
+    Job control (set -m) puts every pipeline in its own process group, so a
+    timed out command can be killed without touching the shell. Only a
+    command that hangs inside the shell itself, such as a builtin loop, costs
+    the session.
+    """
+
+    def __init__(self, workspace_path: Path):
+        self.workspace_path = workspace_path
+        self.process: Optional[subprocess.Popen] = None
+        self._token = secrets.token_hex(8)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        shell = shutil.which("bash")
+        argv = [shell, "--noprofile", "--norc"] if shell else ["/bin/sh"]
+
+        self.process = subprocess.Popen(
+            argv,
+            cwd=str(self.workspace_path),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+        for stream in (self.process.stdout, self.process.stderr):
+            os.set_blocking(stream.fileno(), False)
+
+        self._send("set -m\n")
+        logger.info(f"Started shell session {self.process.pid} in {self.workspace_path}")
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            stream.close()
+        self.process = None
+
+    def run(self, command: str, timeout: float, on_output: Optional[OutputCallback] = None) -> CommandResult:
+        with self._lock:
+            if not self.alive:
+                self.close()
+                self.start()
+
+            self._seq += 1
+            marker = f"__KLIX_{self._token}_{self._seq}__".encode()
+
+            # The command arrives as quoted here-document text and runs through eval, so
+            # a syntax error in it fails the eval instead of swallowing the sentinels.
+            # It reads from /dev/null so it cannot eat the framing that follows it.
+            delimiter = f"KLIX_COMMAND_{self._token}_{self._seq}"
+            self._send(
+                f"eval \"$(cat <<'{delimiter}'\n{command}\n{delimiter}\n)\" </dev/null\n"
+                f"printf '\\n{marker.decode()}%s\\n' \"$?\"\n"
+                f"printf '\\n{marker.decode()}\\n' >&2\n"
+            )
+
+            streams = {
+                self.process.stdout.fileno(): _SentinelStream(
+                    "stdout", re.compile(rb"\n" + re.escape(marker) + rb"(\d+)\n"), on_output
+                ),
+                self.process.stderr.fileno(): _SentinelStream(
+                    "stderr", re.compile(rb"\n" + re.escape(marker) + rb"\n"), on_output
+                ),
+            }
+
+            finished = self._collect(streams, time.monotonic() + timeout)
+            timed_out = not finished
+            if timed_out:
+                logger.warning(f"Command timed out after {timeout}s, stopping it: {command[:100]}")
+                self._kill_children()
+                finished = self._collect(streams, time.monotonic() + KILL_GRACE_SECONDS)
+
+            stdout, stderr = streams.values()
+            if finished and stdout.match:
+                returncode = int(stdout.match.group(1))
+                restarted = False
+            elif finished:
+                # The command ended the shell (e.g. exit); its output is all there is
+                returncode = self.process.wait()
+                restarted = True
+                self.close()
+            else:
+                # The shell itself is stuck, replace it
+                returncode = -1
+                restarted = True
+                self.close()
+                self.start()
+
+            for stream in (stdout, stderr):
+                stream.flush()
+
+            return CommandResult(
+                returncode=returncode,
+                stdout=stdout.output.text(),
+                stderr=stderr.output.text(),
+                stdout_bytes=stdout.output.total_bytes,
+                stderr_bytes=stderr.output.total_bytes,
+                timed_out=timed_out,
+                session_restarted=restarted
+            )
+
+    def environment(self) -> Tuple[str, Dict[str, str]]:
+        """The shell's current directory and exported variables, for processes started outside it.
+
+        Both go through a temporary file rather than the command's output,
+        which is cut down to its head and tail. Raises ShellSessionError
+        instead of returning a partial environment.
+        """
+        with tempfile.TemporaryDirectory(prefix="klix-env-") as directory:
+            cwd_path = Path(directory) / "cwd"
+            env_path = Path(directory) / "env"
+            result = self.run(
+                f"pwd > {shlex.quote(str(cwd_path))} && env -0 > {shlex.quote(str(env_path))}", timeout=10
+            )
+            if result.returncode != 0:
+                raise ShellSessionError(
+                    f"Could not read the shell's environment: {result.stderr.strip() or f'exit code {result.returncode}'}"
+                )
+            try:
+                cwd = cwd_path.read_text(encoding="utf-8", errors="surrogateescape").rstrip("\n")
+                env_text = env_path.read_text(encoding="utf-8", errors="surrogateescape")
+            except OSError as e:
+                raise ShellSessionError(f"Could not read the shell's environment: {e}") from e
+
+        env = dict(
+            item.split("=", 1) for item in env_text.split("\0") if "=" in item
+        )
+        return cwd, env
+
+    def _send(self, text: str):
+        try:
+            self.process.stdin.write(text.encode("utf-8"))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ShellSessionError(f"Shell session is gone: {e}") from e
+
+    def _collect(self, streams: Dict[int, "_SentinelStream"], deadline: float) -> bool:
+        """Read both streams until their sentinels or EOF. False when the deadline passed first."""
+        selector = selectors.DefaultSelector()
+        for fd, stream in streams.items():
+            if not stream.done:
+                selector.register(fd, selectors.EVENT_READ, stream)
+
+        try:
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+
+                for key, _ in selector.select(remaining):
+                    stream = key.data
+                    chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                    if chunk:
+                        stream.feed(chunk)
+                    else:
+                        stream.eof = True
+                    if stream.done:
+                        selector.unregister(key.fd)
+            return True
+        finally:
+            selector.close()
+
+    def _kill_children(self):
+        shell_group = os.getpgid(self.process.pid)
+        for pid in _child_pids(self.process.pid):
+            try:
+                group = os.getpgid(pid)
+                if group != shell_group:
+                    os.killpg(group, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                continue
+
+
+class _SentinelStream:
+    """Feeds one stream into a BoundedOutput until its sentinel shows up.
+
+    The last SENTINEL_WINDOW bytes are held back until more data arrives, so a
+    sentinel split across reads is still found and never leaks into the output.
+    """
+
+    def __init__(self, name: str, pattern: "re.Pattern[bytes]", on_output: Optional[OutputCallback]):
+        self.name = name
+        self.pattern = pattern
+        self.on_output = on_output
+        self.output = BoundedOutput()
+        self.match: Optional["re.Match[bytes]"] = None
+        self.eof = False
+        self._carry = b""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    @property
+    def done(self) -> bool:
+        return self.match is not None or self.eof
+
+    def feed(self, chunk: bytes):
+        data = self._carry + chunk
+        self.match = self.pattern.search(data)
+        if self.match:
+            self._carry = b""
+            self._commit(data[:self.match.start()])
+            return
+
+        split = max(len(data) - SENTINEL_WINDOW, 0)
+        self._carry = data[split:]
+        self._commit(data[:split])
+
+    def flush(self):
+        self._commit(self._carry)
+        self._carry = b""
+
+    def _commit(self, data: bytes):
+        if not data:
+            return
+        self.output.write(data)
+        if self.on_output:
+            text = self._decoder.decode(data)
+            if text:
+                self.on_output(self.name, text)
+
+
+def _child_pids(parent: int) -> List[int]:
+    proc = Path("/proc")
+    if proc.is_dir():
+        children = []
+        for entry in proc.iterdir():
+            if not entry.name.isdigit():
+                continue
+            try:
+                # Field 4 of /proc/<pid>/stat is the parent pid; the command name may contain spaces
+                stat = (entry / "stat").read_text()
+                if int(stat.rsplit(")", 1)[1].split()[1]) == parent:
+                    children.append(int(entry.name))
+            except (OSError, ValueError, IndexError):
+                continue
+        return children
+
+    result = subprocess.run(["pgrep", "-P", str(parent)], capture_output=True, text=True)
+    return [int(pid) for pid in result.stdout.split()]
+
+
+class ShellSessionPool:
+    """Named shell sessions for one agent session, least recently used evicted first."""
+
+    def __init__(self, workspace_path: Path, max_sessions: int = MAX_SESSIONS):
+        self.workspace_path = workspace_path
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ShellSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str = "default") -> ShellSession:
+        with self._lock:
+            if not self._sessions:
+                # Registered only while there are shells to stop, so closed pools can be collected
+                atexit.register(self.close)
+            session = self._sessions.get(name)
+            if session is None:
+                session = ShellSession(self.workspace_path)
+                self._sessions[name] = session
+            self._sessions.move_to_end(name)
+
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                evicted.close()
+
+            return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = OrderedDict()
+        atexit.unregister(self.close)
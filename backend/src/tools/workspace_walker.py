@@ -0,0 +1,353 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Iterable, Tuple
+import logging
+import os
+import re
+import stat as stat_module
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Pruned even when no ignore file mentions them
+DEFAULT_IGNORE_DIRS = {'.git','node_modules','__pycache__','.venv'}
+
+IGNORE_FILE_NAMES = {".gitignore"}
+
+
+@dataclass
+class FileEntry:
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class IgnoreRule:
+    """One pattern line from a .gitignore style file."""
+
+    def __init__(self, pattern: str, base: str):
+        self.base = base
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+            pattern = pattern[1:]
+
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+
+        # A slash anywhere but the end anchors the pattern to the ignore file's directory
+        self.anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        self.regex = re.compile(_glob_to_regex(pattern))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+
+        if self.anchored:
+            return self.regex.fullmatch(rel_path) is not None
+        return self.regex.fullmatch(rel_path.rsplit("/", 1)[-1]) is not None
+
+
+def _glob_to_regex(pattern: str) -> str:
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif char == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif char == "?":
+            regex.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex.append(re.escape(char))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            regex.append(f"[{body}]")
+            i = end + 1
+        elif char == "\\" and i + 1 < len(pattern):
+            regex.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            regex.append(re.escape(char))
+            i += 1
+    return "".join(regex)
+
+
+def parse_ignore_file(path: Path, base: str) -> List[IgnoreRule]:
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return []
+
+    rules = []
+    for line in lines:
+        if not line.strip() or line.startswith("#"):
+            continue
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        try:
+            rules.append(IgnoreRule(line, base))
+        except re.error:
+            logger.debug(f"Skipping unparseable ignore pattern {line!r} in {path}")
+    return rules
+
+
+def is_ignored(rules: Iterable[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule in rules:
+        if rule.matches(rel_path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+class WorkspaceWalker:
+    """Enumerates workspace files, honoring .gitignore and .git/info/exclude.
+
+    Ignored directories are pruned during the walk rather than filtered out
+    afterwards, so node_modules and friends are never descended into. The
+    resulting file list, with size and mtime, is cached until invalidate() is
+    called; tools report their writes through ToolExecutor so the cache can be
+    patched path by path. With a FileSystemWatcher attached, the cache also
+    follows changes made outside the tools.
+    """
+
+    def __init__(self, workspace_path: Path):
+        self.workspace_path = workspace_path
+        self.watcher = None
+        self._cursor = 0
+        self._files: Optional[Dict[str, FileEntry]] = None
+        self._dirs: Optional[set] = None
+        # Parsed ignore files by directory, dropped together with the file list
+        self._rules: Dict[str, List[IgnoreRule]] = {}
+        self._lock = threading.RLock()
+
+    def attach_watcher(self, watcher):
+        with self._lock:
+            if self.watcher is watcher:
+                return
+            self.watcher = watcher
+            self._cursor = watcher.cursor()
+
+    def detach_watcher(self, watcher):
+        """Stop following a watcher that is going away; without it the cached list cannot be trusted."""
+        with self._lock:
+            if self.watcher is not watcher:
+                return
+            self.watcher = None
+            self._drop_cache()
+
+    def files(self) -> List[FileEntry]:
+        """Every non-ignored file, sorted by path."""
+        with self._lock:
+            self._ensure_scanned()
+            return sorted(self._files.values(), key=lambda entry: entry.path)
+
+    def entry(self, rel_path: str) -> Optional[FileEntry]:
+        with self._lock:
+            self._ensure_scanned()
+            return self._files.get(rel_path)
+
+    def directories(self) -> List[str]:
+        """Every non-ignored directory below the workspace root, sorted."""
+        with self._lock:
+            self._ensure_scanned()
+            return sorted(self._dirs)
+
+    def list_dir(self, rel_dir: str, recursive: bool = False) -> List[Tuple[str, Optional[FileEntry]]]:
+        """Sorted (path, entry) pairs under rel_dir. Directories have no entry."""
+        rel_dir = "" if rel_dir in ("", ".") else rel_dir.strip("/")
+        prefix = rel_dir + "/" if rel_dir else ""
+
+        with self._lock:
+            self._ensure_scanned()
+
+            if rel_dir and rel_dir not in self._dirs:
+                # Explicitly asked for an ignored directory: show its top level only
+                return self._list_ignored_dir(rel_dir)
+
+            items = [(path, entry) for path, entry in self._files.items() if path.startswith(prefix)]
+            items += [(path, None) for path in self._dirs if path.startswith(prefix)]
+
+        if not recursive:
+            items = [(path, entry) for path, entry in items if "/" not in path[len(prefix):]]
+
+        return sorted(items, key=lambda item: item[0])
+
+    def _list_ignored_dir(self, rel_dir: str) -> List[Tuple[str, Optional[FileEntry]]]:
+        items = []
+        try:
+            entries = list(os.scandir(self.workspace_path / rel_dir))
+        except OSError:
+            return items
+
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}"
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    items.append((rel_path, None))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    items.append((rel_path, FileEntry(rel_path, stat.st_size, stat.st_mtime_ns)))
+            except OSError:
+                continue
+        return sorted(items, key=lambda item: item[0])
+
+    def invalidate(self, paths: Optional[Iterable[str]] = None):
+        """Forget cached state for the given workspace-relative paths, or for everything."""
+        with self._lock:
+            if self._files is None:
+                return
+
+            if paths is None:
+                self._drop_cache()
+                return
+
+            for rel_path in paths:
+                if os.path.isabs(rel_path):
+                    rel_path = os.path.relpath(rel_path, self.workspace_path)
+                rel_path = os.path.normpath(rel_path).replace(os.sep, "/")
+
+                if rel_path in self._dirs or os.path.isdir(self.workspace_path / rel_path):
+                    if self.is_ignored(rel_path, True):
+                        continue
+                    # A directory appeared, vanished or moved; its subtree is unknown
+                    self._drop_cache()
+                    return
+
+                if os.path.basename(rel_path) in IGNORE_FILE_NAMES or self._is_new_dir(rel_path):
+                    # Ignore rules or directory structure changed, patching is not enough
+                    self._drop_cache()
+                    return
+                self._refresh_path(rel_path)
+
+    def _drop_cache(self):
+        self._files = None
+        self._dirs = None
+        self._rules = {}
+
+    def _is_new_dir(self, rel_path: str) -> bool:
+        parent = os.path.dirname(rel_path)
+        return bool(parent) and parent not in self._dirs and not self.is_ignored(parent, True)
+
+    def _refresh_path(self, rel_path: str):
+        try:
+            stat = os.stat(self.workspace_path / rel_path)
+        except OSError:
+            self._files.pop(rel_path, None)
+            return
+
+        if not stat_module.S_ISREG(stat.st_mode) or self.is_ignored(rel_path, False):
+            self._files.pop(rel_path, None)
+            return
+
+        self._files[rel_path] = FileEntry(rel_path, stat.st_size, stat.st_mtime_ns)
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Whether rel_path, or any directory above it, is excluded from the walk."""
+        rules = self._root_rules()
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            current = "/".join(parts[:depth + 1])
+            current_is_dir = is_dir or depth < len(parts) - 1
+            if current_is_dir and parts[depth] in DEFAULT_IGNORE_DIRS:
+                return True
+            if is_ignored(rules, current, current_is_dir):
+                return True
+            if depth < len(parts) - 1:
+                rules = rules + self._dir_rules(current)
+        return False
+
+    def _ensure_scanned(self):
+        if self.watcher is not None:
+            self._cursor, changed = self.watcher.changes_since(self._cursor)
+            if changed is None:
+                self.invalidate()
+            elif changed:
+                self.invalidate(changed)
+
+        if self._files is None:
+            self._files, self._dirs = self.scan()
+            logger.info(f"Scanned {len(self._files)} files in {len(self._dirs)} directories under {self.workspace_path}")
+
+    def scan(self) -> Tuple[Dict[str, FileEntry], set]:
+        """Walk the workspace from scratch, bypassing the cache."""
+        files: Dict[str, FileEntry] = {}
+        dirs = set()
+        stack = [("", self._root_rules())]
+
+        while stack:
+            rel_dir, rules = stack.pop()
+            try:
+                entries = list(os.scandir(self.workspace_path / rel_dir))
+            except OSError:
+                continue
+
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name in DEFAULT_IGNORE_DIRS or is_ignored(rules, rel_path, True):
+                            continue
+                        dirs.add(rel_path)
+                        stack.append((rel_path, rules + self._dir_rules(rel_path)))
+                    elif entry.is_file():
+                        if is_ignored(rules, rel_path, False):
+                            continue
+                        stat = entry.stat()
+                        files[rel_path] = FileEntry(rel_path, stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+
+        return files, dirs
+
+    def _root_rules(self) -> List[IgnoreRule]:
+        rules = self._rules.get(".git/info")
+        if rules is None:
+            rules = parse_ignore_file(self.workspace_path / ".git" / "info" / "exclude", "")
+            self._rules[".git/info"] = rules
+        return rules + self._dir_rules("")
+
+    def _dir_rules(self, rel_dir: str) -> List[IgnoreRule]:
+        rules = self._rules.get(rel_dir)
+        if rules is None:
+            rules = []
+            for name in IGNORE_FILE_NAMES:
+                rules += parse_ignore_file(self.workspace_path / rel_dir / name, rel_dir)
+            self._rules[rel_dir] = rules
+        return rules
+
+
+_walkers: Dict[Path, WorkspaceWalker] = {}
+_walkers_lock = threading.Lock()
+
+
+def get_workspace_walker(workspace_path: Path) -> WorkspaceWalker:
+    """The walker shared by every tool operating on this workspace."""
+    workspace_path = workspace_path.resolve()
+    with _walkers_lock:
+        walker = _walkers.get(workspace_path)
+        if walker is None:
+            walker = WorkspaceWalker(workspace_path)
+            _walkers[workspace_path] = walker
+        return walker
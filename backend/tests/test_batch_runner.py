@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from src.agent.batch_runner import BatchRunner, BatchTask, load_finished, load_tasks
+from src.agent.exceptions import BatchError
+from src.agent.orchestrator import OrchestratorConfig
+from src.llm.base import AsyncBaseLLMClient, LLMResponse
+from src.tools import fs_watcher, git_backend, job_manager
+
+
+class ShellThenDoneClient(AsyncBaseLLMClient):
+    """Runs one command, then finishes; fails tasks whose text says so."""
+
+    def __init__(self):
+        super().__init__("offline", "scripted")
+        self.tasks = []
+
+    async def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        task = messages[0]["content"]
+        if len(messages) == 1:
+            self.tasks.append(task)
+            if "fail" in task:
+                raise ValueError("scripted failure")
+            call = {"type": "tool_use", "id": "1", "name": "execute_command", "input": {"command": "echo hi"}}
+            return LLMResponse(content=[call], stop_reason="tool_use", usage={}, model=self.model)
+        return LLMResponse(content=[{"type": "text", "text": f"did {task}"}], stop_reason="end_turn", usage={}, model=self.model)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+def write_lines(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.fixture
+def runner(tmp_path):
+    config = OrchestratorConfig(api_key="offline", workspace_path=str(tmp_path), stream=False, rate_limit=False)
+    client = ShellThenDoneClient()
+    return BatchRunner(config, llm_client=client, concurrency=2), client
+
+
+def test_load_tasks_ids_and_validation(tmp_path):
+    tasks_path = tmp_path / "tasks.jsonl"
+    tasks_path.write_text('{"task": "a"}\n# comment\n\n{"id": "b", "task": "b", "config": {"max_iterations": 3}}\n')
+
+    first, second = load_tasks(tasks_path, str(tmp_path))
+    assert first.id == load_tasks(tasks_path, str(tmp_path))[0].id
+    assert (second.id, second.config) == ("b", {"max_iterations": 3})
+
+    for content, message in [
+        ('{"id": "x", "task": "a"}\n{"id": "x", "task": "b"}\n', "duplicate task id x"),
+        ('{"task": "a", "config": {"api_key": "k"}}\n', "unknown config fields: api_key"),
+        ('{"task": "a", "config": {"workspace_path": "/"}}\n', "unknown config fields: workspace_path"),
+        ('{"task": ""}\n', "non-empty"),
+        ("not json\n", "invalid JSON"),
+    ]:
+        tasks_path.write_text(content)
+        with pytest.raises(BatchError, match=message):
+            load_tasks(tasks_path)
+
+
+def test_load_finished_drops_partial_line_and_keeps_latest_row(tmp_path):
+    results_path = tmp_path / "results.jsonl"
+    write_lines(results_path, [
+        {"id": "a", "result": {"success": False}},
+        {"id": "a", "result": {"success": True}},
+        {"id": "b", "result": {"success": False}},
+    ])
+    with open(results_path, "a") as f:
+        f.write('{"id": "c", "result": {"succ')
+
+    assert load_finished(results_path) == {"a", "b"}
+    assert load_finished(results_path, include_failed=False) == {"a"}
+    assert results_path.read_text().endswith("}\n")
+    assert load_finished(tmp_path / "missing.jsonl") == set()
+
+
+def test_resume_skips_recorded_tasks(tmp_path, runner):
+    batch, client = runner
+    tasks_path, results_path = tmp_path / "tasks.jsonl", tmp_path / "out" / "results.jsonl"
+    write_lines(tasks_path, [{"id": name, "task": name} for name in ("one", "two", "fail three")])
+
+    summary = batch.run_sync(tasks_path, results_path)
+    assert (summary.total, summary.skipped, summary.succeeded, summary.failed) == (3, 0, 2, 1)
+    assert sorted(client.tasks) == ["fail three", "one", "two"]
+
+    # Interrupted while writing the next result
+    with open(results_path, "a") as f:
+        f.write('{"id": "one", "res')
+    client.tasks.clear()
+
+    summary = batch.run_sync(tasks_path, results_path)
+    assert (summary.skipped, summary.succeeded, summary.failed) == (3, 0, 0)
+    assert client.tasks == []
+
+    summary = batch.run_sync(tasks_path, results_path, retry_failed=True)
+    assert (summary.skipped, summary.failed) == (2, 1)
+    assert client.tasks == ["fail three"]
+
+    rows = read_results(results_path)
+    assert [row["id"] for row in rows][-1] == "fail three"
+    assert next(row for row in rows if row["id"] == "one")["result"]["final_message"] == "did one"
+
+
+@pytest.mark.asyncio
+async def test_bad_config_override_fails_only_its_task(tmp_path, runner):
+    batch, client = runner
+    result = await batch._run_task(BatchTask(id="x", task="x", workspace=str(tmp_path), config={"workspace_path": "/"}))
+
+    assert not result.success
+    assert result.metadata["error_type"] == "TypeError"
+    assert client.tasks == []
+
+
+def test_finished_tasks_release_workspace_resources(tmp_path, runner):
+    batch, _ = runner
+    tasks_path = tmp_path / "tasks.jsonl"
+    write_lines(tasks_path, [{"id": str(i), "task": f"task {i}"} for i in range(4)])
+
+    assert batch.run_sync(tasks_path, tmp_path / "results.jsonl").succeeded == 4
+
+    workspace = tmp_path.resolve()
+    assert workspace not in fs_watcher._watchers
+    assert workspace not in git_backend._backends
+    assert workspace not in job_manager._managers
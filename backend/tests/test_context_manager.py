@@ -0,0 +1,131 @@
+from src.agent.context_manager import DROPPED_NOTE, ContextManager, estimate_tokens
+from src.tools.read_cache import UNCHANGED_MARKER
+
+FILE_TEXT = "x" * 4000
+
+
+class History:
+    """Builds a conversation of single-tool exchanges after the task message."""
+
+    def __init__(self, context: ContextManager):
+        self.context = context
+        self.calls = 0
+        context.add_message({"role": "user", "content": "Fix the bug"})
+
+    def exchange(self, name: str, result: str = FILE_TEXT, **tool_input) -> str:
+        self.calls += 1
+        call_id = f"call-{self.calls}"
+        self.context.add_message({
+            "role": "assistant",
+            "content": [{"type": "tool_use", "id": call_id, "name": name, "input": tool_input}],
+        })
+        self.context.add_message({
+            "role": "user",
+            "content": [{"type": "tool_result", "tool_use_id": call_id, "content": result}],
+        })
+        return call_id
+
+
+def results(context: ContextManager) -> dict:
+    return {
+        block["tool_use_id"]: block["content"]
+        for message in context.messages
+        if message["role"] == "user" and isinstance(message["content"], list)
+        for block in message["content"]
+    }
+
+
+def assert_consistent(context: ContextManager):
+    """Token count matches the messages, and every tool_result follows its tool_use."""
+    assert context.total_tokens == sum(estimate_tokens(message["content"]) for message in context.messages)
+    assert context.messages[0]["role"] == "user"
+    for previous, message in zip(context.messages[1:], context.messages[2:]):
+        if message["role"] == "user":
+            uses = {block["id"] for block in previous["content"] if block["type"] == "tool_use"}
+            assert {block["tool_use_id"] for block in message["content"]} == uses
+
+
+def test_stale_reads_collapse_first():
+    removed = []
+    context = ContextManager(max_tokens=100_000, keep_recent_turns=10, on_result_removed=removed.append)
+    history = History(context)
+
+    old_read = history.exchange("read_file", path="a.py")
+    new_read = history.exchange("read_file", path="a.py")
+    written = history.exchange("read_file", path="b.py")
+    history.exchange("write_file", "ok", path="b.py", content="new")
+    other_range = history.exchange("read_file", path="c.py", offset=1, limit=10)
+    history.exchange("read_file", path="c.py", offset=50, limit=10)
+
+    context.max_tokens = context.total_tokens
+    context.build_messages()
+
+    contents = results(context)
+    assert contents[old_read].startswith("[Stale read of a.py")
+    assert contents[written].startswith("[Stale read of b.py")
+    assert contents[new_read] == FILE_TEXT
+    assert contents[other_range] == FILE_TEXT
+    assert [call["input"]["path"] for call in removed] == ["b.py", "a.py"]
+    assert context.compactions == 1
+    assert_consistent(context)
+
+
+def test_delta_reads_keep_the_read_they_refer_to():
+    context = ContextManager(max_tokens=100_000, keep_recent_turns=10)
+    history = History(context)
+
+    base = history.exchange("read_file", path="a.py")
+    history.exchange("read_file", f"{UNCHANGED_MARKER} 1]", path="a.py")
+
+    context.compact()
+
+    assert results(context)[base] == FILE_TEXT
+
+
+def test_old_tool_results_are_elided_outside_the_recent_turns():
+    context = ContextManager(max_tokens=100_000, keep_recent_turns=2)
+    history = History(context)
+    calls = [history.exchange("search_code", query=str(i)) for i in range(5)]
+    shared_block = context.messages[2]["content"][0]
+
+    context.max_tokens = context.total_tokens
+    context.build_messages()
+
+    contents = results(context)
+    assert [contents[call].startswith("[Elided search_code output") for call in calls] == [True] * 3 + [False] * 2
+    assert shared_block["content"] == FILE_TEXT
+    assert len(context.messages) == 11
+    assert_consistent(context)
+
+
+def test_oldest_exchanges_are_dropped_last():
+    removed = []
+    context = ContextManager(max_tokens=100_000, keep_recent_turns=2, on_result_removed=removed.append)
+    history = History(context)
+    calls = [history.exchange("search_code", query=str(i)) for i in range(8)]
+
+    # Over budget even with every old result elided
+    context.max_tokens = 2 * estimate_tokens(FILE_TEXT)
+    context.build_messages()
+
+    assert context.messages[0]["content"] == "Fix the bug" + DROPPED_NOTE
+    assert list(results(context)) == calls[-2:]
+    assert set(results(context).values()) == {FILE_TEXT}
+    assert len(removed) == 6
+    assert_consistent(context)
+
+    # Compacting again does not stack the note
+    context.compact()
+    assert context.messages[0]["content"].count(DROPPED_NOTE) == 1
+
+
+def test_calibration_scales_the_estimate_that_triggers_compaction():
+    context = ContextManager(max_tokens=10_000, reserved_tokens=100)
+    history = History(context)
+    history.exchange("search_code", "short", query="q")
+
+    context.calibrate(10 * (context.total_tokens + 100))
+    assert context.estimated_prompt_tokens() == 10 * (context.total_tokens + 100)
+
+    context.build_messages()
+    assert context.compactions == 0
@@ -0,0 +1,110 @@
+import subprocess
+
+import pytest
+
+from src.tools import git_operations
+from src.tools.git_backend import GitBackend
+from src.tools.git_operations import GitOperationsTool
+
+
+def git(repo, *args) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo, check=True, capture_output=True, text=True
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "module.py").write_text("print('committed')\n")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "initial")
+    return tmp_path
+
+
+def test_show_resolves_paths_from_a_workspace_inside_the_repo(repo):
+    workspace = (repo / "pkg").resolve()
+    backend = GitBackend(workspace)
+    tool = GitOperationsTool(workspace, backend=backend)
+    (workspace / "module.py").write_text("print('edited')\n")
+    try:
+        result = tool.execute({"operation": "show", "revision": "HEAD", "path": "module.py"})
+    finally:
+        backend.close()
+
+    assert result["success"], result["content"]
+    assert "print('committed')" in result["content"]
+
+
+def test_status_persists_the_untracked_cache(repo):
+    (repo / "untracked.txt").write_text("new\n")
+    backend = GitBackend(repo)
+    try:
+        result = backend.status()
+    finally:
+        backend.close()
+
+    assert "?? untracked.txt" in result.stdout
+    # UNTR is the index extension holding the untracked cache
+    assert b"UNTR" in (repo / ".git" / "index").read_bytes()
+
+
+@pytest.fixture
+def edited(repo, monkeypatch):
+    """module.py with 30 changes far enough apart to become separate hunks."""
+    monkeypatch.setattr(git_operations, "DIFF_PAGE_CHARS", 600)
+    lines = [f"line {i}\n" for i in range(300)]
+    (repo / "pkg" / "module.py").write_text("".join(lines))
+    git(repo, "commit", "-q", "-am", "many lines")
+    for i in range(0, 300, 10):
+        lines[i] = f"changed {i}\n"
+    (repo / "pkg" / "module.py").write_text("".join(lines))
+
+    backend = GitBackend(repo)
+    yield GitOperationsTool(repo, backend=backend)
+    backend.close()
+
+
+def diff(tool, **parameters):
+    return tool.execute({"operation": "diff", **parameters})
+
+
+def test_diff_without_a_path_summarises_files(edited, repo):
+    (repo / "new.txt").write_text("a\nb\n")
+    git(repo, "add", "new.txt")
+
+    unstaged = diff(edited)["content"]
+    assert unstaged.startswith("Git Diff (unstaged): 1 files changed, +30 -30")
+    assert "pkg/module.py" in unstaged and "new.txt" not in unstaged
+
+    staged = diff(edited, staged=True)["content"]
+    assert staged.startswith("Git Diff (staged): 1 files changed, +2 -0")
+
+
+def test_file_diff_pages_cover_every_hunk_once(edited):
+    first = diff(edited, path="pkg/module.py")
+    pages = int(first["content"].split(", page 1 of ", 1)[1].split(",", 1)[0])
+    assert pages > 1
+    assert "Call diff with page=2" in first["content"]
+
+    seen = []
+    for page in range(1, pages + 1):
+        content = diff(edited, path="pkg/module.py", page=page)["content"]
+        body = content.split(":\n", 1)[1].split("\n\n[More hunks", 1)[0]
+        assert body.startswith("diff --git a/pkg/module.py b/pkg/module.py")
+        assert len(body) <= git_operations.DIFF_PAGE_CHARS
+        seen += [line for line in body.splitlines() if line.startswith("+changed")]
+
+    assert seen == [f"+changed {i}" for i in range(0, 300, 10)]
+
+    out_of_range = diff(edited, path="pkg/module.py", page=pages + 1)
+    assert not out_of_range["success"]
+    assert f"has {pages} pages" in out_of_range["content"]
+
+
+def test_file_diff_of_an_unchanged_file(edited, repo):
+    git(repo, "checkout", "--", "pkg/module.py")
+
+    assert diff(edited, path="pkg/module.py")["content"] == "No changes to pkg/module.py (unstaged)"
@@ -0,0 +1,37 @@
+import time
+
+from src.tools import job_manager
+from src.tools.job_manager import JobManager
+
+
+def test_job_output_and_exit_code(tmp_path):
+    manager = JobManager(tmp_path)
+    job = manager.start("echo out; echo err >&2; exit 3")
+
+    assert job.done.wait(timeout=5)
+    assert job.returncode == 3
+    assert manager.tail(job.id, "stdout") == "out\n"
+    assert manager.tail(job.id, "stdout") == ""
+    assert manager.tail(job.id, "stderr") == "err\n"
+
+
+def test_runtime_limit_kills_job_without_waiting_on_itself(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_manager, "JOB_MAX_RUNTIME", 0.2)
+    manager = JobManager(tmp_path)
+
+    start = time.monotonic()
+    job = manager.start("sleep 30")
+
+    assert job.done.wait(timeout=5)
+    assert time.monotonic() - start < job_manager.KILL_GRACE_SECONDS
+    assert job.killed_reason == "exceeded 0.2s runtime limit"
+
+
+def test_kill_on_request(tmp_path):
+    manager = JobManager(tmp_path)
+    job = manager.start("sleep 30")
+
+    manager.kill(job.id)
+
+    assert not job.running
+    assert job.killed_reason == "killed on request"
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+from src.core import database
+from src.core.metrics import UNMATCHED_ROUTE, PrometheusMiddleware
+
+
+def build_app() -> FastAPI:
+    items = APIRouter(prefix="/users")
+
+    @items.get("/{user_id}/items/{item}")
+    def get_item(user_id: int, item: str):
+        return {}
+
+    api = APIRouter()
+    api.include_router(items)
+
+    app = FastAPI()
+    app.include_router(api, prefix="/metrics-test")
+
+    @app.get("/metrics-plain/{name}")
+    def plain(name: str):
+        return {}
+
+    app.add_middleware(PrometheusMiddleware)
+    return app
+
+
+def requests_seen(route: str, status: str) -> float:
+    value = REGISTRY.get_sample_value("http_requests_total", {"method": "GET", "route": route, "status": status})
+    return value or 0.0
+
+
+@pytest.mark.parametrize("path, route, status", [
+    ("/metrics-test/users/5/items/5", "/metrics-test/users/{user_id}/items/{item}", "200"),
+    ("/metrics-test/users/x/items/y", "/metrics-test/users/{user_id}/items/{item}", "422"),
+    ("/metrics-plain/users", "/metrics-plain/{name}", "200"),
+    ("/metrics-plain/metrics-plain", "/metrics-plain/{name}", "200"),
+    ("/metrics-test/nothing/here", UNMATCHED_ROUTE, "404"),
+])
+def test_requests_are_labelled_with_the_route_template(path, route, status):
+    before = requests_seen(route, status)
+    TestClient(build_app()).get(path)
+    assert requests_seen(route, status) == before + 1
+    assert requests_seen(path, status) == 0
+
+
+@pytest.fixture
+def ping_engine(monkeypatch):
+    def use(url):
+        engine = create_engine(url, poolclass=NullPool, connect_args=database._ping_connect_args(url))
+        monkeypatch.setattr(database, "ping_engine", engine)
+        return engine
+
+    monkeypatch.setattr(database, "_last_ping", None)
+    return use
+
+
+def test_check_database_reuses_the_last_ping(ping_engine, tmp_path):
+    engine = ping_engine(f"sqlite:///{tmp_path / 'health.db'}")
+    connects = []
+    event.listen(engine, "connect", lambda *args: connects.append(1))
+
+    result = database.check_database()
+    assert result["status"] == "connected"
+    assert database.check_database() == result
+    assert len(connects) == 1
+
+    database.check_database(ttl=0)
+    assert len(connects) == 2
+
+
+def test_check_database_reports_an_unreachable_database(ping_engine, tmp_path):
+    ping_engine(f"sqlite:///{tmp_path / 'missing' / 'health.db'}")
+
+    result = database.check_database()
+    assert result["status"] == "unavailable"
+    assert result["error"] == "OperationalError"
+    assert REGISTRY.get_sample_value("db_up") == 0
+
+
+def test_check_database_answers_from_the_last_ping_while_another_runs(ping_engine, tmp_path):
+    ping_engine(f"sqlite:///{tmp_path / 'health.db'}")
+    first = database.check_database()
+
+    # Another health check is in the middle of a slow ping
+    with database._ping_lock:
+        done = threading.Event()
+        answers = []
+        threading.Thread(target=lambda: (answers.append(database.check_database(ttl=0)), done.set())).start()
+        assert done.wait(timeout=1)
+
+    assert answers == [first]
+
+
+def test_health_reports_503_when_the_first_ping_cannot_start(ping_engine, tmp_path, monkeypatch):
+    from src.main import app
+
+    ping_engine(f"sqlite:///{tmp_path / 'health.db'}")
+    monkeypatch.setattr(database, "DB_PING_TIMEOUT", 0.05)
+
+    # A ping that never finishes holds the lock, and there is no earlier result to answer with
+    with database._ping_lock:
+        response = TestClient(app).get("/health")
+
+    assert response.status_code == 503
+    assert response.json()["database"] == "unavailable"
+    assert response.json()["database_latency_ms"] is None
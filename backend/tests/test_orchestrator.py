@@ -0,0 +1,144 @@
+import pytest
+
+from src.agent.async_orchestrator import AsyncOrchestrator
+from src.agent.orchestrator import Orchestrator, OrchestratorConfig
+from src.llm.base import BaseLLMClient, AsyncBaseLLMClient, LLMResponse
+from src.tools.read_cache import UNCHANGED_MARKER
+
+
+def tool_call(call_id: str, name: str, **tool_input):
+    return {"type": "tool_use", "id": call_id, "name": name, "input": tool_input}
+
+
+SCRIPT = [
+    [tool_call("1", "write_file", path="notes.txt", content="hello\n")],
+    [tool_call("2", "read_file", path="notes.txt"), tool_call("3", "execute_command", command="cd / && echo ran")],
+]
+
+
+def scripted_response(messages) -> LLMResponse:
+    turn = sum(message["role"] == "assistant" for message in messages)
+    if turn < len(SCRIPT):
+        return LLMResponse(content=SCRIPT[turn], stop_reason="tool_use", usage={"input_tokens": 10}, model="scripted")
+    return LLMResponse(content=[{"type": "text", "text": "Done."}], stop_reason="end_turn", usage={}, model="scripted")
+
+
+class ScriptedClient(BaseLLMClient):
+    def __init__(self):
+        super().__init__("offline", "scripted")
+        self.requests = []
+
+    def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        self.requests.append(list(messages))
+        return scripted_response(messages)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+class AsyncScriptedClient(AsyncBaseLLMClient):
+    def __init__(self):
+        super().__init__("offline", "scripted")
+        self.requests = []
+
+    async def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        self.requests.append(list(messages))
+        return scripted_response(messages)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+def config(workspace, **options) -> OrchestratorConfig:
+    return OrchestratorConfig(api_key="offline", workspace_path=str(workspace), rate_limit=False, **options)
+
+
+def tool_results(client, turn: int):
+    return client.requests[turn][-1]["content"]
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_sync_orchestrator_runs_the_async_loop(tmp_path, stream):
+    events = []
+    client = ScriptedClient()
+    orchestrator = Orchestrator(config(tmp_path, stream=stream), client, on_stream_event=events.append)
+    try:
+        result = orchestrator.execute("Write notes")
+    finally:
+        orchestrator.close()
+
+    assert result.success, result.errors
+    assert result.final_message == "Done."
+    assert result.iterations_used == 3
+    assert result.tools_called == ["write_file", "read_file", "execute_command"]
+    assert (tmp_path / "notes.txt").read_text() == "hello\n"
+    assert "hello" in tool_results(client, 2)[0]["content"]
+    assert "ran" in tool_results(client, 2)[1]["content"]
+
+    if stream:
+        assert "message_stop" in [event.type for event in events]
+    assert {"type": "tool_output", "text": "ran\n"} in [{"type": e.type, "text": e.text} for e in events]
+
+
+def test_sync_orchestrator_runs_again_and_exposes_the_agent_state(tmp_path):
+    orchestrator = Orchestrator(config(tmp_path), ScriptedClient())
+    try:
+        assert orchestrator.execute("Write notes").success
+        assert orchestrator.execute("Write notes again").success
+        assert orchestrator.iteration_count == 3
+        assert orchestrator.get_conversation_history()[0]["content"] == "Write notes again"
+    finally:
+        orchestrator.close()
+
+
+def test_close_stops_shell_sessions(tmp_path):
+    orchestrator = Orchestrator(config(tmp_path), ScriptedClient())
+    orchestrator.execute("Write notes")
+    session = orchestrator.tool_executor.tools["execute_command"].sessions.get()
+    assert session.alive
+
+    orchestrator.close()
+
+    assert not session.alive
+
+
+@pytest.mark.asyncio
+async def test_async_orchestrator(tmp_path):
+    client = AsyncScriptedClient()
+    orchestrator = AsyncOrchestrator(config(tmp_path, stream=False), client)
+    try:
+        result = await orchestrator.execute("Write notes")
+    finally:
+        orchestrator.close()
+
+    assert result.success, result.errors
+    assert result.files_modified
+    assert len(client.requests) == 3
+
+
+def test_reads_compacted_out_of_context_are_returned_in_full_again(tmp_path):
+    (tmp_path / "notes.txt").write_text("hello\n")
+    orchestrator = AsyncOrchestrator(config(tmp_path), AsyncScriptedClient())
+    context = orchestrator.context
+    context.add_message({"role": "user", "content": "Read the notes"})
+
+    def read(call_id: str, path: str) -> str:
+        call = tool_call(call_id, "read_file", path=path)
+        result = orchestrator.tool_executor.execute("read_file", call["input"])["content"]
+        context.add_message({"role": "assistant", "content": [call]})
+        context.add_message({"role": "user", "content": [{"type": "tool_result", "tool_use_id": call_id, "content": result}]})
+        return result
+
+    try:
+        absolute = str(tmp_path / "notes.txt")
+        assert "hello" in read("1", absolute)
+        assert read("2", absolute).startswith(UNCHANGED_MARKER)
+        for call_id in "3456":
+            read(call_id, "./other.txt")
+
+        context.max_tokens = 1
+        context.compact()
+
+        assert "hello" in read("7", absolute)
+    finally:
+        orchestrator.close()
@@ -0,0 +1,53 @@
+import pytest
+
+from src.agent.exceptions import PlanError
+from src.agent.planner import MAX_PLAN_STEPS, parse_plan
+
+
+def test_parse_plan_tolerates_prose_and_fences():
+    text = (
+        "Here is the plan:\n```json\n"
+        '{"steps": [{"id": "a", "description": " look ", "depends_on": []},'
+        ' {"id": "b", "description": "fix", "depends_on": ["a"]}]}\n```'
+    )
+    plan = parse_plan("task", text)
+
+    assert list(plan.steps) == ["a", "b"]
+    assert plan.steps["a"].description == "look"
+    assert plan.steps["b"].depends_on == ["a"]
+    assert plan.critical_path() == ["a", "b"]
+    assert [step.id for step in plan.sinks()] == ["b"]
+
+
+@pytest.mark.parametrize("text, message", [
+    ("no json here", "no JSON object"),
+    ("{not json}", "not valid JSON"),
+    ('{"steps": {"id": "a"}}', "list of steps"),
+    ('{"steps": ["a"]}', "not an object"),
+    ('{"steps": [{"id": 1}]}', "Invalid step id"),
+    ('{"steps": [{"id": "has space"}]}', "Invalid step id"),
+    ('{"steps": [{"id": "a"}, {"id": "a"}]}', "Duplicate step id"),
+    ('{"steps": [{"id": "a", "description": ["x"]}]}', "description"),
+    ('{"steps": [{"id": "a", "depends_on": "b"}]}', "dependencies"),
+    ('{"steps": [{"id": "a", "depends_on": [{"id": "b"}]}]}', "dependencies"),
+    ('{"steps": [{"id": "a", "depends_on": ["missing"]}]}', "unknown steps: missing"),
+    ('{"steps": []}', "no steps"),
+])
+def test_parse_plan_rejects_malformed_plans(text, message):
+    with pytest.raises(PlanError, match=message):
+        parse_plan("task", text)
+
+
+def test_parse_plan_rejects_cycles():
+    text = (
+        '{"steps": [{"id": "a", "depends_on": ["c"]}, {"id": "b", "depends_on": ["a"]},'
+        ' {"id": "c", "depends_on": ["b"]}, {"id": "d"}]}'
+    )
+    with pytest.raises(PlanError, match="cycle between: a, b, c"):
+        parse_plan("task", text)
+
+
+def test_parse_plan_enforces_step_limit():
+    steps = ", ".join(f'{{"id": "s{i}"}}' for i in range(MAX_PLAN_STEPS + 1))
+    with pytest.raises(PlanError, match="limit"):
+        parse_plan("task", f'{{"steps": [{steps}]}}')
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.llm.base import AsyncBaseLLMClient, LLMProvider, LLMResponse
+from src.llm.rate_limiter import AsyncRateLimitedLLMClient, RateLimiter, TokenBucket, get_rate_limiter
+from src.llm.router import AsyncLLMRouter
+
+
+class AnthropicStub(AsyncBaseLLMClient):
+    provider = LLMProvider.ANTHROPIC
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key, "stub")
+
+    async def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        return LLMResponse(content=[], stop_reason="end_turn", usage={}, model=self.model)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+def empty_limiter(requests_per_minute: float) -> RateLimiter:
+    limiter = RateLimiter(requests_per_minute=requests_per_minute)
+    limiter.requests.level = 0
+    return limiter
+
+
+def test_bucket_refills_continuously():
+    bucket = TokenBucket(per_minute=60)
+    bucket.updated = 0.0
+    bucket.take(60)
+
+    assert bucket.wait_time(30, now=0.0) == pytest.approx(30.0)
+    assert bucket.wait_time(30, now=30.0) == 0.0
+    # Never fuller than one minute's worth, and oversized requests wait for a full bucket
+    assert bucket.wait_time(120, now=600.0) == 0.0
+    assert bucket.level == 60
+    assert TokenBucket().wait_time(10**9, now=0.0) == 0.0
+
+
+def test_headers_set_the_limits_and_429_pauses():
+    limiter = RateLimiter()
+    limiter.update_from_headers(LLMProvider.ANTHROPIC, 200, {
+        "anthropic-ratelimit-requests-limit": "50",
+        "anthropic-ratelimit-requests-remaining": "10",
+        "anthropic-ratelimit-tokens-limit": "40000",
+    })
+    assert (limiter.requests.per_minute, limiter.requests.level) == (50, 10)
+    assert (limiter.tokens.per_minute, limiter.tokens.level) == (40000, 40000)
+
+    # Other providers' header names are ignored
+    limiter.update_from_headers(LLMProvider.OPENAI, 200, {"anthropic-ratelimit-requests-limit": "1"})
+    assert limiter.requests.per_minute == 50
+
+    limiter.update_from_headers(LLMProvider.ANTHROPIC, 429, {"retry-after": "5"})
+    assert limiter.paused_until >= time.monotonic() + 4
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_acquire_blocks_until_the_bucket_refills():
+    limiter = empty_limiter(requests_per_minute=600)
+
+    started = time.monotonic()
+    permit = limiter.acquire("session", tokens=10)
+
+    assert time.monotonic() - started >= 0.08
+    assert permit.waited >= 0.08
+    assert limiter.stats()["granted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_sessions_are_served_round_robin():
+    limiter = empty_limiter(requests_per_minute=6000)
+    order = []
+
+    async def request(session: str):
+        permit = await limiter.aacquire(session, tokens=1)
+        order.append(permit.session)
+
+    tasks = []
+    for session in ["busy", "busy", "busy", "quiet", "quiet"]:
+        tasks.append(asyncio.create_task(request(session)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    assert order == ["busy", "quiet", "busy", "quiet", "busy"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    limiter = empty_limiter(requests_per_minute=60)
+    waiting = asyncio.create_task(limiter.aacquire("session", tokens=1))
+    await asyncio.sleep(0)
+    assert limiter.stats()["waiting"] == 1
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_router_is_limited_under_its_primary_account():
+    router = AsyncLLMRouter([AnthropicStub("primary-key"), AnthropicStub("backup-key")])
+    client = AsyncRateLimitedLLMClient(router)
+
+    assert client.limiter is get_rate_limiter(LLMProvider.ANTHROPIC, "primary-key")
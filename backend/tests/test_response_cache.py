@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from src.llm.base import AsyncBaseLLMClient, BaseLLMClient, LLMResponse
+from src.llm.response_cache import (
+    AsyncCachingLLMClient, CacheMode, CachingLLMClient, ReplayMissError, ResponseCache, request_fingerprint
+)
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def answer(number: int) -> LLMResponse:
+    content = [
+        {"type": "text", "text": f"answer {number}"},
+        {"type": "tool_use", "id": "1", "name": "read_file", "input": {"path": "a.py"}},
+    ]
+    return LLMResponse(content=content, stop_reason="tool_use", usage={"output_tokens": 5}, model="counting")
+
+
+class CountingClient(BaseLLMClient):
+    """Answers with the number of calls made so far."""
+
+    def __init__(self):
+        super().__init__("offline", "counting")
+        self.calls = 0
+
+    def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        self.calls += 1
+        return answer(self.calls)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+class AsyncCountingClient(AsyncBaseLLMClient):
+    def __init__(self):
+        super().__init__("offline", "counting")
+        self.calls = 0
+
+    async def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        self.calls += 1
+        return answer(self.calls)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(tmp_path / "responses")
+
+
+def ask(client, temperature: float, text: str = "Hello") -> LLMResponse:
+    return client.create_message([{"role": "user", "content": text}], "system", [], 100, temperature)
+
+
+def test_fingerprint_covers_every_request_field():
+    base = request_fingerprint("m", MESSAGES, "s", [], 100, 0)
+    assert base == request_fingerprint("m", [dict(MESSAGES[0])], "s", [], 100, 0)
+    for changed in [
+        ("m2", MESSAGES, "s", [], 100, 0),
+        ("m", [{"role": "user", "content": "Bye"}], "s", [], 100, 0),
+        ("m", MESSAGES, "s2", [], 100, 0),
+        ("m", MESSAGES, "s", [{"name": "t"}], 100, 0),
+        ("m", MESSAGES, "s", [], 200, 0),
+        ("m", MESSAGES, "s", [], 100, 0.5),
+    ]:
+        assert request_fingerprint(*changed) != base
+
+
+def test_read_write_caches_only_deterministic_requests(cache):
+    provider = CountingClient()
+    client = CachingLLMClient(provider, cache, CacheMode.READ_WRITE)
+
+    assert ask(client, 0).get_text() == "answer 1"
+    assert ask(client, 0).get_text() == "answer 1"
+    assert ask(client, 0, "Other").get_text() == "answer 2"
+    assert ask(client, 0.7).get_text() == "answer 3"
+    assert ask(client, 0.7).get_text() == "answer 4"
+    assert provider.calls == 4
+    assert cache.stats()["entries"] == 2
+
+
+def test_record_then_replay_without_the_provider(cache):
+    recording = CachingLLMClient(CountingClient(), cache, CacheMode.RECORD)
+    # Recording always asks the provider and stores every temperature
+    assert ask(recording, 0.7).get_text() == "answer 1"
+    assert ask(recording, 0.7).get_text() == "answer 2"
+
+    provider = CountingClient()
+    replaying = CachingLLMClient(provider, cache, CacheMode.REPLAY)
+    assert ask(replaying, 0.7).get_text() == "answer 2"
+
+    events = list(replaying.stream_message(MESSAGES, "system", [], 100, 0.7))
+    assert [event.type for event in events] == ["text_delta", "tool_use", "message_stop"]
+    assert events[-1].response.content == answer(2).content
+
+    with pytest.raises(ReplayMissError):
+        ask(replaying, 0.7, "Never recorded")
+    assert provider.calls == 0
+
+
+def test_streamed_responses_are_stored(cache):
+    provider = CountingClient()
+    client = CachingLLMClient(provider, cache, CacheMode.READ_WRITE)
+
+    streamed = list(client.stream_message(MESSAGES, "system", [], 100, 0))
+    replayed = list(client.stream_message(MESSAGES, "system", [], 100, 0))
+
+    assert provider.calls == 1
+    assert [event.type for event in replayed] == [event.type for event in streamed]
+    assert replayed[-1].response.content == streamed[-1].response.content
+
+
+@pytest.mark.asyncio
+async def test_async_client_shares_the_modes(cache):
+    provider = AsyncCountingClient()
+    client = AsyncCachingLLMClient(provider, cache, CacheMode.READ_WRITE)
+    first = await client.create_message(MESSAGES, "system", [], 100, 0)
+    second = await client.create_message(MESSAGES, "system", [], 100, 0)
+    assert first.get_text() == second.get_text() == "answer 1"
+
+    replaying = AsyncCachingLLMClient(AsyncCountingClient(), cache, CacheMode.REPLAY)
+    with pytest.raises(ReplayMissError):
+        await replaying.create_message(MESSAGES, "system", [], 100, 0.5)
+
+
+def test_least_recently_used_entries_are_evicted_across_restarts(tmp_path):
+    cache = ResponseCache(tmp_path, max_entries=2)
+    for key in ("aa01", "bb02", "cc03"):
+        cache.put(key, answer(1))
+    assert cache.get("aa01") is None
+    assert cache.stats()["entries"] == 2
+
+    # Recency is the file mtime, so a reopened cache sees cc03 as long unused and evicts it first
+    os.utime(cache._path("cc03"), (1, 1))
+    cache.get("bb02")
+    reopened = ResponseCache(tmp_path, max_entries=2)
+    reopened.put("dd04", answer(2))
+
+    assert reopened.get("cc03") is None
+    assert reopened.get("bb02") is not None
+    assert reopened.get("dd04").get_text() == "answer 2"
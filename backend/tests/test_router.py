@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import pytest
+
+from src.llm.base import BaseLLMClient, AsyncBaseLLMClient, LLMResponse
+from src.llm.router import LLMRouter, AsyncLLMRouter
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def response(text: str) -> LLMResponse:
+    return LLMResponse(content=[{"type": "text", "text": text}], stop_reason="end_turn", usage={}, model="fake")
+
+
+class FakeClient(BaseLLMClient):
+    """Answers with its name after delay seconds, or raises error."""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        super().__init__("key", name)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return response(self.model)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+class AsyncFakeClient(AsyncBaseLLMClient):
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        super().__init__("key", name)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def create_message(self, messages, system, tools, max_token=4096, temperature=0.7):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return response(self.model)
+
+    def convert_tools_to_provider_format(self, tools):
+        return tools
+
+
+def ask(router) -> str:
+    return router.create_message([{"role": "user", "content": "hi"}], "", []).get_text()
+
+
+def ask_async(router) -> str:
+    async def call():
+        return (await router.create_message([{"role": "user", "content": "hi"}], "", [])).get_text()
+    return asyncio.run(call())
+
+
+def stream_text(router) -> str:
+    return "".join(event.text for event in router.stream_message([{"role": "user", "content": "hi"}], "", []))
+
+
+@pytest.mark.parametrize("hedge", [True, False])
+def test_fast_primary_failure_fails_over_to_next_client(hedge):
+    primary = FakeClient("primary", error=ProviderError(529))
+    backup = FakeClient("backup")
+    router = LLMRouter([primary, backup], hedge=hedge, hedge_after=30)
+
+    start = time.monotonic()
+    assert ask(router) == "backup"
+    assert time.monotonic() - start < 1
+    assert (primary.calls, backup.calls) == (1, 1)
+
+
+@pytest.mark.parametrize("hedge", [True, False])
+def test_async_fast_primary_failure_fails_over_to_next_client(hedge):
+    primary = AsyncFakeClient("primary", error=ProviderError(529))
+    backup = AsyncFakeClient("backup")
+    router = AsyncLLMRouter([primary, backup], hedge=hedge, hedge_after=30)
+
+    start = time.monotonic()
+    assert ask_async(router) == "backup"
+    assert time.monotonic() - start < 1
+    assert (primary.calls, backup.calls) == (1, 1)
+
+
+def test_fast_failure_of_hedged_pair_moves_on_to_next_pair():
+    clients = [FakeClient("a", error=ProviderError(503)), FakeClient("b", error=ProviderError(503)), FakeClient("c")]
+    assert ask(LLMRouter(clients, hedge=True, hedge_after=30)) == "c"
+    assert [client.calls for client in clients] == [1, 1, 1]
+
+
+def test_slow_primary_is_hedged():
+    primary = FakeClient("primary", delay=2)
+    backup = FakeClient("backup")
+    router = LLMRouter([primary, backup], hedge=True, hedge_after=0.1)
+
+    start = time.monotonic()
+    assert ask(router) == "backup"
+    assert time.monotonic() - start < 1
+
+
+def test_async_slow_primary_is_hedged_and_cancelled():
+    primary = AsyncFakeClient("primary", delay=2)
+    backup = AsyncFakeClient("backup")
+    router = AsyncLLMRouter([primary, backup], hedge=True, hedge_after=0.1)
+
+    start = time.monotonic()
+    assert ask_async(router) == "backup"
+    assert time.monotonic() - start < 1
+
+
+def test_slow_primary_is_not_hedged_when_hedging_is_off():
+    primary = FakeClient("primary", delay=0.3)
+    backup = FakeClient("backup")
+
+    assert ask(LLMRouter([primary, backup], hedge=False, hedge_after=0.1)) == "primary"
+    assert backup.calls == 0
+
+
+def test_client_errors_are_raised_without_failover():
+    primary = FakeClient("primary", error=ProviderError(400))
+    backup = FakeClient("backup")
+
+    with pytest.raises(ProviderError):
+        ask(LLMRouter([primary, backup], hedge=True, hedge_after=30))
+    assert backup.calls == 0
+
+
+def test_last_error_is_raised_when_every_client_fails():
+    clients = [FakeClient("a", error=ProviderError(500)), FakeClient("b", error=ProviderError(502))]
+    with pytest.raises(ProviderError, match="HTTP"):
+        ask(LLMRouter(clients, hedge=False))
+
+
+def test_open_circuit_is_ranked_last():
+    primary = FakeClient("primary", error=ProviderError(503))
+    backup = FakeClient("backup")
+    router = LLMRouter([primary, backup], hedge=False, failure_threshold=2, cooldown=60)
+
+    for _ in range(2):
+        assert ask(router) == "backup"
+    assert router.health[0].state == "open"
+
+    assert ask(router) == "backup"
+    assert primary.calls == 2
+
+
+def test_stream_fails_over_before_first_event():
+    primary = FakeClient("primary", error=ProviderError(529))
+    backup = FakeClient("backup")
+
+    assert stream_text(LLMRouter([primary, backup], hedge=True, hedge_after=30)) == "backup"
+    assert stream_text(LLMRouter([primary, backup], hedge=False)) == "backup"
@@ -0,0 +1,53 @@
+from src.tools import scanner
+
+
+def write_files(directory, count: int, size: int):
+    paths = []
+    for i in range(count):
+        path = directory / f"f{i}.txt"
+        path.write_text(("filler line\n" * (size // 12)) + f"needle {i}\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_small_workspaces_scan_in_process(tmp_path, monkeypatch):
+    def no_pool():
+        raise AssertionError("scan started the process pool")
+
+    monkeypatch.setattr(scanner, "_get_pool", no_pool)
+    paths = write_files(tmp_path, 200, 1000)
+    source, flags = scanner.compile_query("needle", use_regex=False, case_sensitive=False)
+
+    result = scanner.scan(paths, source, flags, max_files=5, max_matches=10)
+
+    assert [found.file for found in result.results] == paths[:5]
+    assert result.results[0].matches == [(84, "needle 0")]
+    assert result.truncated
+
+
+def test_large_scans_use_the_pool_until_the_last_user_releases_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(scanner, "PARALLEL_SCAN_MIN_BYTES", 1)
+    monkeypatch.setattr(scanner.os, "cpu_count", lambda: 2)
+    paths = write_files(tmp_path, 4, 100)
+    source, flags = scanner.compile_query(r"needle [13]", use_regex=True, case_sensitive=True)
+
+    scanner.retain_pool()
+    scanner.retain_pool()
+    try:
+        result = scanner.scan(paths, source, flags, max_files=5, max_matches=10)
+        assert [found.file for found in result.results] == [paths[1], paths[3]]
+        assert scanner._pool is not None
+
+        scanner.release_pool()
+        assert scanner._pool is not None
+    finally:
+        scanner.release_pool()
+
+    assert scanner._pool is None
+
+
+def test_single_cpu_hosts_never_start_the_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(scanner, "PARALLEL_SCAN_MIN_BYTES", 1)
+    monkeypatch.setattr(scanner.os, "cpu_count", lambda: 1)
+
+    assert not scanner._worth_parallel(write_files(tmp_path, 4, 100))
@@ -0,0 +1,43 @@
+from src.tools import search_index
+from src.tools.search_index import TrigramIndex, required_literals
+from src.tools.workspace_walker import WorkspaceWalker
+
+
+def make_index(workspace, cache_dir) -> TrigramIndex:
+    return TrigramIndex(workspace, cache_dir=cache_dir, walker=WorkspaceWalker(workspace))
+
+
+def test_required_literals():
+    assert required_literals(r"def \w+_handler\(") == ["def ", "_handler("]
+    assert required_literals(r"(foo|bar)baz") == ["baz"]
+    assert required_literals(r"ab?c") == []
+
+
+def test_incremental_updates_are_saved_in_batches(tmp_path, monkeypatch):
+    workspace, cache_dir = tmp_path / "workspace", tmp_path / "cache"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("def alpha(): pass\n")
+    (workspace / "b.py").write_text("def beta(): pass\n")
+
+    index = make_index(workspace, cache_dir)
+    assert index.candidates("alpha") == ["a.py"]
+    # A freshly built index is written out at once
+    saved = index.index_path.stat().st_mtime_ns
+
+    (workspace / "b.py").write_text("def beta(): return alpha()\n")
+    index.walker.invalidate(["b.py"])
+    assert index.candidates("alpha") == ["a.py", "b.py"]
+    assert index.index_path.stat().st_mtime_ns == saved
+    assert make_index(workspace, cache_dir).candidates("alpha") == ["a.py", "b.py"]
+
+    index.close()
+    reloaded = make_index(workspace, cache_dir)
+    reloaded._load()
+    assert reloaded.files == index.files
+
+    monkeypatch.setattr(search_index, "INDEX_SAVE_CHANGED_FILES", 1)
+    (workspace / "c.py").write_text("alpha = 1\n")
+    index.walker.invalidate(["c.py"])
+    assert "c.py" in index.candidates("alpha")
+    assert index.index_path.stat().st_mtime_ns != saved
+    assert not index._unsaved_changes
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from src.tools.shell_session import ShellSession, ShellSessionPool
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = ShellSession(tmp_path)
+    yield session
+    session.close()
+
+
+def test_state_carries_over_between_commands(session, tmp_path):
+    (tmp_path / "sub").mkdir()
+    assert session.run("cd sub && export KLIX_TEST=value", timeout=5).returncode == 0
+
+    result = session.run("pwd; echo $KLIX_TEST", timeout=5)
+    assert result.stdout == f"{tmp_path / 'sub'}\nvalue\n"
+
+
+def test_exit_code_and_streams(session):
+    result = session.run("echo out; echo err >&2; (exit 3)", timeout=5)
+    assert (result.returncode, result.stdout, result.stderr) == (3, "out\n", "err\n")
+    assert not result.session_restarted
+
+
+@pytest.mark.parametrize("command", ['echo "unterminated', "if then fi", "echo 'a", "(echo open"])
+def test_syntax_error_fails_fast_and_keeps_session(session, tmp_path, command):
+    session.run("cd /", timeout=5)
+
+    start = time.monotonic()
+    result = session.run(command, timeout=5)
+
+    assert time.monotonic() - start < 2
+    assert result.returncode != 0
+    assert not result.timed_out
+    assert not result.session_restarted
+    assert session.run("pwd", timeout=5).stdout == "/\n"
+
+
+def test_command_cannot_read_the_framing(session):
+    result = session.run("cat", timeout=5)
+    assert (result.returncode, result.stdout, result.timed_out) == (0, "", False)
+
+
+def test_quotes_and_multiline_commands(session):
+    result = session.run("printf '%s\\n' 'a b' \"c'd\"\nfor i in 1 2; do\n  echo $i\ndone", timeout=5)
+    assert result.stdout == "a b\nc'd\n1\n2\n"
+
+
+def test_timeout_kills_command_but_keeps_shell(session):
+    session.run("cd /", timeout=5)
+
+    result = session.run("sleep 30", timeout=0.5)
+
+    assert result.timed_out
+    assert not result.session_restarted
+    assert session.run("pwd", timeout=5).stdout == "/\n"
+
+
+def test_exit_ends_session_and_next_command_starts_fresh(session):
+    result = session.run("exit 4", timeout=5)
+    assert (result.returncode, result.session_restarted) == (4, True)
+    assert session.run("echo again", timeout=5).stdout == "again\n"
+
+
+def test_pool_evicts_least_recently_used(tmp_path):
+    pool = ShellSessionPool(tmp_path, max_sessions=2)
+    try:
+        first = pool.get("a")
+        first.run("true", timeout=5)
+        pool.get("b")
+        pool.get("c")
+        assert not first.alive
+    finally:
+        pool.close()
+
+
+def test_environment_round_trips_past_the_output_cap(session, tmp_path):
+    (tmp_path / "sub").mkdir()
+    exports = "; ".join(f"export KLIX_VAR_{i}={'x' * 100}" for i in range(60))
+    session.run(f"cd sub; {exports}; export VIRTUAL_ENV=/opt/venv", timeout=5)
+
+    cwd, env = session.environment()
+
+    assert cwd == str(tmp_path / "sub")
+    assert env["VIRTUAL_ENV"] == "/opt/venv"
+    assert all(env[f"KLIX_VAR_{i}"] == "x" * 100 for i in range(60))
+
+
+def test_environment_keeps_newlines_in_values(session):
+    session.run("export KLIX_MULTILINE=$'one\\ntwo'", timeout=5)
+    assert session.environment()[1]["KLIX_MULTILINE"] == "one\ntwo"
@@ -0,0 +1,25 @@
+from src.agent.tool_executor import ToolExecutor
+from src.tools import fs_watcher, git_backend, job_manager
+
+
+def test_workspace_resources_live_until_the_last_executor_closes(tmp_path):
+    workspace = tmp_path.resolve()
+    first, second = ToolExecutor(workspace), ToolExecutor(workspace)
+    assert first.watcher is second.watcher
+    assert first.jobs is second.jobs
+
+    job = first.jobs.start("sleep 30")
+    first.close()
+    first.close()
+
+    assert fs_watcher._watchers[workspace] is second.watcher
+    assert job.running
+    assert second.execute("list_directory", {"path": "."})["success"]
+
+    second.close()
+
+    assert workspace not in fs_watcher._watchers
+    assert workspace not in git_backend._backends
+    assert workspace not in job_manager._managers
+    assert not job.running
+    assert second.walker.watcher is None
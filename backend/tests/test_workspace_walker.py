@@ -0,0 +1,67 @@
+import pytest
+
+from src.tools.workspace_walker import IgnoreRule, WorkspaceWalker, is_ignored
+
+
+@pytest.mark.parametrize("pattern, path, is_dir, expected", [
+    ("*.log", "debug.log", False, True),
+    ("*.log", "deep/nested/debug.log", False, True),
+    ("*.log", "debug.logx", False, False),
+    ("build/", "build", True, True),
+    ("build/", "src/build", True, True),
+    ("build/", "build", False, False),
+    ("/dist", "dist", True, True),
+    ("/dist", "src/dist", True, False),
+    ("docs/*.md", "docs/readme.md", False, True),
+    ("docs/*.md", "docs/sub/readme.md", False, False),
+    ("docs/*.md", "src/docs/readme.md", False, False),
+    ("**/tmp", "tmp", True, True),
+    ("**/tmp", "a/b/tmp", True, True),
+    ("a/**/b", "a/b", True, True),
+    ("a/**/b", "a/x/y/b", True, True),
+    ("a/**/b", "x/a/b", True, False),
+    ("logs/**", "logs/2024/app.txt", False, True),
+    ("file?.txt", "file1.txt", False, True),
+    ("file?.txt", "file10.txt", False, False),
+    ("[!a]bc", "xbc", False, True),
+    ("[!a]bc", "abc", False, False),
+    ("\\#notes", "#notes", False, True),
+    ("\\!important", "!important", False, True),
+])
+def test_ignore_rule_matches(pattern, path, is_dir, expected):
+    assert IgnoreRule(pattern, "").matches(path, is_dir) is expected
+
+
+def test_rules_from_nested_ignore_files_only_apply_below_them():
+    rule = IgnoreRule("*.txt", "sub")
+    assert rule.matches("sub/a.txt", False)
+    assert rule.matches("sub/deeper/a.txt", False)
+    assert not rule.matches("a.txt", False)
+    assert not rule.matches("subway/a.txt", False)
+
+
+def test_later_rules_win_so_negation_re_includes():
+    rules = [IgnoreRule("*.log", ""), IgnoreRule("!keep.log", "")]
+    assert is_ignored(rules, "drop.log", False)
+    assert not is_ignored(rules, "keep.log", False)
+    assert is_ignored(rules + [IgnoreRule("keep.log", "")], "keep.log", False)
+
+
+def test_walker_prunes_ignored_directories(tmp_path):
+    for path in [
+        "src/app.py", "src/app.pyc", "src/generated/out.py", "build/keep.txt",
+        "logs/keep.log", "logs/drop.log", "node_modules/pkg/index.js", "README.md",
+    ]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("x\n")
+    (tmp_path / ".gitignore").write_text("*.pyc\nbuild/\n!build/keep.txt\n*.log\n!keep.log\n")
+    (tmp_path / "src" / ".gitignore").write_text("/generated\n")
+
+    walker = WorkspaceWalker(tmp_path)
+
+    # A file inside an excluded directory cannot be re-included, as in git
+    assert sorted(entry.path for entry in walker.files()) == [
+        ".gitignore", "README.md", "logs/keep.log", "src/.gitignore", "src/app.py",
+    ]
+    assert walker.is_ignored("src/generated/new.py", False)
+    assert not walker.is_ignored("generated/new.py", False)